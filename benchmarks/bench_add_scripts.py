@@ -0,0 +1,67 @@
+"""
+time to submit a schedule of n scripts one by one with add_script vs. with
+add_scripts (local prevalidation plus bounded concurrent submission) against a
+stand-in dbserver with an artificial round trip time
+
+    python benchmarks/bench_add_scripts.py [n_scripts] [rtt_s] [max_workers]
+"""
+
+import datetime
+import json
+import os, sys, time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from mke_client.helpers import make_zulustr
+from mke_client.transport import Transport
+from mke_client.remexlib import ScriptMinimal, add_script, add_scripts
+from mke_client.schedule import ScheduleIndex
+
+
+def add_routes(srv):
+    def check_and_start(handler, body):
+        row = json.loads(body)
+        with srv.lock:
+            row['id'] = srv.n_requests
+        return 200, {'msg': None, 'data': row, 'status': 'WAITING_TO_RUN'}
+    srv.routes[('POST', r'check_and_start/experiments')] = check_and_start
+
+
+def run(n=500, rtt=0.005, max_workers=16):
+    t = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    # every 10th script is placed on top of the one before it on its antenna and gets rejected locally
+    scripts = [ScriptMinimal('script.py', 'ant{}'.format(i % 4), make_zulustr(t + datetime.timedelta(hours=i - 3.75 * (i % 10 == 9))), 0.5)
+               for i in range(n)]
+
+    results = {}
+    for mode in ['sequential', 'concurrent']:
+        with DbServerStub(latency=rtt) as srv, Transport(pool_maxsize=max_workers) as transport:
+            add_routes(srv)
+            schedule = ScheduleIndex()
+            n_ok = 0
+            t0 = time.perf_counter()
+            if mode == 'sequential':
+                for script in scripts:
+                    try:
+                        add_script(srv.uri, 'experiments', transport=transport, schedule=schedule, **script.to_dict())
+                        n_ok += 1
+                    except AssertionError:
+                        pass
+            else:
+                report = add_scripts(srv.uri, 'experiments', scripts, transport=transport, max_workers=max_workers, schedule=schedule)
+                n_ok = sum(r['ok'] for r in report)
+            results[mode] = (time.perf_counter() - t0, n_ok, srv.n_requests)
+
+    print(f'scripts: {n} (rtt {rtt*1e3:.1f} ms, max_workers {max_workers})')
+    for mode, (dt, n_ok, n_requests) in results.items():
+        print(f'{mode:>11}: {dt:7.3f} s  {dt/n*1e3:7.3f} ms/script  ({n_ok} submitted, {n_requests} requests)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.005,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 16)
@@ -0,0 +1,55 @@
+"""
+poll n experiments sequentially with rimlib and concurrently with asynclib
+against a local stand-in dbserver with an artificial round trip time
+
+    python benchmarks/bench_async_poll.py [n_experiments] [rtt_s]
+"""
+
+import asyncio
+import os, sys, time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from mke_client.helpers import get_utcnow, make_zulustr
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment
+from mke_client.asynclib import AsyncExperiment, AsyncTransport, poll_all
+
+
+def make_tables(n):
+    row = {'status': 'RUNNING', 'start_condition': make_zulustr(get_utcnow()), 'duration_expected_hr_dec': 1.0}
+    return {'experiments': {i: {'id': i, **row} for i in range(1, n+1)}}
+
+
+async def poll_async(uri, n, max_concurrency):
+    async with AsyncTransport(max_concurrency=max_concurrency) as transport:
+        exps = [AsyncExperiment(i, uri, transport=transport) for i in range(1, n+1)]
+        await poll_all(exps[:1]) # warm up
+        t0 = time.perf_counter()
+        await poll_all(exps)
+        return time.perf_counter() - t0
+
+
+def run(n=500, rtt=0.05):
+    with DbServerStub(make_tables(n), latency=rtt) as srv:
+        n_seq = min(n, 50)
+        with Transport() as transport:
+            exps = [Experiment(i, srv.uri, transport=transport) for i in range(1, n_seq+1)]
+            t0 = time.perf_counter()
+            for exp in exps:
+                exp.poll()
+            dt_seq = (time.perf_counter() - t0) / n_seq * n
+
+        dt_async = asyncio.run(poll_async(srv.uri, n, max_concurrency=n))
+
+    print(f'experiments:          {n} (rtt {rtt*1e3:.0f} ms)')
+    print(f'sequential (rimlib):  {dt_seq:8.3f} s  (extrapolated from {n_seq})')
+    print(f'concurrent (asynclib):{dt_async:8.3f} s  ({dt_async / rtt:.1f} rtt)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500, float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
@@ -0,0 +1,66 @@
+"""
+time to register n measurements (with one aux file each) through each storage
+backend: mem://, file:// (journal), sqlite:// and http:// against a stand-in
+dbserver doing the same bookkeeping in memory behind an artificial round trip time
+
+    python benchmarks/bench_backends.py [n_measurements] [rtt_s]
+"""
+
+import json
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from mke_client.backends import open_backend
+from mke_client.helpers import get_utcnow, make_zulustr
+from mke_client.rimlib import Experiment
+from mke_client.transport import Transport
+
+
+def make_exp_row(savedir):
+    return {'id': 1, 'status': 'RUNNING', 'antenna_id': 'ant', 'script_name': 'bench',
+            'start_condition': make_zulustr(get_utcnow()), 'time_started_iso': None,
+            'devices_json': '["ACU"]', 'results_json': '{}', 'aux_files_json': '{}',
+            'script_out_path': os.path.join(savedir, 'bench.ipynb')}
+
+
+def time_register(exp, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        exp.get_path_for_new_datafile({'RFC': '.csv'})
+    return (time.perf_counter() - t0) / n
+
+
+def run(n=2000, rtt=0.001):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for uri in ['mem://', f'file://{tmpdir}/json', f'sqlite://{tmpdir}/sqlite']:
+            # one process only, so the stores do not need to lock and sync on every registration
+            backend = open_backend(uri) if uri == 'mem://' else open_backend(uri, shared=False, flush_every=1000)
+            with backend:
+                backend.commit('experiments', make_exp_row(tmpdir))
+                results[uri.split('://')[0]] = time_register(Experiment(1, backend=backend), n)
+
+        # the stub server registers through a memory backend of its own
+        server_backend = open_backend('mem://')
+        server_backend.commit('experiments', make_exp_row(tmpdir))
+        def register(handler, body):
+            return 200, server_backend.register_measurement(json.loads(body))
+
+        with DbServerStub(latency=rtt) as srv, Transport() as transport:
+            srv.routes[('POST', r'register_measurement_data')] = register
+            results[f'http (rtt {rtt*1e3:.1f} ms)'] = time_register(Experiment(1, srv.uri, transport=transport), n // 4)
+
+    print(f'measurements: {n}')
+    for name, dt in results.items():
+        print(f'{name:>18}: {dt*1e3:8.3f} ms/measurement')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.001)
@@ -0,0 +1,47 @@
+"""
+per measurement overhead of registering measurements one by one, in one batch
+request and with pipelined concurrent requests (fallback) against a stand-in
+dbserver with an artificial round trip time
+
+    python benchmarks/bench_batch_register.py [n_measurements] [rtt_s]
+"""
+
+import datetime
+import os, sys, time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from test_rimlib import add_register_routes, make_tables
+from mke_client.helpers import get_utcnow
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment
+
+
+def run(n=200, rtt=0.005):
+    t = get_utcnow()
+    measurements = [(t + datetime.timedelta(seconds=i), {'RFC': '.csv', 'MWS': '.zip'}, None) for i in range(n)]
+
+    results = {}
+    for mode in ['single', 'batch', 'pipelined']:
+        with DbServerStub(make_tables(), latency=rtt) as srv, Transport(pool_maxsize=16) as transport:
+            add_register_routes(srv, batch=(mode == 'batch'))
+            exp = Experiment(1, srv.uri, transport=transport)
+            t0 = time.perf_counter()
+            if mode == 'single':
+                for start_time, devices_to_add, tag in measurements:
+                    exp.get_path_for_new_datafile(devices_to_add, start_time, tag)
+            else:
+                exp.get_pathes_for_new_datafiles(measurements)
+            results[mode] = (time.perf_counter() - t0, srv.n_requests)
+
+    print(f'measurements: {n} (rtt {rtt*1e3:.1f} ms)')
+    for mode, (dt, n_requests) in results.items():
+        print(f'{mode:>10}: {dt/n*1e3:8.3f} ms/measurement  ({n_requests} requests)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200, float(sys.argv[2]) if len(sys.argv) > 2 else 0.005)
@@ -0,0 +1,50 @@
+"""
+time from a cancel being set on the server until the experiment notices it and
+number of requests sent while waiting, for a control loop calling
+check_for_cancel() once per tick vs. wait_for() with long-polling vs. wait_for()
+with the adaptive polling fallback
+
+    python benchmarks/bench_cancel_latency.py [t_cancel_s] [ticklen_s]
+"""
+
+import os, sys, time
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from test_rimlib import make_tables
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment
+
+
+def run(t_cancel=10.5, ticklen=1.0):
+    print(f'cancel after {t_cancel:.1f}s, tick length {ticklen:.1f}s')
+    for mode in ['tick polling', 'long-poll', 'adaptive polling']:
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            if mode == 'adaptive polling':
+                del srv.routes[('GET', r'(\w+)/(\w+)/watch')]
+            exp = Experiment(1, srv.uri, transport=transport)
+
+            t_set = []
+            def cancel():
+                time.sleep(t_cancel)
+                t_set.append(time.perf_counter())
+                with Transport() as t:
+                    t.patch(f'{srv.uri}/experiments/1', json={'status': 'CANCELLING'})
+            threading.Thread(target=cancel, daemon=True).start()
+
+            if mode == 'tick polling':
+                while not exp.check_for_cancel():
+                    time.sleep(ticklen)
+            else:
+                exp.wait_for('CANCELLING')
+            dt = time.perf_counter() - t_set[0]
+            print(f'{mode:>17}: noticed after {dt*1e3:8.1f} ms with {transport.stats()["requests"]:4d} requests')
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 10.5, float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
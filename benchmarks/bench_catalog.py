@@ -0,0 +1,83 @@
+"""
+catalog of a synthetic output tree (empty files named like filesys_storage_api
+does): first scan, incremental rescans with nothing / one experiment changed,
+and a device + experiment + time range query vs. walking the tree with the
+filesys_storage_api regexes per file name
+
+    python benchmarks/bench_catalog.py [n_files] [files_per_experiment]
+"""
+
+import datetime
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+import mke_client.filesys_storage_api as filesys
+from mke_client.catalog import Catalog
+
+devices = ['ACU', 'RFC', 'MWS', 'OCS']
+t0 = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_experiment(root, id, n_files):
+    tstart = t0 + datetime.timedelta(days=id)
+    basedir = filesys.get_exp_save_dir(root, tstart, id, 'ant1', 'bench', make_dir=True)
+    for i in range(n_files // len(devices)):
+        t = tstart + datetime.timedelta(minutes=i)
+        for device in devices:
+            pth = filesys.get_exp_save_pth_datafile(basedir, t, id, i + 1, device, make_dir=(i == 0))
+            open(pth, 'w').close()
+
+
+def walk_find(root, device, experiment_id, t_start, t_end):
+    found = []
+    for d, dirs, files in os.walk(root):
+        for f in files:
+            if filesys.get_device_from_pth(f) != device or f'_IDP_{experiment_id}_' not in f or filesys.get_id_data_from_path(f) is None:
+                continue
+            t = datetime.datetime.strptime(f[:13], filesys.timeformat_str).replace(tzinfo=datetime.timezone.utc)
+            if t_start <= t <= t_end:
+                found.append(os.path.join(d, f))
+    return found
+
+
+def run(n_files=200000, per_experiment=2000):
+    import logging
+    logging.getLogger('mke_client.filesys_storage_api').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, 'output')
+        n_exp = n_files // per_experiment
+        t = time.perf_counter()
+        for id in range(1, n_exp + 1):
+            make_experiment(root, id, per_experiment)
+        print(f'files: {n_exp * per_experiment} in {n_exp} experiments (made in {time.perf_counter() - t:.1f} s)')
+
+        with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+            for name, fun in [('first scan', catalog.scan), ('rescan, unchanged', catalog.scan),
+                              ('rescan, 1 new exp', lambda: make_experiment(root, n_exp + 1, per_experiment) or catalog.scan())]:
+                t = time.perf_counter()
+                stats = fun()
+                print(f'{name:>20}: {time.perf_counter() - t:8.3f} s  {stats}')
+
+            id = n_exp // 2
+            t_start, t_end = t0 + datetime.timedelta(days=id, hours=2), t0 + datetime.timedelta(days=id, hours=4)
+            t = time.perf_counter()
+            n = 100
+            for i in range(n):
+                rows = catalog.find(device='MWS', experiment_id=id, t_start=t_start, t_end=t_end)
+            dt_catalog = (time.perf_counter() - t) / n
+
+            t = time.perf_counter()
+            found = walk_find(root, 'MWS', id, t_start, t_end)
+            dt_walk = time.perf_counter() - t
+            assert sorted(found) == sorted(r['path'] for r in rows), (len(found), len(rows))
+            print(f'{"query":>20}: catalog {dt_catalog*1e3:.2f} ms  walk + regex {dt_walk*1e3:.0f} ms  ({len(rows)} files, {dt_walk/dt_catalog:.0f}x)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
@@ -0,0 +1,59 @@
+"""
+stress test for LocalExperiment storage shared between processes: n_procs
+processes attach to the same savedir and register measurements at the same
+time. Checks that no rows are lost, all ids are unique and the parent
+experiment lists every measurement, and reports the commit throughput
+
+    python benchmarks/bench_local_multiprocess.py [n_procs] [n_measurements_per_proc]
+"""
+
+import json
+import multiprocessing
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.locallib import LocalExperiment
+
+
+def register(args):
+    savedir, backend, n, barrier = args
+    exp = LocalExperiment(1, savedir=savedir, backend=backend, shared=True)
+    barrier.wait()
+    ids = [exp.get_path_for_new_datafile({'ACU': '.csv', 'RFC': '.csv'})[1] for i in range(n)]
+    exp.close()
+    return ids
+
+
+def run(n_procs=8, n=250):
+    print(f'processes: {n_procs}, measurements per process: {n}')
+    ctx = multiprocessing.get_context('spawn')
+    for backend in ['json', 'sqlite']:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exp = LocalExperiment(1, fallback_local_basepath=tmpdir, backend=backend, shared=True)
+            savedir = exp.savedir
+            exp.close()
+
+            with ctx.Manager() as manager, ctx.Pool(n_procs) as pool:
+                barrier = manager.Barrier(n_procs + 1)
+                res = pool.map_async(register, [(savedir, backend, n, barrier)] * n_procs)
+                barrier.wait()
+                t0 = time.perf_counter()
+                ids = [id for ids in res.get() for id in ids]
+                dt = time.perf_counter() - t0
+
+            exp = LocalExperiment(1, savedir=savedir, backend=backend, shared=True)
+            n_rows = len(exp.store.rows('measurement_data'))
+            n_results = len(json.loads(exp.get()['results_json']))
+            exp.close()
+
+        ok = len(ids) == len(set(ids)) == n_rows == n_results == n_procs * n
+        print(f'{backend:>7}: {len(ids)/dt:8.0f} measurements/s  rows={n_rows} unique ids={len(set(ids))} '
+              f'parent results={n_results} {"OK" if ok else "LOST ROWS OR DUPLICATE IDS"}')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 8, int(sys.argv[2]) if len(sys.argv) > 2 else 250)
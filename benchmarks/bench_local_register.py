@@ -0,0 +1,34 @@
+"""
+time per locally registered measurement (LocalExperiment.get_path_for_new_datafile)
+writing every changed row to disk immediately (write through) vs. holding changes
+back in memory and flushing them in batches (write-behind, only without shared=True)
+
+    python benchmarks/bench_local_register.py [n_measurements]
+"""
+
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.locallib import LocalExperiment
+
+
+def run(n=2000):
+    print(f'measurements: {n}')
+    for backend in ['json', 'sqlite']:
+        for name, flush_every, shared in [('write through', 1, False), ('write-behind', 1000, False), ('shared', 1000, True)]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                with LocalExperiment(0, fallback_local_basepath=tmpdir, backend=backend, flush_every=flush_every, shared=shared) as exp:
+                    t0 = time.perf_counter()
+                    for i in range(n):
+                        exp.get_path_for_new_datafile({'ACU': '.csv', 'RFC': '.csv'})
+                    exp.set_status_running()
+                    dt = time.perf_counter() - t0
+            print(f'{backend:>7} {name:>14}: {dt/n*1e3:8.3f} ms/measurement')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,102 @@
+"""
+time per registered row for a LocalExperiment-like table which already holds
+n rows when storing it by rewriting the whole json file on every change (old
+LocalExperiment.commit) vs. appending to a journal (JournalStore) vs. an
+indexed SQLite database (SqliteStore), and the time to look up the aux files
+of one measurement and the max id from a fresh process (json file vs. SQLite)
+
+    python benchmarks/bench_localstore.py [n_rows] [n_timed]
+"""
+
+import json
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.localstore import JournalStore, SqliteStore
+
+
+def make_row(i):
+    return {'id': i, 'experiment_id': 1, 'data_path': f'/data/exp_1/meas_{i:08d}.csv', 'tags': '', 'aux_files_json': '{}'}
+
+
+def make_aux_row(i):
+    return {'id': i, 'parent_id': i // 2, 'parent_type': 'measurement_data', 'device': 'RFC' if i % 2 else 'MWS', 'path': f'/data/exp_1/aux_{i:08d}.csv', 'tag': ''}
+
+
+def commit_rewrite(dbpath, dc):
+    # the old LocalExperiment.commit: load, merge, dump the whole table
+    with open(dbpath, 'r') as fp:
+        db = json.load(fp)
+    db[str(dc['id'])] = dc
+    with open(dbpath, 'w+') as fp:
+        json.dump(db, fp, indent=3)
+
+
+def run(n=10000, n_timed=50):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dbpath = os.path.join(tmpdir, 'measurement_data.json')
+        with open(dbpath, 'w') as fp:
+            json.dump({str(i): make_row(i) for i in range(1, n + 1)}, fp, indent=3)
+
+        t0 = time.perf_counter()
+        for i in range(n + 1, n + 1 + n_timed):
+            commit_rewrite(dbpath, make_row(i))
+        dt_rewrite = (time.perf_counter() - t0) / n_timed
+
+        store = JournalStore(tmpdir, compact_every=10 * n)
+        store.has_rows('measurement_data')  # load the snapshot before timing
+        t0 = time.perf_counter()
+        for i in range(n + 1 + n_timed, n + 1 + 2 * n_timed):
+            store.upsert('measurement_data', i, make_row(i))
+        dt_journal = (time.perf_counter() - t0) / n_timed
+        store.close()
+
+        store = SqliteStore(tmpdir, flush_every=3 * n)
+        for i in range(1, n + 1):
+            store.upsert('measurement_data', i, make_row(i))
+            store.upsert('aux_files', i, make_aux_row(i))
+        store.flush()
+        store.flush_every = 1
+        t0 = time.perf_counter()
+        for i in range(n + 1, n + 1 + n_timed):
+            store.upsert('measurement_data', i, make_row(i))
+        dt_sqlite = (time.perf_counter() - t0) / n_timed
+        store.close()
+
+        auxpath = os.path.join(tmpdir, 'aux_files.json')
+        with open(auxpath, 'w') as fp:
+            json.dump({str(i): make_aux_row(i) for i in range(1, n + 1)}, fp, indent=3)
+
+        # lookups as a reader process would do them, starting from the files on disk
+        t0 = time.perf_counter()
+        with open(auxpath, 'r') as fp:
+            db = json.load(fp)
+        found_json = [row for row in db.values() if row['parent_id'] == n // 4]
+        max_json = max([int(k) for k in db.keys()])
+        dt_lookup_json = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reader = SqliteStore(tmpdir)
+        found_sqlite = reader.find('aux_files', parent_id=n // 4)
+        max_sqlite = reader.max_id('aux_files')
+        dt_lookup_sqlite = time.perf_counter() - t0
+        reader.close()
+        assert found_json == found_sqlite and max_json == max_sqlite
+
+    print(f'rows: {n}')
+    print(f'   rewrite: {dt_rewrite*1e3:9.3f} ms/row')
+    print(f'   journal: {dt_journal*1e3:9.3f} ms/row  ({dt_rewrite/dt_journal:.0f}x)')
+    print(f'    sqlite: {dt_sqlite*1e3:9.3f} ms/row  ({dt_rewrite/dt_sqlite:.0f}x)')
+    print(f'   lookup aux files + max id:  json {dt_lookup_json*1e3:9.3f} ms   sqlite {dt_lookup_sqlite*1e3:9.3f} ms')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 50)
+    else:
+        run(10000)
+        run(100000, 10)
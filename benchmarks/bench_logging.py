@@ -0,0 +1,78 @@
+"""
+logging overhead per locally registered measurement (LocalExperiment.get_path_for_new_datafile)
+with the old setup (one stdout handler on the root logger per imported module, here 3
+writing to os.devnull) vs. configure_logging() and the default (NullHandler only), plus the
+cost of a disabled debug call with eager vs. lazy formatting
+
+    python benchmarks/bench_logging.py [n_measurements]
+"""
+
+import json
+import logging
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+import mke_client
+from mke_client.locallib import LocalExperiment
+
+
+def time_register(n, repeat=3):
+    dts = []
+    for k in range(repeat):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with LocalExperiment(0, fallback_local_basepath=tmpdir, flush_every=1000, shared=False) as exp:
+                t0 = time.perf_counter()
+                for i in range(n):
+                    exp.get_path_for_new_datafile({'ACU': '.csv', 'RFC': '.csv'})
+                dts.append((time.perf_counter() - t0) / n)
+    return min(dts)
+
+
+def run(n=2000):
+    root = logging.getLogger()
+    logger = logging.getLogger('mke_client')
+    devnull = open(os.devnull, 'w')
+
+    results = {}
+    results['default'] = time_register(n)
+
+    root.setLevel(logging.DEBUG)
+    handlers = [logging.StreamHandler(devnull) for i in range(3)]
+    for h in handlers:
+        h.setFormatter(logging.Formatter(mke_client.default_log_format))
+        root.addHandler(h)
+    results['old root handlers, DEBUG'] = time_register(n)
+    for h in handlers:
+        root.removeHandler(h)
+    root.setLevel(logging.WARNING)
+
+    mke_client.configure_logging(logging.DEBUG, stream=devnull)
+    results['configure_logging, DEBUG'] = time_register(n)
+    logger.setLevel(logging.WARNING)
+    results['configure_logging, WARNING'] = time_register(n)
+
+    print(f'measurements: {n}')
+    for name, dt in results.items():
+        print(f'{name:>27}: {dt*1e3:8.3f} ms/measurement')
+
+    _log = logging.getLogger('mke_client.bench')
+    row = {'id': 0, 'parent_id': 1, 'path': '/data/20230101_000000_IDD_1_ACU.csv', 'parent_type': 'measurement_data', 'device': 'ACU', 'tag': None}
+    m = 100000
+    t0 = time.perf_counter()
+    for i in range(m):
+        _log.debug('adding row: ' + json.dumps(row))
+    dt_eager = (time.perf_counter() - t0) / m
+    t0 = time.perf_counter()
+    for i in range(m):
+        _log.debug('adding row: %s', row)
+    dt_lazy = (time.perf_counter() - t0) / m
+    print(f'{"disabled debug call":>27}: eager {dt_eager*1e6:.2f} us  lazy {dt_lazy*1e6:.2f} us')
+    devnull.close()
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
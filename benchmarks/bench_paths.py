@@ -0,0 +1,59 @@
+"""
+data file pathes for N measurements x M devices of one experiment: one
+get_exp_save_pth_datafile call per file vs. one PathPlanner.get_pathes call,
+each with and without creating the directories, and the largest directory
+of the flat vs. the sharded layout
+
+    python benchmarks/bench_paths.py [n_measurements] [shard_size]
+"""
+
+import datetime
+import os, sys, time
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+import mke_client.filesys_storage_api as filesys
+from mke_client.filesys_storage_api import PathPlanner
+
+extensions = {'ACU': '.parquet', 'RFC': '.csv', 'MWS': '.csv', 'OCS': '.csv'}
+t0 = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def per_file(basedir, times, meas_ids, make_dir):
+    return [{key: filesys.get_exp_save_pth_datafile(basedir, t, 1, meas_id, key, extension=ext, make_dir=make_dir)
+             for key, ext in extensions.items()} for t, meas_id in zip(times, meas_ids)]
+
+
+def planned(basedir, times, meas_ids, make_dir):
+    return PathPlanner(basedir, 1).get_pathes(times, meas_ids, extensions, make_dir=make_dir)
+
+
+def run(n=20000, shard_size=1000):
+    times = [t0 + datetime.timedelta(seconds=10 * i) for i in range(n)]
+    meas_ids = list(range(1, n + 1))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for make_dir in [False, True]:
+            res = {}
+            for name, fun in [('per file', per_file), ('PathPlanner', planned)]:
+                t = time.perf_counter()
+                res[name] = fun(tmpdir, times, meas_ids, make_dir)
+                res[name + ' dt'] = time.perf_counter() - t
+            assert res['per file'] == res['PathPlanner']
+            print(f'{n} x {len(extensions)} pathes, make_dir={make_dir!s:5}: per file {res["per file dt"]*1e3:7.1f} ms  '
+                  f'PathPlanner {res["PathPlanner dt"]*1e3:6.1f} ms  ({res["per file dt"]/res["PathPlanner dt"]:.1f}x)')
+
+        pathes = PathPlanner(tmpdir, 1, shard_size=shard_size).get_pathes(times, meas_ids, extensions)
+        per_dir = {}
+        for p in pathes:
+            for pth in p.values():
+                d = os.path.dirname(pth)
+                per_dir[d] = per_dir.get(d, 0) + 1
+        print(f'largest directory: flat {n * len(extensions)} entries, sharded ({shard_size} ids per shard) {max(per_dir.values())} entries in {len(per_dir)} shards')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
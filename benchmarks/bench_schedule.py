@@ -0,0 +1,93 @@
+"""
+time to build the expected schedule (tstart/tend) and check it for overlaps for
+n scripts with the previous row by row implementation vs. the vectorized
+get_expected_schedule/find_overlaps. The row by row version is skipped above
+max_n_rowwise rows
+
+    python benchmarks/bench_schedule.py [n_rows ...]
+"""
+
+import datetime
+import os, sys, time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.remexlib import get_expected_schedule, find_overlaps, parse_zulutime
+
+max_n_rowwise = 100000
+
+
+def make_scripts(n, n_antennas=10):
+    # about a year of scripts spread over n_antennas
+    rng = np.random.default_rng(0)
+    t0 = pd.Timestamp('2023-01-01', tz='UTC')
+    tstart = t0 + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, n), unit='s')
+    started = rng.random(n) < 0.5
+    return pd.DataFrame({
+        'antenna_id': rng.choice([f'ant_{i}' for i in range(n_antennas)], n),
+        'start_condition': tstart.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'time_started_iso': np.where(started, tstart.strftime('%Y-%m-%dT%H:%M:%SZ'), None),
+        'time_finished_iso': None,
+        'duration_expected_hr_dec': rng.uniform(0.01, 0.5, n),
+    })
+
+
+def get_expected_schedule_rowwise(df):
+    # the previous implementation
+    def get_starttime(row):
+        if 'time_started_iso' in row and row['time_started_iso']:
+            return parse_zulutime(row['time_started_iso'])
+        elif parse_zulutime(row['start_condition']):
+            return parse_zulutime(row['start_condition'])
+
+    def get_endtime(row):
+        if 'time_finished_iso' in row and row['time_finished_iso']:
+            return row['time_finished_iso']
+        elif row['tstart'] is not None and row['duration_expected_hr_dec'] is not None:
+            return row['tstart'] + datetime.timedelta(hours=row['duration_expected_hr_dec'])
+        else:
+            return row['tstart'] + datetime.timedelta(minutes=1)
+
+    df['tstart'] = pd.Series({i: get_starttime(row) for i, row in df.iterrows()})
+    df['tend'] = pd.Series({i: (get_endtime(row) if not pd.isnull(row['tstart']) else None) for i, row in df.iterrows()})
+    return df
+
+
+def find_overlaps_rowwise(df_in):
+    # the previous raise_on_overlap loop, collecting instead of asserting
+    n = 0
+    for antenna_id in df_in['antenna_id'].unique():
+        df = df_in[df_in['antenna_id'] == antenna_id]
+        df = df.sort_values('tstart')
+        n += np.sum(df['tend'].iloc[:-1].values >= df['tstart'].iloc[1:].values)
+    return n
+
+
+def run(ns=(10000, 100000, 1000000)):
+    for n in ns:
+        df = make_scripts(n)
+
+        t0 = time.perf_counter()
+        dfs = get_expected_schedule(df.copy())
+        t1 = time.perf_counter()
+        overlaps = find_overlaps(dfs)
+        t2 = time.perf_counter()
+        line = f'rows: {n:8d}  vectorized: schedule {t1-t0:7.3f}s  overlaps {t2-t1:7.3f}s ({len(overlaps)} found)'
+
+        if n <= max_n_rowwise:
+            t0 = time.perf_counter()
+            dfr = get_expected_schedule_rowwise(df.copy())
+            t1 = time.perf_counter()
+            n_overlaps = find_overlaps_rowwise(dfr)
+            t2 = time.perf_counter()
+            line += f'  |  row by row: schedule {t1-t0:7.3f}s  overlaps {t2-t1:7.3f}s'
+        print(line)
+
+
+if __name__ == '__main__':
+    run([int(n) for n in sys.argv[1:]] if len(sys.argv) > 1 else (10000, 100000, 1000000))
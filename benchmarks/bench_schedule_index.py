@@ -0,0 +1,66 @@
+"""
+cost of what-if placements of new scripts into an existing schedule of n scripts:
+rebuilding the schedule DataFrame and checking it for overlaps for every placement
+vs. querying and updating a ScheduleIndex
+
+    python benchmarks/bench_schedule_index.py [n_rows] [n_placements]
+"""
+
+import os, sys, time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+from bench_schedule import make_scripts
+from mke_client.remexlib import get_expected_schedule, find_overlaps
+from mke_client.schedule import ScheduleIndex
+
+
+def run(n=10000, n_placements=1000, n_rebuild=20):
+    df = make_scripts(n)
+    df['id'] = np.arange(n)
+    candidates = make_scripts(n_placements).to_dict('records')
+
+    # rebuild: append the candidate, build the schedule and look for overlaps of the candidate
+    t0 = time.perf_counter()
+    for row in candidates[:n_rebuild]:
+        dfc = pd.concat([df, pd.DataFrame([{**row, 'id': -1}])], ignore_index=True)
+        overlaps = find_overlaps(get_expected_schedule(dfc))
+        ok = not (dfc.loc[overlaps['index_b'], 'id'] == -1).any() and not (dfc.loc[overlaps['index_a'], 'id'] == -1).any()
+    dt_rebuild = (time.perf_counter() - t0) / n_rebuild
+
+    t0 = time.perf_counter()
+    index = ScheduleIndex(df)
+    dt_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    n_ok = 0
+    for row in candidates:
+        if not index.conflicts(row):
+            index.add(row, id='candidate')
+            n_ok += 1
+            index.remove('candidate')
+    dt_index = (time.perf_counter() - t0) / n_placements
+
+    t0 = time.perf_counter()
+    for row in candidates:
+        index.next_free_slot(row['antenna_id'], row['duration_expected_hr_dec'], after=row['start_condition'])
+    dt_slot = (time.perf_counter() - t0) / n_placements
+
+    print(f'rows: {n}  (index built in {dt_build:.3f}s)')
+    print(f'   rebuild + find_overlaps: {dt_rebuild*1e3:9.3f} ms/placement')
+    print(f'   ScheduleIndex:           {dt_index*1e3:9.3f} ms/placement  ({n_ok}/{n_placements} free)')
+    print(f'   next_free_slot:          {dt_slot*1e3:9.3f} ms/query')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+    else:
+        run(10000)
+        run(100000)
@@ -0,0 +1,78 @@
+"""
+"all ticks with elevation above 80 deg" on a synthetic multi-year archive of
+ACU parquet files with statistics sidecars: fraction of files the catalog skips
+by their statistics and the speedup over opening every file
+
+    python benchmarks/bench_stats.py [years] [ticks_per_day] [rows_per_tick]
+"""
+
+import datetime
+import os, sys, time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+import mke_client.filesys_storage_api as filesys
+from mke_client.catalog import Catalog
+from mke_client.writer import write_dataframe, write_stats, compute_stats
+
+t0 = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_archive(root, years, ticks_per_day, n_rows):
+    rng = np.random.default_rng(0)
+    n_days = int(365 * years)
+    for day in range(n_days):
+        tday = t0 + datetime.timedelta(days=day)
+        basedir = filesys.get_exp_save_dir(root, tday, day + 1, 'ant1', 'bench', make_dir=True)
+        os.makedirs(os.path.join(basedir, 'data_raw'), exist_ok=True)
+        for i in range(ticks_per_day):
+            t = tday + datetime.timedelta(hours=24 * i / ticks_per_day)
+            # a slow track, which only rarely comes close to zenith
+            peak = 70 + 15 * rng.random() ** 8
+            df = pd.DataFrame({
+                'azimuth': np.linspace(0, 360, n_rows) + rng.normal(size=n_rows),
+                'elevation': np.linspace(15, peak, n_rows),
+                'tracking_error': np.abs(rng.normal(scale=0.01, size=n_rows)),
+            }, index=pd.Index(pd.date_range(t, periods=n_rows, freq='1s'), name='time'))
+            pth = filesys.get_exp_save_pth_datafile(basedir, t, day + 1, i + 1, 'ACU', extension='.parquet')
+            write_dataframe(df, pth)
+            write_stats(pth, compute_stats(df))
+    return n_days * ticks_per_day
+
+
+def run(years=2, ticks_per_day=4, n_rows=3600):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.join(tmpdir, 'output')
+        t = time.perf_counter()
+        n_files = make_archive(root, years, ticks_per_day, n_rows)
+        print(f'files: {n_files} ({years} years, {ticks_per_day} ticks/day, {n_rows} rows/tick, made in {time.perf_counter() - t:.1f} s)')
+
+        with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+            t = time.perf_counter()
+            catalog.scan()
+            print(f'{"scan":>12}: {time.perf_counter() - t:7.3f} s')
+
+            ranges = {'elevation': (80, None)}
+            n_candidates = catalog.count(device='ACU', ranges=ranges)
+            results = {}
+            for use_stats in [False, True]:
+                t = time.perf_counter()
+                df = catalog.query(ranges, columns=['elevation'], use_stats=use_stats, device='ACU')
+                results[use_stats] = (time.perf_counter() - t, len(df))
+
+        (dt_all, n_all), (dt_stats, n_stats) = results[False], results[True]
+        assert n_all == n_stats
+        print(f'{"skipped":>12}: {n_files - n_candidates} of {n_files} files ({(n_files - n_candidates) / n_files:.1%})')
+        print(f'{"query":>12}: all files {dt_all:7.3f} s  with stats {dt_stats:7.3f} s  ({dt_all/dt_stats:.1f}x, {n_stats} rows found)')
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 2,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 3600)
@@ -0,0 +1,57 @@
+"""
+many small ticks written as one file per measurement (arrow) vs. appended to one
+stream file per device: total write time, number of files, time to list the data
+directory and to read back random single measurements
+
+    python benchmarks/bench_stream.py [n_ticks] [rows_per_tick]
+"""
+
+import os, sys, time
+import random
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.locallib import LocalExperiment
+from mke_client.writer import MeasurementWriter, read_measurement
+
+
+def make_frame(n_rows, n_channels=20):
+    rng = np.random.default_rng(n_rows)
+    t = pd.date_range('2023-01-01', periods=n_rows, freq='50ms', tz='UTC')
+    return pd.DataFrame({f'ch_{i:02d}': rng.normal(size=n_rows) for i in range(n_channels)}, index=pd.Index(t, name='time'))
+
+
+def run(n_ticks=3000, rows_per_tick=20, n_reads=500):
+    df, df_aux = make_frame(rows_per_tick), make_frame(rows_per_tick, 5)
+    print(f'ticks: {n_ticks}  rows per tick: {rows_per_tick}')
+    for fmt in ['arrow', 'stream']:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with LocalExperiment(1, fallback_local_basepath=tmpdir, backend='memory') as exp, MeasurementWriter(exp, fmt) as writer:
+                t0 = time.perf_counter()
+                written = [writer.write(df, {'RFC': df_aux}) for i in range(n_ticks)]
+                dt_write = time.perf_counter() - t0
+
+                data_dir = os.path.dirname(written[0][0])
+                t0 = time.perf_counter()
+                n_files = len(os.listdir(data_dir))
+                dt_list = time.perf_counter() - t0
+
+                sample = random.Random(0).sample(written, min(n_reads, n_ticks))
+                t0 = time.perf_counter()
+                for main_path, main_id, aux in sample:
+                    read_measurement(main_path)
+                dt_read = (time.perf_counter() - t0) / len(sample)
+
+        print(f'{fmt:>7}: write {dt_write/n_ticks*1e3:6.3f} ms/tick  files {n_files:6d}  listdir {dt_list*1e3:7.2f} ms  '
+              f'read one {dt_read*1e3:6.3f} ms')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,47 @@
+"""
+compare one-connection-per-call requests against the pooled Transport
+using a local stand-in dbserver
+
+    python benchmarks/bench_transport.py [n_calls]
+"""
+
+import os, sys, time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+import requests
+
+from dbserver_stub import DbServerStub
+from mke_client.transport import Transport
+
+
+def run(n_calls=2000):
+    tables = {'experiments': {1: {'id': 1, 'status': 'RUNNING'}}}
+    with DbServerStub(tables) as srv:
+        url = srv.uri + '/experiments/1'
+
+        t0 = time.perf_counter()
+        for _ in range(n_calls):
+            requests.get(url).json()
+        dt_plain = time.perf_counter() - t0
+        n_conn_plain = srv.n_connections
+
+        with Transport() as transport:
+            t0 = time.perf_counter()
+            for _ in range(n_calls):
+                transport.get(url).json()
+            dt_pooled = time.perf_counter() - t0
+            stats = transport.stats()
+
+    print(f'calls:              {n_calls}')
+    print(f'requests.get:       {dt_plain / n_calls * 1e6:8.1f} us/call  ({n_conn_plain} connections)')
+    print(f'Transport.get:      {dt_pooled / n_calls * 1e6:8.1f} us/call  ({stats["connections_opened"]} connections)')
+    print(f'speedup:            {dt_plain / dt_pooled:8.2f} x')
+    print(f'pooled stats:       {stats}')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,78 @@
+"""
+peak resident memory of uploading a file with the in memory requests multipart
+encoding vs. the streaming MultipartEncoder used by Experiment.upload_new_datafile
+
+    python benchmarks/bench_upload.py [size_mb ...]
+"""
+
+import os, sys, time
+import json
+import resource
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """reads and discards the request body in chunks"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        n = int(self.headers['Content-Length'])
+        while n > 0:
+            n -= len(self.rfile.read(min(n, 1024 * 1024)))
+        body = json.dumps({'id': 1, 'path': 'x', 'aux_files': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def client(mode, uri, pth):
+    import requests
+    from mke_client.rimlib import Experiment
+
+    t0 = time.perf_counter()
+    if mode == 'requests':
+        with open(pth, 'rb') as fp:
+            requests.post(uri + '/upload_measurement_data', files={'ACU': fp})
+    else:
+        Experiment(1, uri).upload_new_datafile(pth)
+    dt = time.perf_counter() - t0
+    print(json.dumps({'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'dt': dt}))
+
+
+def run(sizes_mb):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SinkHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    uri = 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+
+    print(f'{"size_mb":>8} {"mode":>10} {"peak_rss_mb":>12} {"time_s":>8}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in sizes_mb:
+            pth = os.path.join(tmpdir, f'{size}.bin')
+            with open(pth, 'wb') as fp:
+                for _ in range(size):
+                    fp.write(os.urandom(1024 * 1024))
+
+            for mode in ['requests', 'streaming']:
+                out = subprocess.check_output([sys.executable, __file__, '--client', mode, uri, pth])
+                res = json.loads(out)
+                print(f'{size:>8} {mode:>10} {res["maxrss_mb"]:>12.1f} {res["dt"]:>8.2f}')
+            os.remove(pth)
+    httpd.shutdown()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--client':
+        client(*sys.argv[2:])
+    else:
+        run([int(a) for a in sys.argv[1:]] if len(sys.argv) > 1 else [16, 64, 256])
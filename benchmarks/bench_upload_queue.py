@@ -0,0 +1,43 @@
+"""
+tick latency of a control loop which uploads one measurement per tick, blocking
+vs. through the background UploadQueue, against a stand-in dbserver with a slow link
+
+    python benchmarks/bench_upload_queue.py [n_ticks] [upload_s]
+"""
+
+import io
+import os, sys, time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, parent_dir + '/tests')
+
+from dbserver_stub import DbServerStub
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment
+from mke_client.upload_queue import UploadQueue
+
+
+def run(n_ticks=20, upload_s=0.2):
+    def upload(handler, body):
+        time.sleep(upload_s)
+        return 200, {'id': 1, 'path': 'p', 'aux_files': []}
+
+    with DbServerStub() as srv, Transport() as transport:
+        srv.routes[('POST', 'upload_measurement_data')] = upload
+        for block in [True, False]:
+            exp = Experiment(1, srv.uri, transport=transport, upload_queue=UploadQueue(max_workers=4, max_pending=n_ticks))
+            ticks = []
+            t_start = time.perf_counter()
+            for _ in range(n_ticks):
+                t0 = time.perf_counter()
+                exp.upload_new_datafile(io.BytesIO(os.urandom(1024)), block=block)
+                ticks.append(time.perf_counter() - t0)
+            exp.close()
+            dt_total = time.perf_counter() - t_start
+            print(f'block={block!s:5}  tick upload latency mean {sum(ticks)/len(ticks)*1e3:8.2f} ms  max {max(ticks)*1e3:8.2f} ms  total incl. flush {dt_total:6.2f} s')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20, float(sys.argv[2]) if len(sys.argv) > 2 else 0.2)
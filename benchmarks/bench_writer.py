@@ -0,0 +1,70 @@
+"""
+write time, file size and read time of one tick of 20 Hz ACU telemetry (plus
+aux files) per format, written through MeasurementWriter on a LocalExperiment,
+and reading back only two columns
+
+    python benchmarks/bench_writer.py [seconds_per_tick] [n_channels] [n_aux]
+"""
+
+import importlib.util
+import os, sys, time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client.locallib import LocalExperiment
+from mke_client.writer import MeasurementWriter, read_measurement
+
+
+def make_frame(n_rows, n_channels, seed=0):
+    rng = np.random.default_rng(seed)
+    t = pd.date_range('2023-01-01', periods=n_rows, freq='50ms', tz='UTC')
+    data = {f'ch_{i:03d}': np.cumsum(rng.normal(size=n_rows)) for i in range(n_channels)}
+    data['mode'] = pd.Categorical(rng.choice(['TRACK', 'SLEW', 'STOW'], n_rows))
+    data['n_errors'] = rng.integers(0, 3, n_rows).astype(np.int16)
+    return pd.DataFrame(data, index=pd.Index(t, name='time'))
+
+
+def run(seconds=600, n_channels=40, n_aux=3, repeat=3):
+    n_rows = int(seconds * 20)
+    df = make_frame(n_rows, n_channels)
+    aux = {f'AUX{i}': make_frame(n_rows, n_channels // 4, seed=i + 1) for i in range(n_aux)}
+    fmts = ['csv', 'parquet', 'arrow'] + (['hdf5'] if importlib.util.find_spec('tables') is not None else [])
+
+    print(f'rows: {n_rows}  channels: {n_channels}  aux files: {n_aux}')
+    results = {}
+    for fmt in fmts:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with LocalExperiment(1, fallback_local_basepath=tmpdir, backend='memory') as exp:
+                for max_workers in [1, None]:
+                    with MeasurementWriter(exp, fmt, max_workers=max_workers) as writer:
+                        writer.write(df.iloc[:10], {k: v.iloc[:10] for k, v in aux.items()})    # warm up (imports)
+                        dts = []
+                        for i in range(repeat):
+                            t0 = time.perf_counter()
+                            main_path, main_id, aux_pathes = writer.write(df, aux)
+                            dts.append(time.perf_counter() - t0)
+                    results[(fmt, max_workers)] = min(dts)
+
+                size = os.path.getsize(main_path)
+                t0 = time.perf_counter()
+                read_measurement(main_path)
+                dt_read = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                read_measurement(main_path, columns=['ch_000', 'mode'])
+                dt_cols = time.perf_counter() - t0
+
+        dt_seq, dt_par = results[(fmt, 1)], results[(fmt, None)]
+        print(f'{fmt:>8}: write {dt_seq*1e3:8.1f} ms (parallel {dt_par*1e3:8.1f} ms)  size {size/1e6:7.2f} MB  '
+              f'read {dt_read*1e3:7.1f} ms  2 columns {dt_cols*1e3:7.1f} ms')
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 600,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 40,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 3)
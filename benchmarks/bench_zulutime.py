@@ -0,0 +1,83 @@
+"""
+microbenchmarks for parsing and formatting zulu time strings: the previous
+regex + dateutil implementation vs. the fixed format fast path (with and without
+hitting the cache) and the vectorized parse_zulutimes
+
+    python benchmarks/bench_zulutime.py [n]
+"""
+
+import datetime
+import os, re, sys, time
+
+import dateutil.parser
+import pytz
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+
+from mke_client import helpers
+from mke_client.helpers import make_zulustr, parse_zulutime, parse_zulutimes
+
+
+def parse_zulutime_old(s):
+    try:
+        if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}Z', s) is not None:
+            s = s[:-1] + 'T00:00:00Z'
+        return dateutil.parser.isoparse(s).replace(tzinfo=pytz.utc)
+    except Exception:
+        return None
+
+
+def make_zulustr_old(dtobj, remove_ms=True):
+    utc = dtobj.replace(tzinfo=pytz.utc)
+    if remove_ms:
+        utc = utc.replace(microsecond=0)
+    return utc.isoformat().replace('+00:00','') + 'Z'
+
+
+def timeit(fun, values):
+    t0 = time.perf_counter()
+    for v in values:
+        fun(v)
+    return (time.perf_counter() - t0) / len(values)
+
+
+def run(n=100000):
+    t = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    times = [t + datetime.timedelta(seconds=i, microseconds=i * 7 % 1000000) for i in range(n)]
+    formats = {
+        'seconds': [make_zulustr(x) for x in times],
+        'microseconds': [make_zulustr(x, remove_ms=False) for x in times],
+        'date only': [make_zulustr(t + datetime.timedelta(days=i % 36500))[:10] + 'Z' for i in range(n)],
+        'offset (fallback)': [x.isoformat() for x in times],
+    }
+
+    print(f'strings: {n}')
+    for name, values in formats.items():
+        dt_old = timeit(parse_zulutime_old, values)
+        helpers._parse_zulutime.cache_clear()
+        dt_new = timeit(parse_zulutime, values)
+        # the same few strings over and over (e.g. start_condition of the same scripts)
+        repeated = values[:100] * (n // 100)
+        dt_cached = timeit(parse_zulutime, repeated)
+        print(f'{name:>18}: old {dt_old*1e6:6.2f} us  new {dt_new*1e6:6.2f} us  cached {dt_cached*1e6:6.2f} us  ({dt_old/dt_new:5.1f}x / {dt_old/dt_cached:5.1f}x)')
+
+    values = formats['seconds']
+    parse_zulutimes(values[:10])    # warm up (imports pandas)
+    t0 = time.perf_counter()
+    [parse_zulutime_old(s) for s in values]
+    dt_loop = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    parse_zulutimes(values)
+    dt_vec = time.perf_counter() - t0
+    print(f'{"vectorized":>18}: loop {dt_loop:.3f} s  parse_zulutimes {dt_vec:.3f} s  ({dt_loop/dt_vec:.1f}x)')
+
+    for remove_ms in [True, False]:
+        dt_old = timeit(lambda x: make_zulustr_old(x, remove_ms), times)
+        dt_new = timeit(lambda x: make_zulustr(x, remove_ms), times)
+        print(f'{"make_zulustr":>18}: old {dt_old*1e6:6.2f} us  new {dt_new*1e6:6.2f} us  ({dt_old/dt_new:5.1f}x, remove_ms={remove_ms})')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
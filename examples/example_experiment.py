@@ -168,15 +168,16 @@ while tickcount < n_ticks_max:
     tickcount += 1
     
     # ---------------------------------------
-    # check if I should stop
+    # check if I should stop (single fetch of my row per tick)
     # ---------------------------------------
-    
-    if my_dbobject.get_remaining_time() <= ticklen*1.1:
+    state = my_dbobject.poll()
+
+    if state.remaining_hours <= ticklen*1.1 / 60 / 60:
         print(make_zulustr(get_utcnow()) + ' | Time is up... finshing')
         my_row_as_dict = my_dbobject.set_status_finishing()
         break
         
-    if my_dbobject.check_for_cancel():
+    if state.cancel_requested:
         print(make_zulustr(get_utcnow()) + ' | Cancle initiated from externally... cancelling')
         my_row_as_dict = my_dbobject.set_status_cancelling()
         break
@@ -1 +1,41 @@
-__version__ = '1.0.0'
\ No newline at end of file
+__version__ = '1.0.0'
+
+import logging
+
+# the library only emits log records. Where they go is up to the application
+# (or configure_logging below)
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+default_log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level=logging.INFO, stream=None, fmt:str=default_log_format) -> logging.Handler:
+    """opt in to printing the log messages of all mke_client modules. Calling it
+    again replaces the handler added before, so records are never printed twice.
+
+    Example::
+
+        import mke_client
+        mke_client.configure_logging(logging.DEBUG)
+
+    Args:
+        level (int, optional): the minimum level to print. Defaults to logging.INFO.
+        stream (file like, optional): where to write to. Defaults to None for sys.stdout.
+        fmt (str, optional): the log format. Defaults to default_log_format.
+
+    Returns:
+        logging.Handler: the handler which was added to the mke_client logger
+    """
+    import sys
+
+    logger = logging.getLogger(__name__)
+    for handler in list(logger.handlers):
+        if getattr(handler, '_mke_client_configured', False):
+            logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    handler.setFormatter(logging.Formatter(fmt))
+    handler._mke_client_configured = True
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
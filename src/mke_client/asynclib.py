@@ -0,0 +1,346 @@
+#!/usr/bin/python3
+"""
+(async)io variants of the rimlib Experiment and Analysis objects for monitoring
+many experiments or analyses concurrently from a single event loop
+
+needs aiohttp installed (pip install mke_client[async])
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import datetime
+
+import logging
+
+try:
+    import aiohttp
+except ImportError as err:
+    raise ImportError('mke_client.asynclib needs aiohttp to be installed. Install it with: "pip install mke_client[async]"') from err
+
+from mke_client.cache import RowCache
+from mke_client.transport import default_timeout
+from mke_client.rimlib import allowed_status_codes, TickState, _is_cancel_requested, _get_remaining_hours, _make_tick_state, _get_extensions, _make_measurement_payload
+
+_log = logging.getLogger(__name__)
+
+
+class AsyncResponse():
+    """the already read response to a request sent through an AsyncTransport"""
+    def __init__(self, status_code:int, headers:dict, text:str):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+async def _close_at_shutdown(session):
+    # an async generator is finalized by loop.shutdown_asyncgens() before the loop is closed
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+class AsyncTransport():
+    """A pooled asyncio HTTP transport with keep-alive connections to share
+    between any number of AsyncExperiment and AsyncAnalysis objects.
+    At most max_concurrency requests will be in flight at the same time.
+
+    Example::
+
+        async with AsyncTransport(max_concurrency=200) as transport:
+            exps = [AsyncExperiment(i, 'http://localhost:8080', transport=transport) for i in ids]
+            states = await poll_all(exps)
+
+    Args:
+        max_concurrency (int, optional): max number of concurrent requests and open connections. Defaults to 100.
+        timeout (float or tuple, optional): default (connect, read) timeout in seconds. Defaults to default_timeout.
+    """
+    def __init__(self, max_concurrency:int=100, timeout=default_timeout):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+        self._closer = None
+        self.reset_stats()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            # the session belongs to another event loop (e.g. of an earlier asyncio.run())
+            session, self._session = self._session, None
+            await self._close_foreign_session(session, self._loop)
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=None, connect=connect, sock_read=read))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            # close the session when the loop shuts down (e.g. at the end of asyncio.run()), while it can still be done cleanly
+            self._closer = _close_at_shutdown(self._session)
+            await self._closer.__anext__()
+        return self._session
+
+    @staticmethod
+    async def _close_foreign_session(session:aiohttp.ClientSession, loop):
+        if loop.is_running():
+            # still in use by another thread, its connections have to be closed there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # the connections of a closed loop are only dropped
+            await session.close()
+
+    async def request(self, method:str, url:str, **kwargs) -> AsyncResponse:
+        """send a request through the pooled session. Takes the same
+        keyword arguments as aiohttp.ClientSession.request"""
+        session = await self._get_session()
+        async with self._semaphore:
+            t0 = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as r:
+                    ret = AsyncResponse(r.status, dict(r.headers), await r.text())
+            except Exception:
+                self._n_failed += 1
+                raise
+            dt = time.perf_counter() - t0
+
+        self._n_requests += 1
+        self._latency_total += dt
+        self._latency_max = max(self._latency_max, dt)
+        return ret
+
+    async def get(self, url, **kwargs) -> AsyncResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs) -> AsyncResponse:
+        return await self.request('POST', url, **kwargs)
+
+    async def patch(self, url, **kwargs) -> AsyncResponse:
+        return await self.request('PATCH', url, **kwargs)
+
+    def reset_stats(self):
+        """reset all request and latency counters"""
+        self._n_requests = 0
+        self._n_failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def stats(self) -> dict:
+        """get the request and latency statistics for this transport
+
+        Returns:
+            dict: with the keys requests, failed, latency_mean_s, latency_max_s
+        """
+        n = self._n_requests
+        return {
+            'requests': n,
+            'failed': self._n_failed,
+            'latency_mean_s': self._latency_total / n if n else None,
+            'latency_max_s': self._latency_max if n else None,
+        }
+
+    async def close(self):
+        """close all pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+__default_transport = None
+
+def get_default_async_transport() -> AsyncTransport:
+    """get the process wide AsyncTransport which is used by all objects
+    not given a transport explicitly (created on first use)"""
+    global __default_transport
+    if __default_transport is None:
+        __default_transport = AsyncTransport()
+    return __default_transport
+
+
+
+class AsyncBaseRimObj():
+    """base object to have the AsyncAnalysis and AsyncExperiment
+    classes inherit from. Same methods as rimlib.BaseRimObj, but
+    as coroutines.
+    """
+    def __init__(self, uri, tablename, id, transport:AsyncTransport=None, cache:RowCache=None):
+        self.uri = uri
+        self.__tablename = tablename
+        self.id = id
+        self._transport = transport
+        self.cache = cache
+
+    @property
+    def tablename(self):
+        """this objects associated table name"""
+        return self.__tablename
+
+    @property
+    def transport(self) -> AsyncTransport:
+        """the pooled asyncio HTTP transport used for all requests of this object"""
+        return self._transport if self._transport is not None else get_default_async_transport()
+
+    async def get(self, tablename=None, id=None, **kwargs):
+        if id is None:
+            id = self.id
+        if tablename is None:
+            tablename = self.tablename
+
+        row, etag, fresh = self.cache.lookup(tablename, id) if self.cache is not None and not kwargs else (None, None, False)
+        if fresh:
+            return row
+        if etag and row is not None:
+            kwargs['headers'] = {'If-None-Match': etag}
+
+        r = await self.transport.get(f'{self.uri}/{tablename}/{id}', **kwargs)
+        if r.status_code == 304 and row is not None:
+            self.cache.revalidated(tablename, id)
+            return row
+
+        assert r.status_code  == 200, r.text
+        row = r.json()
+        if self.cache is not None:
+            self.cache.store(tablename, id, row, r.headers.get('ETag'))
+        return row
+
+    async def patch_me(self, **kwargs):
+        r = await self.transport.patch(f'{self.uri}/{self.tablename}/{self.id}', **kwargs)
+        assert r.status_code < 300, r.text
+        row = r.json()
+        if self.cache is not None:
+            self.cache.store(self.tablename, self.id, row, r.headers.get('ETag'))
+        return row
+
+    async def post(self, route, **kwargs):
+        r = await self.transport.post(f'{self.uri}/{route}', **kwargs)
+        assert r.status_code < 300, r.text
+        return r.json()
+
+    async def get_me(self) -> dict:
+        """returns the database entry row associated with this objects id as dictionary"""
+        return await self.get()
+
+    async def get_my_antenna(self, row:dict=None) -> dict:
+        """returns the antenna entry row associated with this objects antenna_id as dictionary"""
+        me = row if row is not None else await self.get()
+        return await self.get('antennas', me['antenna_id'])
+
+    async def set_status(self, new_status:str, ignore_enum=False) -> dict:
+        """set a new status to my object in the DB and return the updated
+        remote object as dictionary. See rimlib.BaseRimObj.set_status"""
+        assert new_status in allowed_status_codes or ignore_enum, "the given status was not within the allowed status strings: allowed are: " + ', '.join(allowed_status_codes.keys())
+        return await self.patch_me(json=dict(status=new_status))
+
+    async def set_status_cancelling(self) -> dict:
+        return await self.set_status('CANCELLING')
+
+    async def set_status_finishing(self) -> dict:
+        return await self.set_status('FINISHING')
+
+    async def set_status_running(self) -> dict:
+        return await self.set_status('RUNNING')
+
+    async def check_for_cancel(self, row:dict=None) -> bool:
+        """gets the remote table row associated with me and returns whether or not a cancel was requested"""
+        me = row if row is not None else await self.get()
+        return _is_cancel_requested(me)
+
+    async def get_remaining_time(self, t_is: datetime.datetime = None, row:dict=None) -> float:
+        """gets my remote object and returns the remaining time in hours for this script to run"""
+        me = row if row is not None else await self.get()
+        return _get_remaining_hours(me, t_is)
+
+    async def poll(self, t_is: datetime.datetime = None) -> TickState:
+        """fetches my remote object once and returns a TickState snapshot. See rimlib.BaseRimObj.poll"""
+        return _make_tick_state(await self.get(), t_is)
+
+
+
+class AsyncExperiment(AsyncBaseRimObj):
+    """An asyncio interface object to get access to experiments in the
+    database. See rimlib.Experiment for the documentation of all methods."""
+    __tablename = 'experiments'
+    def __init__(self, id, uri = None, transport:AsyncTransport=None, cache:RowCache=None):
+        if uri is None:
+            uri = os.environ.get('DBSERVER_URI')
+        assert uri, 'need to give a valid URI for a DB connection!'
+        super().__init__(uri, self.__tablename, id, transport=transport, cache=cache)
+
+    async def get_expected_devices(self, row:dict=None):
+        """returns a list of strings with the devices which are expected with this measurement"""
+        dc = row if row is not None else await self.get()
+        return json.loads(dc['devices_json'])
+
+    async def get_path_for_new_datafile(self, devices_to_add = {'ACU': '.csv'}, start_time=None, tag=None):
+        """register a set of files and return the save pathes for a measurement
+
+        Returns:
+            path (str): path, where the file was saved on the server
+            id (int): id this file has been given
+            aux_files (list): auxiliary files as list of tuples with (key, id, path)
+        """
+        payload = _make_measurement_payload(self.id, start_time, tag, _get_extensions(devices_to_add))
+        dc = await self.post('register_measurement_data', json=payload)
+        return dc['path'], dc['id'], dc['aux_files']
+
+    async def upload_new_datafile(self, data_file, aux_files = {}, start_time=None, tag=None):
+        """upload a set of files for a measurement consisting of a main measurement file and a dictionary
+        of auxiliary data files connected with the main file.
+
+        Returns:
+            path (str): path, where the file was saved on the server
+            id (int): id this file has been given
+            aux_files (list): auxiliary files as list of tuples with (key, id, path)
+        """
+        payload = _make_measurement_payload(self.id, start_time, tag)
+
+        with contextlib.ExitStack() as stack:
+            form = aiohttp.FormData()
+            form.add_field('json', json.dumps(payload), content_type='application/json')
+            for key, f in {'ACU': data_file, **aux_files}.items():
+                fp = f if hasattr(f, 'read') else stack.enter_context(open(f, 'rb'))
+                form.add_field(key, fp, filename=os.path.basename(getattr(fp, 'name', key)))
+
+            dc = await self.post('upload_measurement_data', data=form)
+        return dc['path'], dc['id'], dc['aux_files']
+
+
+
+class AsyncAnalysis(AsyncBaseRimObj):
+    """An asyncio interface object to get access to analyses in the
+    database. See rimlib.Analysis"""
+    __tablename = 'analyses'
+    def __init__(self, id, uri = None, transport:AsyncTransport=None, cache:RowCache=None):
+        if uri is None:
+            uri = os.environ.get('DBSERVER_URI')
+        assert uri, 'need to give a valid URI for a DB connection!'
+        super().__init__(uri, self.__tablename, id, transport=transport, cache=cache)
+
+
+
+async def poll_all(objs, t_is: datetime.datetime = None, return_exceptions=False) -> list:
+    """poll a list of AsyncExperiment and/or AsyncAnalysis objects concurrently
+
+    Args:
+        objs (list): the objects to poll
+        t_is (datetime.datetime, optional): the time to calculate the remaining time for. Defaults to None for utcnow.
+        return_exceptions (bool, optional): set True to return exceptions in the result list instead of raising the first one. Defaults to False.
+
+    Returns:
+        list: TickState objects in the same order as objs
+    """
+    return await asyncio.gather(*[obj.poll(t_is) for obj in objs], return_exceptions=return_exceptions)
@@ -0,0 +1,546 @@
+#!/usr/bin/python3
+"""
+storage backends which Experiment, Analysis and LocalExperiment objects read and
+write their rows and register measurement files through. A backend is selected
+by the scheme of its URI, see open_backend
+"""
+
+import abc
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+from mke_client.helpers import parse_zulutime
+import mke_client.filesys_storage_api as filesys
+from mke_client.transport import Transport, get_default_transport
+from mke_client.cache import RowCache
+from mke_client.upload import MultipartEncoder, ResumableUploader, default_chunk_size
+
+_log = logging.getLogger(__name__)
+
+
+add_to_json = lambda fld, to_add: json.dumps({**(json.loads(fld) if fld else {}), **to_add})
+
+
+class StorageBackend(abc.ABC):
+    """Interface all storage backends implement. The register methods take the same
+    payloads as the dbserver routes of the same name and return the same results::
+
+        register_measurement  {'id': experiment_id, 'row': {'time_iso', 'tags'}, 'extensions': {device: ext}}
+                              -> {'id': measurement_id, 'path': path, 'aux_files': [(device, id, path)]}
+        register_aux          {'id': experiment_id, 'extensions': {device: ext}}
+                              -> {'aux_files': [(device, id, path)]}
+        upload                route 'measurement_data' or 'exp_aux_files', the payload without the
+                              extensions and files {device: path or file object} -> same as above
+
+    Changes a backend makes to experiment and analysis rows increase n_changes, so
+    objects without long-polling can wait for them with wait_for_change().
+    """
+    uri = None
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self.n_changes = 0
+
+    def _notify_changed(self):
+        with self._changed:
+            self.n_changes += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, n_changes:int, timeout:float) -> bool:
+        """block until n_changes differs from the given one or timeout seconds passed.
+        Returns True if there was a change"""
+        with self._changed:
+            if self.n_changes == n_changes:
+                self._changed.wait(timeout)
+            return self.n_changes != n_changes
+
+    @abc.abstractmethod
+    def get_row(self, tablename:str, id) -> dict:
+        """get a row as dict"""
+
+    @abc.abstractmethod
+    def patch_row(self, tablename:str, id, dc:dict) -> dict:
+        """update the given fields of a row and return the updated row"""
+
+    @abc.abstractmethod
+    def register_measurement(self, payload:dict) -> dict:
+        """register a new measurement and its aux files and get the pathes to save them under"""
+
+    def register_measurements(self, payloads:list, max_workers:int=None) -> list:
+        """register_measurement for many payloads. Returns the results in the same order"""
+        return [self.register_measurement(payload) for payload in payloads]
+
+    @abc.abstractmethod
+    def register_aux(self, payload:dict) -> dict:
+        """register experiment level aux files and get the pathes to save them under"""
+
+    @abc.abstractmethod
+    def upload(self, route:str, payload:dict, files:dict, **kwargs) -> dict:
+        """register and store files"""
+
+    def ping(self) -> bool:
+        """True if the backend can be reached"""
+        return True
+
+    def flush(self):
+        """write all changes held back (if any)"""
+
+    def close(self):
+        """flush and release all resources"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HttpBackend(StorageBackend):
+    """Storage backend talking to a dbserver over HTTP
+
+    Args:
+        uri (str): the dbserver uri (http:// or https://)
+        transport (Transport, optional): the pooled transport to send all requests through. Defaults to None for the shared default transport.
+        cache (RowCache, optional): a row cache to serve repeated gets from within their time to live. Defaults to None for no caching.
+    """
+    def __init__(self, uri:str, transport:Transport=None, cache:RowCache=None):
+        super().__init__()
+        self.uri = uri
+        self._transport = transport
+        self.cache = cache
+        self._batch_register_supported = None
+
+    @property
+    def transport(self) -> Transport:
+        """the pooled HTTP transport used for all requests of this backend"""
+        return self._transport if self._transport is not None else get_default_transport()
+
+    def get_row(self, tablename:str, id, **kwargs) -> dict:
+        if self.cache is not None and not kwargs:
+            return self.__get_cached(tablename, id)
+        r = self.transport.get(f'{self.uri}/{tablename}/{id}', **kwargs)
+        assert r.status_code  == 200, r.text
+        return r.json()
+
+    def __get_cached(self, tablename, id):
+        row, etag, fresh = self.cache.lookup(tablename, id)
+        if fresh:
+            return row
+
+        headers = {'If-None-Match': etag} if etag and row is not None else {}
+        r = self.transport.get(f'{self.uri}/{tablename}/{id}', headers=headers)
+        if r.status_code == 304 and row is not None:
+            self.cache.revalidated(tablename, id)
+            return row
+
+        assert r.status_code  == 200, r.text
+        row = r.json()
+        self.cache.store(tablename, id, row, r.headers.get('ETag'))
+        return row
+
+    def patch_row(self, tablename:str, id, dc:dict, **kwargs) -> dict:
+        r = self.transport.patch(f'{self.uri}/{tablename}/{id}', json=dc, **kwargs)
+        assert r.status_code < 300, r.text
+        row = r.json()
+        if self.cache is not None:
+            # the server returns the updated row, which replaces the cached one
+            self.cache.store(tablename, id, row, r.headers.get('ETag'))
+        return row
+
+    def post(self, route:str, **kwargs):
+        r = self.transport.post(f'{self.uri}/{route}', **kwargs)
+        assert r.status_code < 300, r.text
+        return r.json()
+
+    def register_measurement(self, payload:dict) -> dict:
+        return self.post('register_measurement_data', json=payload)
+
+    def register_measurements(self, payloads:list, max_workers:int=None) -> list:
+        """register many measurements with a single request if the server supports batch
+        registration, else with concurrent requests over the pooled transport
+
+        Args:
+            payloads (list): the payloads as for register_measurement (all for the same experiment)
+            max_workers (int, optional): max number of concurrent requests if the server does not support
+                batch registration. Defaults to None for the transports pool_maxsize.
+        """
+        if not payloads:
+            return []
+
+        if self._batch_register_supported is not False:
+            r = self.transport.post(f'{self.uri}/register_measurement_data_batch', json={'id': payloads[0]['id'], 'items': payloads})
+            if r.status_code in (404, 405, 501):
+                _log.info('server does not support batch registration, falling back to concurrent requests')
+                self._batch_register_supported = False
+            else:
+                assert r.status_code < 300, r.text
+                self._batch_register_supported = True
+                return r.json()['results']
+
+        n_workers = max_workers if max_workers else getattr(self.transport, 'pool_maxsize', 10)
+        with ThreadPoolExecutor(max_workers=min(n_workers, len(payloads))) as executor:
+            return list(executor.map(self.register_measurement, payloads))
+
+    def register_aux(self, payload:dict) -> dict:
+        return self.post('register_exp_aux_files', json=payload)
+
+    def upload(self, route:str, payload:dict, files:dict, progress_callback=None, chunk_size:int=default_chunk_size, resumable=False, journal_dir:str=None) -> dict:
+        """upload files to the `upload_<route>` route of the server.
+
+        Args:
+            route (str): 'measurement_data' or 'exp_aux_files'
+            payload (dict): the json payload to send with the files
+            files (dict): key:path or key:file object pairs
+            progress_callback (callable, optional): called as progress_callback(key, bytes_sent, bytes_total) while uploading each file. Defaults to None.
+            chunk_size (int, optional): number of bytes to read from the files at once. Defaults to default_chunk_size.
+            resumable (bool, optional): upload as content addressed chunks, see ResumableUploader. Defaults to False.
+            journal_dir (str, optional): where to keep the journals of unfinished resumable uploads. Defaults to None.
+        """
+        if resumable:
+            uploader = ResumableUploader(self.transport, self.uri, journal_dir=journal_dir, progress_callback=progress_callback)
+            return uploader.upload('upload_' + route, payload, files)
+
+        # stream the files chunk by chunk instead of building the whole multipart body in memory
+        with MultipartEncoder({'json': payload}, files, chunk_size=chunk_size, progress_callback=progress_callback) as encoder:
+            return self.post('upload_' + route, data=encoder, headers={'Content-Type': encoder.content_type})
+
+    def ping(self) -> bool:
+        r = self.transport.get(f'{self.uri}/ping', timeout=2)
+        return r.status_code <= 200
+
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+
+def _get_extension(f) -> str:
+    name = f if isinstance(f, str) else getattr(f, 'name', getattr(f, 'filename', ''))
+    ext = os.path.splitext(name)[-1] if isinstance(name, str) else ''
+    return ext if ext else '.csv'
+
+
+def _copy_file(f, pth:str):
+    if hasattr(f, 'read'):
+        with open(pth, 'wb') as fp:
+            shutil.copyfileobj(f, fp)
+    else:
+        shutil.copyfile(f, pth)
+
+
+class LocalBackend(StorageBackend):
+    """Storage backend which keeps all rows in a local row store (JournalStore,
+    SqliteStore or MemoryStore) and does the same bookkeeping as the dbserver when
+    registering measurements and aux files. Files are saved next to the experiments
+    script_out_path.
+
+    Args:
+        store: the row store
+        uri (str, optional): the uri this backend was opened with. Defaults to None.
+    """
+    def __init__(self, store, uri:str=None):
+        super().__init__()
+        self.store = store
+        self.uri = uri
+        self._planners = {}
+
+    def transaction(self):
+        """see the transaction() of the store"""
+        return self.store.transaction()
+
+    def commit(self, tablename:str, dc:dict, id=None, raise_on_exists=False) -> dict:
+        """add or update a row. Without id the id is taken from dc or the next free one is used
+
+        Returns:
+            dict: the row as stored
+        """
+        # the new id must be taken and written in the same transaction to be unique across processes
+        with self.store.transaction() as store:
+            if id is not None and store.contains(tablename, id) and raise_on_exists:
+                raise Exception('ID {} already exists in table: {}'.format(id, tablename))
+
+            if id is None and dc.get('id') is not None:
+                id = int(dc['id']) if not isinstance(dc['id'], int) and dc['id'].isdigit() else dc['id']
+            elif id is None and store.has_rows(tablename):
+                id = store.max_id(tablename) + 1
+            elif id is None:
+                id = 1
+
+            dc['id'] = id
+            row = store.upsert(tablename, id, dc)
+
+        # only after the transaction went through, so waiters are not woken without a change
+        if tablename in ('experiments', 'analyses'):
+            self._notify_changed()
+        return row
+
+    def get_row(self, tablename:str, id) -> dict:
+        return self.store.get(tablename, id)
+
+    def patch_row(self, tablename:str, id, dc:dict) -> dict:
+        return self.commit(tablename, dc, id)
+
+    def _get_planner(self, basedir:str, experiment_id) -> filesys.PathPlanner:
+        # one per experiment, so the directories are only created once
+        key = (basedir, experiment_id)
+        if key not in self._planners:
+            self._planners[key] = filesys.PathPlanner(basedir, experiment_id)
+        return self._planners[key]
+
+    def _register_measurement(self, payload:dict, make_dir=False) -> dict:
+        parent_id = payload['id']
+        row = payload.get('row', {})
+        extensions = payload.get('extensions', {})
+
+        parent = self.get_row('experiments', parent_id)
+
+        assert 'ALL' not in extensions, 'the key ALL is forbidden for aux file upload!'
+        assert 'ACU' in extensions, 'the key ACU was not found in the files to add!'
+        tstart = parse_zulutime(row.get('time_iso'))
+        assert tstart is not None, 'need to give the time_iso field as zulu style string in row!'
+
+        devices_parent = json.loads(parent['devices_json'])
+        devices_new = []
+        planner = self._get_planner(os.path.dirname(parent['script_out_path']), parent_id)
+
+        # make a measurement_data table entry for the new file in order to get an ID
+        meas_data_row = {
+            "experiment_id": parent_id,
+            "antenna_id": parent['antenna_id'],
+            "meas_name": parent['script_name'],
+            "devices_json": parent['devices_json'],
+            "status": 'INITIALIZED',
+            'aux_files_json': '{}'
+        }
+        for k in row.keys():
+            if k not in meas_data_row:
+                meas_data_row[k] = row[k]
+
+        # get tag to add to aux file as well (only the first one, if there are many)
+        tag = meas_data_row.get('tags')
+        if tag and ',' in tag:
+            tag = tag.split(',')[0]
+        tag = tag.strip() if tag else tag
+
+        meas_data_row = self.commit('measurement_data', meas_data_row)
+        meas_id = meas_data_row['id']
+
+        # now that we have the ID we can make and set a path for the ACU file
+        meas_data_row['filename'] = planner.get_path(tstart, meas_id, 'ACU', extension=extensions['ACU'], make_dir=make_dir)
+
+        # make aux_files rows for all aux files
+        aux_rows = {}
+        for key, ext in extensions.items():
+            if key == 'ACU':
+                continue
+            ext = ext if ext and ext.startswith('.') else '.csv'
+            aux_row = {
+                "parent_id": meas_id,
+                "path": planner.get_path(tstart, meas_id, key, extension=ext, make_dir=make_dir),
+                "parent_type": 'measurement_data',
+                'device': key,
+                "tag": tag,
+            }
+            _log.debug('adding row: %s', aux_row)
+            aux_rows[key] = self.commit('aux_files', aux_row)
+            if key not in devices_parent:
+                devices_new.append(key)
+
+        if aux_rows:
+            meas_data_row['aux_files_json'] = add_to_json(meas_data_row['aux_files_json'], {k: v['path'] for k, v in aux_rows.items()})
+        meas_data_row = self.commit('measurement_data', meas_data_row, meas_id)
+
+        # add the measurement and the new devices to the parent
+        _log.debug('adding measurement %s to results_json in : %s', meas_id, parent_id)
+        parent_changes = {'results_json': add_to_json(parent['results_json'], {int(meas_id): meas_data_row['filename']})}
+        if devices_new:
+            parent_changes['devices_json'] = json.dumps(devices_parent + devices_new)
+        self.commit('experiments', parent_changes, parent_id)
+
+        return {'id': meas_id,
+                'path': meas_data_row['filename'],
+                'aux_files': [(k, v['id'], v['path']) for k, v in aux_rows.items()]}
+
+    def _register_aux(self, payload:dict, make_dir=False) -> dict:
+        parent_id = payload['id']
+        extensions = payload.get('extensions', {})
+        parent = self.get_row('experiments', parent_id)
+
+        assert 'ALL' not in extensions, 'the key ALL is forbidden for aux file upload!'
+        tstart = parse_zulutime(parent['time_started_iso']) if parent.get('time_started_iso') else None
+        if tstart is None:
+            tstart = parse_zulutime(parent.get('start_condition'))
+        assert tstart is not None, 'could not find a suitable candidate for start time in parent!'
+
+        devices_parent = json.loads(parent['devices_json'])
+        devices_new = []
+        basedir = filesys.join(os.path.dirname(parent['script_out_path']), 'data_aux')
+        if make_dir:
+            filesys.mkdir(basedir, raise_ex=True)
+
+        aux_rows = {}
+        for device, ext in extensions.items():
+            ext = ext if ext and ext.startswith('.') else '.csv'
+            aux_row = {
+                "parent_id": parent_id,
+                "path": filesys.get_exp_aux_save_filepath(basedir, tstart, parent_id, device_key=device, extension=ext),
+                "parent_type": 'measurement_data',
+                'device': device
+            }
+            _log.debug('adding row: %s', aux_row)
+            aux_rows[device] = self.commit('aux_files', aux_row)
+            if device not in devices_parent:
+                devices_new.append(device)
+
+        parent_changes = {}
+        if devices_new:
+            parent_changes['devices_json'] = json.dumps(devices_parent + devices_new)
+        if aux_rows:
+            parent_changes['aux_files_json'] = add_to_json(parent['aux_files_json'], {v['id']: v['path'] for v in aux_rows.values()})
+        if parent_changes:
+            self.commit('experiments', parent_changes, parent_id)
+
+        return {'id': parent_id,
+                'path': parent['script_out_path'],
+                'aux_files': [(k, v['id'], v['path']) for k, v in aux_rows.items()]}
+
+    def register_measurement(self, payload:dict) -> dict:
+        # one transaction, so parallel processes can not interleave the read-modify-write of the parent
+        with self.store.transaction():
+            return self._register_measurement(payload)
+
+    def register_aux(self, payload:dict) -> dict:
+        with self.store.transaction():
+            return self._register_aux(payload)
+
+    def upload(self, route:str, payload:dict, files:dict, **kwargs) -> dict:
+        """register files like register_measurement or register_aux (with the extensions of
+        the given files) and copy them to the pathes they were registered with. All other
+        keyword arguments (as for HttpBackend.upload) are ignored.
+
+        Args:
+            route (str): 'measurement_data' or 'exp_aux_files'
+            payload (dict): the payload without the extensions
+            files (dict): key:path or key:file object pairs
+        """
+        assert route in ('measurement_data', 'exp_aux_files'), 'route must be "measurement_data" or "exp_aux_files", but was "{}"'.format(route)
+        payload = {**payload, 'extensions': {k: _get_extension(f) for k, f in files.items()}}
+        with self.store.transaction():
+            if route == 'measurement_data':
+                ret = self._register_measurement(payload, make_dir=True)
+                targets = [('ACU', ret['path'])] + [(k, pth) for k, id, pth in ret['aux_files']]
+            else:
+                ret = self._register_aux(payload, make_dir=True)
+                targets = [(k, pth) for k, id, pth in ret['aux_files']]
+
+        for key, pth in targets:
+            _log.debug('saving file: %s', pth)
+            _copy_file(files[key], pth)
+        return ret
+
+    def flush(self):
+        self.store.flush()
+
+    def export_json(self):
+        """write the current rows of all tables to their `<table>.json` files"""
+        self.store.export_json()
+
+    def close(self):
+        self.store.close()
+
+
+class JsonFileBackend(LocalBackend):
+    """LocalBackend keeping its rows in a JournalStore (`<table>.json` and `<table>.journal`
+    files) in savedir. Takes the same keyword arguments as JournalStore"""
+    def __init__(self, savedir:str, **kwargs):
+        from mke_client.localstore import JournalStore
+        super().__init__(JournalStore(savedir, **kwargs), 'file://' + savedir)
+
+
+class SqliteBackend(LocalBackend):
+    """LocalBackend keeping its rows in a SqliteStore in savedir. Takes the same
+    keyword arguments as SqliteStore"""
+    def __init__(self, savedir:str, **kwargs):
+        from mke_client.localstore import SqliteStore
+        super().__init__(SqliteStore(savedir, **kwargs), 'sqlite://' + savedir)
+
+
+class MemoryBackend(LocalBackend):
+    """LocalBackend keeping its rows in memory only, see MemoryStore"""
+    def __init__(self, savedir:str=None, name:str=''):
+        from mke_client.localstore import MemoryStore
+        super().__init__(MemoryStore(savedir), 'mem://' + name)
+
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+backend_schemes = {
+    'http': HttpBackend,
+    'https': HttpBackend,
+    'file': JsonFileBackend,
+    'sqlite': SqliteBackend,
+    'mem': MemoryBackend,
+}
+"""the backend class for each URI scheme"""
+
+default_shared = True
+"""default locking mode of file and sqlite backends (and LocalExperiment): safe for several processes on the same savedir"""
+
+_memory_backends = {}
+_memory_backends_lock = threading.Lock()
+
+
+def open_backend(uri:str, transport:Transport=None, cache:RowCache=None, **kwargs) -> StorageBackend:
+    """open the storage backend for a URI::
+
+        http://host:port, https://...   HttpBackend for a dbserver
+        file://<savedir>                JsonFileBackend
+        sqlite://<savedir>              SqliteBackend (or sqlite://<savedir>/<name>.sqlite)
+        mem://<name>                    MemoryBackend. All backends opened with the same
+                                        non empty name within one process share their rows
+
+    Example::
+
+        backend = open_backend('sqlite:///data/my_experiment')
+        exp = Experiment(1, backend=backend)
+
+    Args:
+        uri (str): the uri
+        transport (Transport, optional): the transport for http backends. Defaults to None.
+        cache (RowCache, optional): the row cache for http backends. Defaults to None.
+        **kwargs: passed to the JournalStore or SqliteStore of file and sqlite backends.
+            shared defaults to default_shared for them.
+
+    Returns:
+        StorageBackend: the backend
+    """
+    scheme, sep, path = uri.partition('://')
+    assert sep and scheme in backend_schemes, 'uri must start with one of {}, but was "{}"'.format(', '.join(s + '://' for s in backend_schemes), uri)
+
+    if scheme in ('http', 'https'):
+        return HttpBackend(uri, transport=transport, cache=cache)
+
+    if scheme == 'mem':
+        if not path:
+            return MemoryBackend(**kwargs)
+        with _memory_backends_lock:
+            if path not in _memory_backends:
+                _memory_backends[path] = MemoryBackend(name=path, **kwargs)
+            return _memory_backends[path]
+
+    kwargs.setdefault('shared', default_shared)
+    if scheme == 'sqlite' and path.endswith(('.sqlite', '.db')):
+        kwargs['filename'] = os.path.basename(path)
+        path = os.path.dirname(path)
+    os.makedirs(path, exist_ok=True)
+    return backend_schemes[scheme](path, **kwargs)
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""
+time to live (TTL) cache for database rows fetched by rimlib objects
+"""
+
+import collections
+import threading
+import time
+
+
+default_ttls = {
+    'antennas': 3600.0,
+    'experiments': 1.0,
+    'analyses': 1.0,
+}
+"""default time to live in seconds per table. Antennas rarely change, while
+the experiments and analyses rows hold the status and must be fresh"""
+
+
+_counter_keys = ('hits', 'misses', 'revalidated', 'stores', 'invalidations')
+
+
+class RowCache():
+    """A thread safe cache for rows keyed by (tablename, id) where each
+    table has its own time to live (TTL). Expired entries are kept together
+    with their ETag (if the server sent one) so they can be revalidated with
+    If-None-Match instead of being downloaded again.
+
+    Example::
+
+        cache = RowCache(ttls={'experiments': 0.5})
+        exp = Experiment(1, 'http://localhost:8080', cache=cache)
+        exp.get_my_antenna() # fetches experiment and antenna
+        exp.get_my_antenna() # served from the cache
+        print(cache.stats())
+
+    Args:
+        ttls (dict, optional): tablename:ttl_in_seconds pairs to override default_ttls with. Defaults to None.
+        default_ttl (float, optional): ttl in seconds for all tables not found in ttls. Defaults to 1.0.
+    """
+    def __init__(self, ttls:dict=None, default_ttl:float=1.0):
+        self.ttls = {**default_ttls, **(ttls if ttls else {})}
+        self.default_ttl = default_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(lambda: dict.fromkeys(_counter_keys, 0))
+
+    def get_ttl(self, tablename:str) -> float:
+        """the time to live in seconds for rows of the given table"""
+        return self.ttls.get(tablename, self.default_ttl)
+
+    def lookup(self, tablename:str, id):
+        """look up a row in the cache
+
+        Returns:
+            row (dict): a copy of the cached row or None if not cached
+            etag (str): the ETag the row was stored with or None
+            fresh (bool): True if the row is within its TTL and can be used without asking the server
+        """
+        key = (tablename, str(id))
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = entry is not None and (time.monotonic() - entry[0]) < self.get_ttl(tablename)
+            self._counters[tablename]['hits' if fresh else 'misses'] += 1
+        if entry is None:
+            return None, None, False
+        return dict(entry[1]), entry[2], fresh
+
+    def store(self, tablename:str, id, row:dict, etag:str=None):
+        """put a freshly fetched row into the cache"""
+        with self._lock:
+            self._entries[(tablename, str(id))] = (time.monotonic(), dict(row), etag)
+            self._counters[tablename]['stores'] += 1
+
+    def revalidated(self, tablename:str, id):
+        """mark a cached row as fresh again after the server confirmed it did not change"""
+        key = (tablename, str(id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (time.monotonic(), entry[1], entry[2])
+            self._counters[tablename]['revalidated'] += 1
+
+    def invalidate(self, tablename:str=None, id=None):
+        """drop a single row, all rows of one table, or (without arguments) everything from the cache"""
+        with self._lock:
+            keys = [k for k in self._entries if (tablename is None or k[0] == tablename) and (id is None or k[1] == str(id))]
+            for k in keys:
+                del self._entries[k]
+            self._counters[tablename if tablename else '*']['invalidations'] += len(keys)
+
+    def stats(self) -> dict:
+        """get the hit/miss/revalidated/stores/invalidations counters per table
+        and summed up under the key 'total'"""
+        with self._lock:
+            ret = {k: dict(v) for k, v in self._counters.items()}
+            ret['total'] = {k: sum(v[k] for v in ret.values()) for k in _counter_keys}
+            ret['total']['entries'] = len(self._entries)
+        return ret
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,455 @@
+#!/usr/bin/python3
+"""
+catalog of the measurement files in an output tree (data_raw, data_aux and
+append mode streams) in an indexed SQLite database, to find files by device,
+experiment and measurement id and time range without walking the tree
+"""
+
+import calendar
+import concurrent.futures
+import datetime
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import logging
+
+from mke_client.helpers import parse_zulutime
+from mke_client.writer import StreamIndex, stream_extension, stats_suffix, read_measurement, _get_times
+
+_log = logging.getLogger(__name__)
+
+
+default_catalog_name = 'catalog.sqlite'
+
+# <time>_IDP_<experiment_id>[_IDD_<meas_id>][_<tag>]_<DEVICE><ext> as made by filesys_storage_api
+_re_datafile = re.compile(r'^(\d{8}_\d{4})_IDP_(\d+)(?:_IDD_(\d+))?(?:_(.+?))?_([A-Z0-9]{3,})(\.\w+)$')
+_re_streamfile = re.compile(r'^IDP_(\d+)_([A-Z0-9]{3,})' + re.escape(stream_extension) + '$')
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    experiment_id INTEGER,
+    meas_id INTEGER,
+    device TEXT,
+    tag TEXT,
+    time REAL,
+    size INTEGER,
+    mtime REAL,
+    kind TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_device_time ON files (device, time);
+CREATE INDEX IF NOT EXISTS files_experiment ON files (experiment_id, meas_id);
+CREATE INDEX IF NOT EXISTS files_time ON files (time);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    subdirs_json TEXT
+);
+CREATE TABLE IF NOT EXISTS streams (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS streams_dir ON streams (dir);
+CREATE TABLE IF NOT EXISTS file_stats (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    kind TEXT,
+    n_rows INTEGER,
+    t_min REAL,
+    t_max REAL
+);
+CREATE INDEX IF NOT EXISTS file_stats_dir ON file_stats (dir);
+CREATE TABLE IF NOT EXISTS column_stats (
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    kind TEXT,
+    name TEXT NOT NULL,
+    min REAL,
+    max REAL,
+    count INTEGER,
+    null_count INTEGER,
+    PRIMARY KEY (path, name)
+);
+CREATE INDEX IF NOT EXISTS column_stats_dir ON column_stats (dir);
+'''
+
+_columns = ['path', 'dir', 'experiment_id', 'meas_id', 'device', 'tag', 'time', 'size', 'mtime', 'kind']
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_timestr(s:str) -> float:
+    # fixed format of filesys_storage_api.timeformat_str, much faster than strptime
+    return calendar.timegm((int(s[0:4]), int(s[4:6]), int(s[6:8]), int(s[9:11]), int(s[11:13]), 0))
+
+
+def parse_filename(fname:str):
+    """parse the name of a measurement or aux file in one go
+
+    e.G.:
+        '20230101_1200_IDP_42_IDD_7_mytag_MWS.zip'
+            -> (42, 7, 'MWS', 'mytag', 1672574400.0)
+
+    Returns:
+        tuple: (experiment_id, meas_id, device, tag, time as unix timestamp) or None if the name does not match
+    """
+    m = _re_datafile.match(fname)
+    if m is None:
+        return None
+    timestr, experiment_id, meas_id, tag, device, ext = m.groups()
+    return int(experiment_id), int(meas_id) if meas_id else None, device, tag, _parse_timestr(timestr)
+
+
+def _to_timestamp(t):
+    if t is None or isinstance(t, (int, float)):
+        return t
+    if isinstance(t, str):
+        s, t = t, parse_zulutime(t)
+        assert t is not None, 'could not parse time: "{}"'.format(s)
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=datetime.timezone.utc)
+    return t.timestamp()
+
+
+def _scan_dir(d:str, known, full:bool):
+    """list one directory. Returns (dir, mtime_ns, subdirs, file records or None if unchanged, stream files, (path, stats) of the sidecars)"""
+    mtime_ns = os.stat(d).st_mtime_ns
+    if not full and known is not None and known[0] == mtime_ns:
+        return d, mtime_ns, known[1], None, None, None
+
+    subdirs, records, streams, sidecars = [], [], [], []
+    with os.scandir(d) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            name = entry.name
+            parsed = parse_filename(name)
+            if parsed is not None:
+                st = entry.stat()
+                kind = 'raw' if parsed[1] is not None else 'aux'
+                records.append((entry.path, d) + parsed + (st.st_size, st.st_mtime, kind))
+            elif name.endswith(stream_extension) and _re_streamfile.match(name):
+                st = entry.stat()
+                streams.append((entry.path, d, st.st_mtime_ns, st.st_size))
+            elif name.endswith(stats_suffix):
+                try:
+                    with open(entry.path) as fp:
+                        sidecars.append((entry.path[:-len(stats_suffix)], json.load(fp)))
+                except (OSError, ValueError) as err:
+                    _log.warning('could not read statistics sidecar %s: %s', entry.path, err)
+    return d, mtime_ns, subdirs, records, streams, sidecars
+
+
+def _read_stream(stream_path:str, d:str, mtime:float):
+    records, sidecars = [], []
+    for entry in StreamIndex(stream_path).update().values():
+        parsed = parse_filename(entry['path'])
+        if parsed is not None:
+            pth = os.path.join(d, entry['path'])
+            records.append((pth, d) + parsed + (entry['length'], mtime, 'stream'))
+            if entry.get('stats'):
+                sidecars.append((pth, entry['stats']))
+    return records, sidecars
+
+
+class Catalog():
+    """indexed catalog of all measurement files below root. scan() walks the tree with a
+    thread pool and only lists directories whose mtime changed since the last scan,
+    so keeping a large tree up to date costs one stat per directory.
+
+    Measurements in append mode streams (see writer.append_to_stream) are cataloged
+    with their registered path and kind 'stream'.
+
+    Example::
+
+        with Catalog('/data/output') as catalog:
+            catalog.scan()
+            rows = catalog.find(device='MWS', experiment_id=42, t_start='2023-01-01T00:00:00Z', t_end='2023-02-01T00:00:00Z')
+
+    Args:
+        root (str): the output tree to catalog
+        db_path (str, optional): the SQLite file to keep the catalog in. Defaults to None for root/catalog.sqlite.
+        max_workers (int, optional): number of directories to list at the same time. Defaults to 16.
+    """
+    def __init__(self, root:str, db_path:str=None, max_workers:int=16):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path if db_path else os.path.join(self.root, default_catalog_name)
+        self.max_workers = max_workers
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_schema)
+
+    def scan(self, full:bool=False) -> dict:
+        """bring the catalog up to date with the files in root
+
+        Args:
+            full (bool, optional): list every directory again, also the ones whose mtime did not
+                change (e.g. to pick up files rewritten in place). Defaults to False.
+
+        Returns:
+            dict: number of 'dirs_scanned', 'dirs_unchanged', 'dirs_removed', 'files' and 'stats' sidecars (cataloged in the
+                scanned dirs) and 'streams' updated
+        """
+        with self._lock:
+            conn = self._conn
+            known = {p: (m, json.loads(s)) for p, m, s in conn.execute('SELECT path, mtime_ns, subdirs_json FROM dirs')}
+            stats = dict(dirs_scanned=0, dirs_unchanged=0, dirs_removed=0, files=0, streams=0, stats=0)
+            visited = set()
+
+            conn.execute('BEGIN')
+            try:
+                with concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix='mke_catalog') as executor:
+                    pending = {executor.submit(_scan_dir, self.root, known.get(self.root), full)}
+                    while pending:
+                        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            try:
+                                d, mtime_ns, subdirs, records, streams, sidecars = future.result()
+                            except (FileNotFoundError, NotADirectoryError):
+                                # removed while scanning
+                                continue
+                            visited.add(d)
+                            pending.update(executor.submit(_scan_dir, s, known.get(s), full) for s in subdirs)
+
+                            if records is None:
+                                stats['dirs_unchanged'] += 1
+                                stats['streams'] += self.__update_streams(d, None)
+                                continue
+
+                            stats['dirs_scanned'] += 1
+                            stats['files'] += len(records)
+                            conn.execute('DELETE FROM files WHERE dir=? AND kind!=?', (d, 'stream'))
+                            conn.executemany('INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?)', records)
+                            conn.execute('DELETE FROM file_stats WHERE dir=? AND kind!=?', (d, 'stream'))
+                            conn.execute('DELETE FROM column_stats WHERE dir=? AND kind!=?', (d, 'stream'))
+                            self.__insert_stats(d, 'file', sidecars)
+                            stats['stats'] += len(sidecars)
+                            stats['streams'] += self.__update_streams(d, streams)
+                            conn.execute('INSERT OR REPLACE INTO dirs VALUES (?,?,?)', (d, mtime_ns, json.dumps(subdirs)))
+
+                for d in set(known) - visited:
+                    conn.execute('DELETE FROM files WHERE dir=?', (d,))
+                    conn.execute('DELETE FROM streams WHERE dir=?', (d,))
+                    conn.execute('DELETE FROM file_stats WHERE dir=?', (d,))
+                    conn.execute('DELETE FROM column_stats WHERE dir=?', (d,))
+                    conn.execute('DELETE FROM dirs WHERE path=?', (d,))
+                    stats['dirs_removed'] += 1
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+            _log.info('catalog scan of %s: %s', self.root, stats)
+            return stats
+
+    def __update_streams(self, d:str, streams) -> int:
+        # streams grow in place without changing the mtime of their directory, so stat them on every scan
+        conn = self._conn
+        known = {p: (m, s) for p, m, s in conn.execute('SELECT path, mtime_ns, size FROM streams WHERE dir=?', (d,))}
+        if streams is None:
+            streams = []
+            for p in known:
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                streams.append((p, d, st.st_mtime_ns, st.st_size))
+
+        n_updated = 0
+        if set(known) - {s[0] for s in streams}:
+            for table in ['files', 'file_stats', 'column_stats']:
+                conn.execute(f'DELETE FROM {table} WHERE dir=? AND kind=?', (d, 'stream'))
+            conn.execute('DELETE FROM streams WHERE dir=?', (d,))
+            known = {}
+        for p, d, mtime_ns, size in streams:
+            if known.get(p) == (mtime_ns, size):
+                continue
+            records, sidecars = _read_stream(p, d, mtime_ns / 1e9)
+            conn.executemany('INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?)', records)
+            self.__insert_stats(d, 'stream', sidecars)
+            conn.execute('INSERT OR REPLACE INTO streams VALUES (?,?,?,?)', (p, d, mtime_ns, size))
+            n_updated += 1
+        return n_updated
+
+    def __insert_stats(self, d:str, kind:str, sidecars:list):
+        conn = self._conn
+        conn.executemany('INSERT OR REPLACE INTO file_stats VALUES (?,?,?,?,?,?)',
+                         [(pth, d, kind, st.get('n_rows'), st.get('t_min'), st.get('t_max')) for pth, st in sidecars])
+        conn.executemany('INSERT OR REPLACE INTO column_stats VALUES (?,?,?,?,?,?,?,?)',
+                         [(pth, d, kind, name, c.get('min'), c.get('max'), c.get('count'), c.get('null_count'))
+                          for pth, st in sidecars for name, c in st.get('columns', {}).items()])
+
+    def get_stats(self, path:str) -> dict:
+        """the cataloged statistics of a file in the layout of writer.compute_stats, or None if it has none"""
+        with self._lock:
+            row = self._conn.execute('SELECT n_rows, t_min, t_max FROM file_stats WHERE path=?', (path,)).fetchone()
+            if row is None:
+                return None
+            columns = {name: dict(min=mn, max=mx, count=n, null_count=n_null) for name, mn, mx, n, n_null
+                       in self._conn.execute('SELECT name, min, max, count, null_count FROM column_stats WHERE path=?', (path,))}
+        return dict(n_rows=row[0], t_min=row[1], t_max=row[2], columns=columns)
+
+    def __where(self, device=None, experiment_id=None, meas_id=None, t_start=None, t_end=None, kind=None, tag=None, ranges=None):
+        clauses, params = [], []
+        for col, val in [('device', device), ('experiment_id', experiment_id), ('meas_id', meas_id), ('kind', kind), ('tag', tag)]:
+            if val is None:
+                continue
+            if isinstance(val, (list, tuple, set)):
+                val = list(val)
+                clauses.append('{} IN ({})'.format(col, ','.join('?' * len(val))))
+                params += val
+            else:
+                clauses.append(f'{col}=?')
+                params.append(val)
+        if t_start is not None:
+            clauses.append('time>=?')
+            params.append(_to_timestamp(t_start))
+        if t_end is not None:
+            clauses.append('time<=?')
+            params.append(_to_timestamp(t_end))
+
+        # skip the files whose statistics show that no value can be within the range.
+        # Files without statistics can not be skipped
+        for name, (lo, hi) in (ranges or {}).items():
+            if lo is None and hi is None:
+                continue
+            if name == 'time':
+                lo, hi = _to_timestamp(lo), _to_timestamp(hi)
+                table, cond, cond_params = 'file_stats', [], []
+            else:
+                # a column without any values has none within a range either
+                table, cond, cond_params = 'column_stats', ['s.count=0'], [name]
+            col_min, col_max = ('s.t_min', 's.t_max') if name == 'time' else ('s.min', 's.max')
+            if lo is not None:
+                cond.append(f'{col_max}<?')
+                cond_params.append(lo)
+            if hi is not None:
+                cond.append(f'{col_min}>?')
+                cond_params.append(hi)
+            name_cond = '' if name == 'time' else ' AND s.name=?'
+            clauses.append(f'NOT EXISTS (SELECT 1 FROM {table} s WHERE s.path=files.path{name_cond} AND ({" OR ".join(cond)}))')
+            params += cond_params
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def find(self, device=None, experiment_id=None, meas_id=None, t_start=None, t_end=None, kind:str=None, tag:str=None, ranges:dict=None, limit:int=None) -> list:
+        """find cataloged files. All given conditions must match. device, experiment_id,
+        meas_id, kind and tag can also be lists of values to match any of.
+
+        Example::
+
+            # files which may have elevations above 80 deg on 2023-01-01
+            rows = catalog.find(device='ACU', ranges={'elevation': (80, None), 'time': ('2023-01-01T00:00:00Z', '2023-01-02T00:00:00Z')})
+
+        Args:
+            device (str, optional): the device key (e.g. 'ACU', 'MWS'). Defaults to None.
+            experiment_id (int, optional): the experiment id (IDP). Defaults to None.
+            meas_id (int, optional): the measurement id (IDD). Defaults to None.
+            t_start (datetime.datetime, str or float, optional): earliest file time (inclusive). Defaults to None.
+            t_end (datetime.datetime, str or float, optional): latest file time (inclusive). Defaults to None.
+            kind (str, optional): 'raw' (measurement files), 'aux' (experiment level aux files) or 'stream'. Defaults to None.
+            tag (str, optional): the tag in the file name. Defaults to None.
+            ranges (dict, optional): column:(min, max) pairs (None for open ends). Files whose statistics sidecars
+                show that a column has no value within its range are skipped. The key 'time' is the time range of
+                the data (not of the file name). Defaults to None.
+            limit (int, optional): max number of files to return. Defaults to None for all.
+
+        Returns:
+            list: a dict per file with path, dir, experiment_id, meas_id, device, tag, time (datetime), size, mtime and kind, ordered by time
+        """
+        where, params = self.__where(device, experiment_id, meas_id, t_start, t_end, kind, tag, ranges)
+        query = 'SELECT {} FROM files{} ORDER BY time, experiment_id, meas_id, path'.format(', '.join(_columns), where)
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        utc = datetime.timezone.utc
+        ret = []
+        for row in rows:
+            dc = dict(zip(_columns, row))
+            dc['time'] = datetime.datetime.fromtimestamp(dc['time'], utc)
+            ret.append(dc)
+        return ret
+
+    def find_paths(self, **where) -> list:
+        """like find, but only the pathes"""
+        return [row['path'] for row in self.find(**where)]
+
+    def count(self, **where) -> int:
+        """number of cataloged files matching the conditions of find"""
+        where, params = self.__where(**where)
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM files' + where, params).fetchone()[0]
+
+    def query(self, ranges:dict, columns:list=None, use_stats:bool=True, max_workers:int=8, **where):
+        """read all rows where every column of ranges is within its (min, max) range from
+        the matching files, opening only the files the statistics can not rule out.
+
+        Example::
+
+            df = catalog.query({'elevation': (80, None)}, device='ACU', experiment_id=42)
+
+        Args:
+            ranges (dict): column:(min, max) pairs (None for open ends, 'time' for the datetime index)
+            columns (list, optional): the columns to return. Defaults to None for all.
+            use_stats (bool, optional): set False to open every matching file. Defaults to True.
+            max_workers (int, optional): number of files to read at the same time. Defaults to 8.
+            **where: the other conditions of find
+
+        Returns:
+            pandas.DataFrame: the matching rows with the path of their file in the column 'path'
+        """
+        import numpy as np
+        import pandas as pd
+
+        pathes = [row['path'] for row in self.find(ranges=ranges if use_stats else None, **where)]
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + [k for k in ranges if k != 'time']))
+
+        def read(pth):
+            df = read_measurement(pth, columns=read_columns)
+            mask = np.ones(len(df), dtype=bool)
+            for name, (lo, hi) in ranges.items():
+                if name == 'time':
+                    times = _get_times(df)
+                    if times is None:
+                        return None
+                    values = (times - pd.Timestamp(0, tz=times.tz)) / pd.Timedelta(seconds=1)
+                    lo, hi = _to_timestamp(lo), _to_timestamp(hi)
+                elif name in df.columns:
+                    values = df[name]
+                else:
+                    return None
+                values = np.asarray(values, dtype=float)
+                if lo is not None:
+                    mask &= values >= lo
+                if hi is not None:
+                    mask &= values <= hi
+            df = df[mask]
+            if columns is not None:
+                df = df[list(columns)]
+            return df.assign(path=pth) if len(df) else None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            frames = [df for df in executor.map(read, pathes) if df is not None]
+        return pd.concat(frames) if frames else pd.DataFrame(columns=list(columns or []) + ['path'])
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
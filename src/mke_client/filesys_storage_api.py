@@ -9,22 +9,13 @@ generates the default file pathes etc
 import os
 
 import re
-import dateutil.parser, datetime, time, pytz
+import datetime
 
 import logging
-import sys
 
-_log = logging.getLogger()
-streamHandler = logging.StreamHandler(sys.stdout)
-streamHandler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-_log.addHandler(streamHandler)
+_log = logging.getLogger(__name__)
 
 
-
-
-from pathlib import Path
-
-import tempfile
 from pathlib import Path
 home = str(Path.home())
 
@@ -145,8 +136,7 @@ def get_device_from_pth(pth, raise_on_none=False):
     ret = str(r[-1][1:-1]) if r else None
 
     if ret is None:
-        _log.warning('Could not determine device from:')
-        _log.warning(fname)
+        _log.warning('Could not determine device from: %s', fname)
 
         if raise_on_none:
             raise Exception(f'Could not determine device from: "{fname}"')
@@ -167,20 +157,21 @@ def get_id_data_from_path(s):
     
 
 def mkdir(pth, raise_ex=False, verbose=False):
+    """create a directory and all missing parents. Returns the created path or None if it already existed (or on error)"""
     try:
-        if not os.path.exists(pth):
-            if verbose:
-                _log.info('Creating dir because it does not exist: ' + pth)
-            os.makedirs(pth, exist_ok=True)
-            path = Path(pth)
-            path.mkdir(parents=True, exist_ok=True)
-            return str(path).replace('\\', '/').replace('//', '/')
-
+        # no separate exists() check, an existing directory fails the mkdir itself
+        os.makedirs(pth)
+    except FileExistsError:
+        return None
     except Exception as err:
         _log.error(err)
         if raise_ex:
             raise
-    return None
+        return None
+
+    if verbose:
+        _log.info('Created dir because it did not exist: %s', pth)
+    return str(Path(pth)).replace('\\', '/').replace('//', '/')
 
 def join(*parts):
     return os.path.join(*parts).replace('\\', '/').replace('//', '/')
@@ -231,9 +222,19 @@ def get_exp_save_dir(basedir:str, dtime:datetime.datetime, experiment_id:int, an
     return fulldir
 
 
-def get_exp_save_pth_datafile(basedir:str, dtime:datetime.datetime, experiment_id:int, meas_id:str, device_key:str, tag:str=None, extension:str='.csv', make_dir=False):
+def get_shard_dir(meas_id, shard_size:int) -> str:
+    """the name of the subdirectory of data_raw a measurement goes into in the sharded layout
+        e.G. with shard_size=1000:
+            12345 -> '00012000'
+    """
+    return f'{int(meas_id) // shard_size * shard_size:08d}'
+
+
+def get_exp_save_pth_datafile(basedir:str, dtime:datetime.datetime, experiment_id:int, meas_id:str, device_key:str, tag:str=None, extension:str='.csv', make_dir=False, shard_size:int=None):
     time = dtime.strftime(timeformat_str)
     subdir = f"data_raw"
+    if shard_size:
+        subdir += '/' + get_shard_dir(meas_id, shard_size)
     tag = ('_' + tag.strip().replace(' ', '')) if tag else ''
     fname = f'{time}_IDP_{experiment_id}_IDD_{meas_id}{tag}_{device_key}{extension}'
     fulldir = join(basedir, subdir)
@@ -243,6 +244,81 @@ def get_exp_save_pth_datafile(basedir:str, dtime:datetime.datetime, experiment_i
     return fullpath
 
 
+class PathPlanner():
+    """Generates the data file pathes of one experiment like get_exp_save_pth_datafile,
+    but with the directory and file name prefixes computed once, the time formatted
+    once per measurement instead of once per file and each directory only created once.
+
+    With shard_size the files go into data_raw/<first id of the shard>/ subdirectories
+    of at most shard_size measurements each, instead of all into data_raw.
+
+    Args:
+        basedir (str): the save dir of the experiment (see get_exp_save_dir)
+        experiment_id (int): the id of the experiment
+        shard_size (int, optional): number of measurement ids per subdirectory of data_raw. Defaults to None (no subdirectories).
+        make_dir (bool, optional): create the directories of the generated pathes. Defaults to False.
+
+    Example::
+
+        planner = PathPlanner(savedir, 42, shard_size=1000)
+        pathes = planner.get_pathes(times, meas_ids, {'ACU': '.parquet', 'MWS': '.csv'})
+        # -> [{'ACU': '.../data_raw/00000000/20230101_1200_IDP_42_IDD_1_ACU.parquet', 'MWS': ...}, ...]
+    """
+    def __init__(self, basedir:str, experiment_id:int, shard_size:int=None, make_dir=False):
+        assert shard_size is None or shard_size > 0, 'shard_size must be a positive integer, but was {}'.format(shard_size)
+        self.basedir = basedir
+        self.experiment_id = experiment_id
+        self.shard_size = shard_size
+        self.make_dir = make_dir
+        self.dir = join(basedir, 'data_raw')
+        self._sep = '' if self.dir.endswith('/') else '/'
+        self._prefix = f'_IDP_{experiment_id}_IDD_'
+        self._dirs = set()
+
+    def get_dir(self, meas_id, make_dir=None) -> str:
+        """the directory the files of a measurement go into"""
+        d = self.dir
+        if self.shard_size:
+            d = f'{d}{self._sep}{get_shard_dir(meas_id, self.shard_size)}'
+        if (self.make_dir if make_dir is None else make_dir) and d not in self._dirs:
+            mkdir(d, raise_ex=True)
+            self._dirs.add(d)
+        return d
+
+    def get_path(self, dtime:datetime.datetime, meas_id, device_key:str, tag:str=None, extension:str='.csv', make_dir=None) -> str:
+        """the path of one file, same as get_exp_save_pth_datafile"""
+        return self.get_pathes(dtime, [meas_id], {device_key: extension}, tag=tag, make_dir=make_dir)[0][device_key]
+
+    def get_pathes(self, dtimes, meas_ids, extensions:dict, tag:str=None, make_dir=None) -> list:
+        """the pathes of the files of N measurements for M devices each
+
+        Args:
+            dtimes (datetime or list): the time of all measurements or one time per measurement
+            meas_ids (list): the N measurement ids
+            extensions (dict): device_key:extension pairs of the M files per measurement
+            tag (str, optional): the tag to add to all file names. Defaults to None.
+            make_dir (bool, optional): create the directories. Defaults to the make_dir given on init.
+
+        Returns:
+            list: one dict device_key:path per measurement id
+        """
+        if isinstance(dtimes, datetime.datetime):
+            times = [dtimes.strftime(timeformat_str)] * len(meas_ids)
+        else:
+            assert len(dtimes) == len(meas_ids), 'need one time per measurement id, but got {} times for {} ids'.format(len(dtimes), len(meas_ids))
+            times = [t.strftime(timeformat_str) for t in dtimes]
+
+        tag = ('_' + tag.strip().replace(' ', '')) if tag else ''
+        suffixes = [(key, f'{tag}_{key}{ext}') for key, ext in extensions.items()]
+        sep, prefix = self._sep, self._prefix
+
+        ret = []
+        for time, meas_id in zip(times, meas_ids):
+            start = f'{self.get_dir(meas_id, make_dir)}{sep}{time}{prefix}{meas_id}'
+            ret.append({key: start + suffix for key, suffix in suffixes})
+        return ret
+
+
 def get_exp_aux_save_dir(dtime:datetime.datetime, experiment_id:int, antenna_id:str, experiment_name:str, make_dir=False):
     basedir = get_exp_save_dir(dtime, experiment_id, antenna_id, experiment_name, make_dir=False)
     
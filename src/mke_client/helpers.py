@@ -1,6 +1,7 @@
 
 import datetime
-import dateutil
+import functools
+import os
 import pytz
 
 import re
@@ -25,21 +26,87 @@ def make_zulustr(dtobj:datetime.datetime, remove_ms = True) -> str:
             else:
                 "2022-06-09T10:05:21.123456Z"
     '''
-    utc = dtobj.replace(tzinfo=pytz.utc)
-    if remove_ms:
-        utc = utc.replace(microsecond=0)
-    return utc.isoformat().replace('+00:00','') + 'Z'
+    # same output as dtobj.replace(tzinfo=utc).isoformat() with the offset replaced by Z
+    s = '%04d-%02d-%02dT%02d:%02d:%02d' % (dtobj.year, dtobj.month, dtobj.day, dtobj.hour, dtobj.minute, dtobj.second)
+    if not remove_ms and dtobj.microsecond:
+        s += '.%06d' % dtobj.microsecond
+    return s + 'Z'
+
+
+zulutime_cache_size = 4096
+"""number of most recently parsed strings parse_zulutime keeps the result for"""
+
+# lengths of the fixed zulu formats YYYY-MM-DDZ, YYYY-MM-DDTHH:MM:SSZ, ...SS.fffZ and ...SS.ffffffZ
+_zulu_lengths = (11, 20, 24, 27)
+
+
+@functools.lru_cache(maxsize=zulutime_cache_size)
+def _parse_zulutime(s:str) -> datetime.datetime:
+    n = len(s)
+    if n in _zulu_lengths and s[-1] == 'Z' and s[4] == '-' and s[7] == '-' and (
+            n == 11 or (s[10] == 'T' and s[13] == ':' and s[16] == ':' and (n == 20 or s[19] == '.'))):
+        try:
+            t = datetime.datetime.fromisoformat(s[:-1])
+            if t.tzinfo is None:
+                return t.replace(tzinfo=pytz.utc)
+        except ValueError:
+            pass
+    # anything else (other offsets, separators or precisions) goes the slow way
+    try:
+        import dateutil.parser
+        if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}Z', s) is not None:
+            s = s[:-1] + 'T00:00:00Z'
+        return dateutil.parser.isoparse(s).replace(tzinfo=pytz.utc)
+    except Exception:
+        return None
+
 
 def parse_zulutime(s:str)->datetime.datetime:
     '''will parse a zulu style string to a datetime.datetime object. Allowed are
         "2022-06-09T10:05:21.123456Z"
         "2022-06-09T10:05:21Z" --> Microseconds set to zero
         "2022-06-09Z" --> Time set to "00:00:00.000000"
+    other iso style strings are parsed with dateutil. Returns None on fail.
+    The results for the last zulutime_cache_size strings are cached.
     '''
-    try:
-        if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}Z', s) is not None:
-            s = s[:-1] + 'T00:00:00Z'
-        return dateutil.parser.isoparse(s).replace(tzinfo=pytz.utc)
-    except Exception:
+    if not isinstance(s, str):
         return None
+    return _parse_zulutime(s)
+
 
+def parse_zulutimes(values):
+    '''vectorized parse_zulutime for a list, array or pandas.Series of iso style strings.
+    Like parse_zulutime, utc offsets are replaced by utc and not converted.
+
+    Returns:
+        pandas.Series: datetime64 (utc) with NaT for all values which could not be parsed
+    '''
+    import pandas as pd
+
+    col = pd.Series(values, dtype=object)
+    if int(pd.__version__.split('.')[0]) < 2:
+        return _parse_zulutimes_each(col)
+    # parse_zulutime takes date only zulu strings like 2022-06-29Z as midnight and
+    # replaces (does not convert) utc offsets, so 10:05+02:00 is 10:05Z here as well
+    strs = col.astype(str).str.replace(r'^([0-9]{4}-[0-9]{2}-[0-9]{2})Z$', r'\1T00:00:00Z', regex=True)
+    strs = strs.str.replace(r'(T[0-9:.,]+)[+-][0-9]{2}(:?[0-9]{2})?$', r'\1Z', regex=True)
+    col = col.where(col.map(type) != str, strs)
+    return pd.to_datetime(col, utc=True, errors='coerce', format='ISO8601')
+
+
+def _parse_zulutimes_each(col):
+    # pandas < 2.0 has no format='ISO8601'. Repeated values hit the cache of parse_zulutime
+    import pandas as pd
+    return pd.to_datetime(col.map(parse_zulutime), utc=True)
+
+
+def fsync_dir(path:str):
+    """fsync a directory, so a file created or renamed in it survives a power loss. 
+    Does nothing on Windows, where directories can not be opened (and do not need it)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
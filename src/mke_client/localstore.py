@@ -0,0 +1,727 @@
+#!/usr/bin/python3
+"""
+storage engines for the rows of a LocalExperiment
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+import logging
+
+from mke_client.helpers import fsync_dir
+from mke_client.remexlib import script_fields
+
+_log = logging.getLogger(__name__)
+
+
+def _write_json_atomic(path:str, db:dict):
+    # a unique temp file in the same directory, so processes sharing the savedir do not collide
+    dirname = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=dirname or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(db, fp, indent=3)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    fsync_dir(dirname)
+
+
+_open_stores = weakref.WeakSet()
+
+@atexit.register
+def _flush_open_stores():
+    for store in list(_open_stores):
+        try:
+            store.flush()
+        except Exception as err:
+            _log.error('could not flush %s at exit: %s', store.savedir, err)
+
+
+class _WriteBehind():
+    """write-behind bookkeeping shared by the stores. Changes are held back until
+    flush_every changes (rows for a JournalStore) are pending, flush_interval seconds have passed since the first
+    unflushed change, flush() is called or the interpreter exits."""
+    def _init_write_behind(self, flush_every:int, flush_interval:float):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._n_dirty = 0
+        self._timer = None
+        _open_stores.add(self)
+
+    def _mark_dirty(self):
+        self._n_dirty += 1
+        if self._n_dirty >= self.flush_every:
+            self.flush()
+        elif self.flush_interval and self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FileLock():
+    """reentrant (within one process) advisory lock on a file shared between processes.
+    Uses fcntl.flock on POSIX and msvcrt.locking on Windows, which locks the first
+    byte of the file, so the lock file should not be used for anything else.
+
+    Example::
+
+        with FileLock(path + '.lock'):
+            ...
+    """
+    def __init__(self, path:str):
+        self.path = path
+        self._fp = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth == 0:
+            if self._fp is None:
+                self._fp = open(self.path, 'a+b')
+            if fcntl is not None:
+                fcntl.flock(self._fp.fileno(), fcntl.LOCK_EX)
+            else:
+                self._fp.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._fp.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after 10s
+                        continue
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fp.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fp.seek(0)
+                msvcrt.locking(self._fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    @property
+    def is_locked(self) -> bool:
+        return self._depth > 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class JournalStore(_WriteBehind):
+    """Row store which keeps all rows of each table in memory and appends every
+    change as a single line to a journal file instead of rewriting the whole table.
+    The journal is compacted into a snapshot every compact_every changes. The snapshot
+    has the same layout as the `<table>.json` files written by older versions, which
+    are picked up as initial snapshot.
+
+    Changes can be held back in memory (write-behind) and are then written as one
+    journal line per changed row on flush, see flush_every and flush_interval. All
+    pending changes are flushed at interpreter exit.
+
+    With shared=True several processes can work on the same savedir. Every read and
+    write then takes an advisory lock on `savedir/.lock`, first applies the journal
+    lines the other processes appended since (or reloads the snapshot if one of them
+    compacted) and writes its own changes before releasing the lock, so ids handed
+    out by max_id() + 1 within a transaction() are unique across processes.
+
+    Files in savedir per table::
+
+        <table>.json        snapshot {id: row} (indent=3)
+        <table>.journal     one json line {"id": id, "row": changed_fields} per change since the snapshot
+
+    Args:
+        savedir (str): directory to keep the table files in
+        compact_every (int, optional): number of journal lines per table after which it is compacted into the snapshot. Defaults to 10000.
+        flush_every (int, optional): number of unflushed changes after which they are written to the journal. Defaults to 1 (write through).
+        flush_interval (float, optional): max seconds a change is held back before it is written. Defaults to None for no timer.
+        shared (bool, optional): set True if other processes use the same savedir at the same time. Changes are then written at the end of each transaction(). Defaults to False.
+    """
+    def __init__(self, savedir:str, compact_every:int=10000, flush_every:int=1, flush_interval:float=None, shared:bool=False):
+        self.savedir = savedir
+        self.compact_every = compact_every
+        self.shared = shared
+        self._tables = {}
+        self._max_ids = {}
+        self._journals = {}
+        self._n_journaled = {}
+        self._offsets = {}
+        self._snapshots = {}
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._flock = FileLock(self._get_path('', '.lock')) if shared else None
+        self._init_write_behind(flush_every, flush_interval)
+
+    def _get_path(self, tablename, ext):
+        return os.path.join(self.savedir, tablename + ext).replace('\\', '/')
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if not self.shared:
+                yield
+                return
+            catch_up = not self._flock.is_locked
+            self._flock.acquire()
+            try:
+                if catch_up:
+                    self._catch_up()
+                yield
+            finally:
+                self._flock.release()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """context in which reads and writes are atomic with respect to other threads
+        and (for shared stores) other processes. For shared stores all changes made
+        within are written when the outermost transaction ends."""
+        with self._locked():
+            outermost = not self.shared or self._flock._depth == 1
+            try:
+                yield self
+            finally:
+                if self.shared and outermost:
+                    self._flush_pending()
+
+    def _set_row(self, tablename, id, dc):
+        db = self._tables[tablename]
+        key = str(id)
+        db[key] = {**db[key], **dc} if key in db else dict(dc)
+        if isinstance(id, int) or key.lstrip('-').isdigit():
+            self._max_ids[tablename] = max(self._max_ids[tablename], int(key))
+        return key
+
+    def _load(self, tablename:str) -> dict:
+        if tablename in self._tables:
+            return self._tables[tablename]
+
+        db = {}
+        pth = self._get_path(tablename, '.json')
+        self._snapshots[tablename] = _stat(pth)
+        if self._snapshots[tablename] is not None:
+            with open(pth, 'r') as fp:
+                db = json.load(fp)
+
+        self._tables[tablename] = db
+        self._max_ids[tablename] = max([int(k) for k in db.keys() if k.lstrip('-').isdigit()], default=0)
+        self._n_journaled[tablename] = 0
+        self._offsets[tablename] = 0
+        self._replay(tablename)
+        return db
+
+    def _replay(self, tablename:str):
+        # apply all journal lines appended since the last read
+        pth = self._get_path(tablename, '.journal')
+        if not os.path.exists(pth):
+            return
+        with open(pth, 'rb') as fp:
+            fp.seek(self._offsets[tablename])
+            data = fp.read()
+
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # a crash while appending leaves an incomplete last line
+            _log.warning('ignoring incomplete last line in %s', pth)
+        lines = data[:end].splitlines()
+        for line in lines:
+            delta = json.loads(line)
+            self._set_row(tablename, delta['id'], delta['row'])
+        self._offsets[tablename] += end
+        self._n_journaled[tablename] += len(lines)
+
+    def _catch_up(self):
+        for tablename in list(self._tables.keys()):
+            offset = self._offsets[tablename]
+            journal = _stat(self._get_path(tablename, '.journal'))
+            if _stat(self._get_path(tablename, '.json')) != self._snapshots[tablename] or (journal and journal[2] < offset):
+                # another process compacted the table
+                self._drop(tablename)
+                self._load(tablename)
+            else:
+                self._replay(tablename)
+
+    def _drop(self, tablename):
+        fp = self._journals.pop(tablename, None)
+        if fp is not None:
+            fp.close()
+        self._tables.pop(tablename, None)
+
+    def has_rows(self, tablename:str) -> bool:
+        """True if the table has at least one row"""
+        with self._locked():
+            return len(self._load(tablename)) > 0
+
+    def contains(self, tablename:str, id) -> bool:
+        with self._locked():
+            return str(id) in self._load(tablename)
+
+    def max_id(self, tablename:str) -> int:
+        """the highest integer id in the table (0 for an empty table)"""
+        with self._locked():
+            self._load(tablename)
+            return self._max_ids[tablename]
+
+    def get(self, tablename:str, id) -> dict:
+        """get a copy of a row. Raises KeyError if it does not exist"""
+        with self._locked():
+            return dict(self._load(tablename)[str(id)])
+
+    def rows(self, tablename:str) -> dict:
+        """get a copy of all rows of a table as {id: row}"""
+        with self._locked():
+            return {k: dict(v) for k, v in self._load(tablename).items()}
+
+    def upsert(self, tablename:str, id, dc:dict) -> dict:
+        """add a new row or merge dc into an existing one and return a copy of the result"""
+        with self.transaction():
+            self._load(tablename)
+            key = self._set_row(tablename, id, dc)
+
+            # several changes of the same row are merged into a single journal line
+            pending = self._pending.setdefault(tablename, {})
+            if key in pending:
+                pending[key]['row'].update(dc)
+            else:
+                pending[key] = {'id': id, 'row': dict(dc)}
+                self._mark_dirty()
+            return dict(self._tables[tablename][key])
+
+    def flush(self):
+        """write all changes held back so far to the journals"""
+        with self._locked():
+            self._flush_pending()
+
+    def _flush_pending(self):
+        self._cancel_timer()
+        pending, self._pending, self._n_dirty = self._pending, {}, 0
+        for tablename, deltas in pending.items():
+            self._append(tablename, deltas.values())
+            if self._n_journaled[tablename] >= self.compact_every:
+                self.compact(tablename)
+
+    def _append(self, tablename, deltas):
+        fp = self._journals.get(tablename)
+        if fp is None:
+            pth = self._get_path(tablename, '.journal')
+            journal = _stat(pth)
+            if journal and journal[2] > self._offsets[tablename]:
+                # drop an incomplete last line, so the next line does not get appended to it
+                os.truncate(pth, self._offsets[tablename])
+            fp = open(pth, 'ab')
+            self._journals[tablename] = fp
+        data = b''.join(json.dumps(delta).encode() + b'\n' for delta in deltas)
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+        self._offsets[tablename] += len(data)
+        self._n_journaled[tablename] += len(deltas)
+
+    def find(self, tablename:str, **where) -> list:
+        """get copies of all rows of a table whose fields equal the given values (e.g. parent_id=5)"""
+        with self._locked():
+            return [dict(row) for row in self._load(tablename).values() if all(row.get(k) == v for k, v in where.items())]
+
+    def compact(self, tablename:str=None):
+        """write the current rows of one (or all loaded) tables as `<table>.json`
+        snapshot and truncate the journal"""
+        with self._locked():
+            for t in ([tablename] if tablename else list(self._tables.keys())):
+                # the snapshot holds all pending changes as well
+                self._n_dirty -= len(self._pending.pop(t, {}))
+                if not self._pending:
+                    self._cancel_timer()
+                db = self._load(t)
+                # the snapshot is replaced atomically before the journal is truncated. A crash
+                # in between only replays changes which are already in the snapshot
+                _write_json_atomic(self._get_path(t, '.json'), db)
+                fp = self._journals.pop(t, None)
+                if fp is not None:
+                    fp.close()
+                open(self._get_path(t, '.journal'), 'w').close()
+                self._snapshots[t] = _stat(self._get_path(t, '.json'))
+                self._offsets[t] = 0
+                self._n_journaled[t] = 0
+
+    def export_json(self):
+        """write all loaded tables to their `<table>.json` files"""
+        self.compact()
+
+    def close(self):
+        """compact all tables and close the journal files"""
+        self.compact()
+        if self._flock is not None:
+            self._flock.close()
+        _open_stores.discard(self)
+
+
+
+class MemoryStore():
+    """Row store with the same interface as JournalStore which keeps all rows in
+    memory only. Nothing is written to disk unless export_json is called with a
+    savedir (or the store was given one). For tests, benchmarks and runs whose rows
+    are not needed afterwards.
+
+    Args:
+        savedir (str, optional): directory to write the `<table>.json` files to on export_json() and close(). Defaults to None for never writing anything.
+    """
+    def __init__(self, savedir:str=None):
+        self.savedir = savedir
+        self._tables = {}
+        self._max_ids = {}
+        self._lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """context in which reads and writes are atomic with respect to other threads"""
+        with self._lock:
+            yield self
+
+    def _load(self, tablename:str) -> dict:
+        if tablename not in self._tables:
+            self._tables[tablename] = {}
+            self._max_ids[tablename] = 0
+        return self._tables[tablename]
+
+    def has_rows(self, tablename:str) -> bool:
+        """True if the table has at least one row"""
+        with self._lock:
+            return len(self._load(tablename)) > 0
+
+    def contains(self, tablename:str, id) -> bool:
+        with self._lock:
+            return str(id) in self._load(tablename)
+
+    def max_id(self, tablename:str) -> int:
+        """the highest integer id in the table (0 for an empty table)"""
+        with self._lock:
+            self._load(tablename)
+            return self._max_ids[tablename]
+
+    def get(self, tablename:str, id) -> dict:
+        """get a copy of a row. Raises KeyError if it does not exist"""
+        with self._lock:
+            return dict(self._load(tablename)[str(id)])
+
+    def rows(self, tablename:str) -> dict:
+        """get a copy of all rows of a table as {id: row}"""
+        with self._lock:
+            return {k: dict(v) for k, v in self._load(tablename).items()}
+
+    def upsert(self, tablename:str, id, dc:dict) -> dict:
+        """add a new row or merge dc into an existing one and return a copy of the result"""
+        with self._lock:
+            db = self._load(tablename)
+            key = str(id)
+            db[key] = {**db[key], **dc} if key in db else dict(dc)
+            if isinstance(id, int) or key.lstrip('-').isdigit():
+                self._max_ids[tablename] = max(self._max_ids[tablename], int(key))
+            return dict(db[key])
+
+    def find(self, tablename:str, **where) -> list:
+        """get copies of all rows of a table whose fields equal the given values (e.g. parent_id=5)"""
+        with self._lock:
+            return [dict(row) for row in self._load(tablename).values() if all(row.get(k) == v for k, v in where.items())]
+
+    def flush(self):
+        """nothing to do, all rows are kept in memory"""
+
+    def compact(self, tablename:str=None):
+        """nothing to do, all rows are kept in memory"""
+
+    def export_json(self, savedir:str=None):
+        """write all tables as `<table>.json` files with the same layout as a JournalStore
+
+        Args:
+            savedir (str, optional): directory to write the files to. Defaults to None for the savedir of this store (nothing is written if it has none).
+        """
+        savedir = savedir if savedir else self.savedir
+        if not savedir:
+            return
+        with self._lock:
+            for tablename in self._tables.keys():
+                _write_json_atomic(os.path.join(savedir, tablename + '.json').replace('\\', '/'), self.rows(tablename))
+
+    def close(self):
+        """write all tables to savedir (if given)"""
+        self.export_json()
+
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+table_fields = {
+    'experiments': script_fields,
+    'measurement_data': {
+        "id": "INTEGER PRIMARY KEY",
+        "experiment_id": "INTEGER",
+        "antenna_id": "TEXT",
+        "meas_name": "TEXT",
+        "time_iso": "TEXT",
+        "tags": "TEXT",
+        "filename": "TEXT",
+        "status": "TEXT",
+        "devices_json": "TEXT",
+        "aux_files_json": "TEXT",
+    },
+    'aux_files': {
+        "id": "INTEGER PRIMARY KEY",
+        "parent_id": "INTEGER",
+        "parent_type": "TEXT",
+        "device": "TEXT",
+        "path": "TEXT",
+        "tag": "TEXT",
+    },
+}
+"""column layout of the tables in a SqliteStore. Fields of a row which are not a column are kept in its extra_json column"""
+
+table_indices = {
+    'measurement_data': ['experiment_id'],
+    'aux_files': ['parent_id', 'device'],
+}
+"""indexed columns per table in a SqliteStore"""
+
+_affinity_types = {'TEXT': (str,), 'INTEGER': (int,), 'REAL': (float,)}
+
+
+def _int_id(id):
+    """the integer id of a SqliteStore row. Raises KeyError for ids which can not
+    be one (like a missing key in the other stores)"""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        raise KeyError(id) from None
+
+
+class SqliteStore(_WriteBehind):
+    """Row store with the same interface as JournalStore which keeps all tables in
+    a single SQLite database with the column layout from table_fields. The database
+    runs in WAL mode, so other processes can read it while the experiment is writing.
+    export_json() writes the tables in the `<table>.json` layout of a JournalStore.
+
+    Only non null values whose type matches the column type are kept in the columns,
+    everything else is kept in the extra_json column of the row, so rows read back
+    are equal to the rows stored.
+
+    With write-behind (flush_every > 1 or flush_interval) changes are collected in an
+    open transaction which is committed on flush, so other processes only see them
+    after the flush. With shared=True each transaction() takes the write lock of the
+    database (BEGIN IMMEDIATE) and is committed when it ends, so ids handed out by
+    max_id() + 1 within a transaction() are unique across processes.
+
+    Args:
+        savedir (str): directory to keep the database (and exported json files) in
+        filename (str, optional): name of the database file in savedir. Defaults to 'local.sqlite'.
+        flush_every (int, optional): number of uncommitted changes after which they are committed. Defaults to 1 (write through).
+        flush_interval (float, optional): max seconds a change is held back before it is committed. Defaults to None for no timer.
+        shared (bool, optional): set True if other processes write to the same database at the same time. Defaults to False.
+        timeout (float, optional): max seconds to wait for the write lock of the database. Defaults to 60.
+    """
+    def __init__(self, savedir:str, filename:str='local.sqlite', flush_every:int=1, flush_interval:float=None, shared:bool=False, timeout:float=60):
+        self.savedir = savedir
+        self.path = os.path.join(savedir, filename).replace('\\', '/')
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._columns = {}
+        self._conn = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_write_behind(flush_every, flush_interval)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """context in which reads and writes are atomic with respect to other threads
+        and (for shared stores) other processes. For shared stores all changes made
+        within are committed when the outermost transaction ends."""
+        with self._lock:
+            if self.shared and self._depth == 0 and not self._conn.in_transaction:
+                self._conn.execute('BEGIN IMMEDIATE')
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self.shared and self._depth == 0:
+                    self.flush()
+
+    def _get_columns(self, tablename:str) -> dict:
+        columns = self._columns.get(tablename)
+        if columns is not None:
+            return columns
+
+        assert tablename.isidentifier(), f'invalid table name "{tablename}"'
+        columns = {k: v for k, v in table_fields.get(tablename, {'id': 'INTEGER PRIMARY KEY'}).items()}
+        cols = ', '.join(f'"{k}" {v}' for k, v in columns.items())
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{tablename}" ({cols}, extra_json TEXT)')
+        for col in table_indices.get(tablename, []):
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{tablename}_{col}" ON "{tablename}" ("{col}")')
+
+        # tables created by other versions might have fewer columns
+        existing = [r[1] for r in self._conn.execute(f'PRAGMA table_info("{tablename}")')]
+        columns = {k: v.split()[0] for k, v in columns.items() if k in existing}
+        self._columns[tablename] = columns
+        return columns
+
+    def _to_row(self, tablename:str, values) -> dict:
+        row = {k: v for k, v in zip(self._get_columns(tablename).keys(), values) if v is not None}
+        if values[-1]:
+            row.update(json.loads(values[-1]))
+        return row
+
+    def _select(self, tablename:str, where:str='', params=()) -> list:
+        cols = ', '.join(f'"{k}"' for k in self._get_columns(tablename).keys())
+        cur = self._conn.execute(f'SELECT {cols}, extra_json FROM "{tablename}" {where}', params)
+        return [self._to_row(tablename, values) for values in cur.fetchall()]
+
+    def has_rows(self, tablename:str) -> bool:
+        """True if the table has at least one row"""
+        with self._lock:
+            self._get_columns(tablename)
+            return self._conn.execute(f'SELECT 1 FROM "{tablename}" LIMIT 1').fetchone() is not None
+
+    def contains(self, tablename:str, id) -> bool:
+        with self._lock:
+            self._get_columns(tablename)
+            try:
+                id = _int_id(id)
+            except KeyError:
+                return False
+            return self._conn.execute(f'SELECT 1 FROM "{tablename}" WHERE id=?', (id,)).fetchone() is not None
+
+    def max_id(self, tablename:str) -> int:
+        """the highest id in the table (0 for an empty table)"""
+        with self._lock:
+            self._get_columns(tablename)
+            ret = self._conn.execute(f'SELECT max(id) FROM "{tablename}"').fetchone()[0]
+            return ret if ret is not None else 0
+
+    def get(self, tablename:str, id) -> dict:
+        """get a row. Raises KeyError if it does not exist"""
+        with self._lock:
+            rows = self._select(tablename, 'WHERE id=?', (_int_id(id),))
+        if not rows:
+            raise KeyError(id)
+        return rows[0]
+
+    def rows(self, tablename:str) -> dict:
+        """get all rows of a table as {id: row} with the ids as strings"""
+        with self._lock:
+            return {str(row['id']): row for row in self._select(tablename, 'ORDER BY id')}
+
+    def find(self, tablename:str, **where) -> list:
+        """get all rows of a table whose fields equal the given values (e.g. parent_id=5).
+        Only conditions on columns can make use of the indices."""
+        with self._lock:
+            columns = self._get_columns(tablename)
+            on_cols = {k: v for k, v in where.items() if k in columns and v is not None and isinstance(v, _affinity_types[columns[k]])}
+            sql = ' AND '.join(f'"{k}"=?' for k in on_cols)
+            rows = self._select(tablename, 'WHERE ' + sql if sql else '', tuple(on_cols.values()))
+        return [row for row in rows if all(row.get(k) == v for k, v in where.items())]
+
+    def upsert(self, tablename:str, id, dc:dict) -> dict:
+        """add a new row or merge dc into an existing one and return the result"""
+        with self.transaction():
+            columns = self._get_columns(tablename)
+            old = self._select(tablename, 'WHERE id=?', (int(id),))
+            row = {**old[0], **dc} if old else dict(dc)
+            row['id'] = int(id)
+
+            values, extra = {}, {}
+            for k, v in row.items():
+                # bool is an int, but would not come back as one
+                if k in columns and v is not None and type(v) is not bool and isinstance(v, _affinity_types[columns[k]]):
+                    values[k] = v
+                else:
+                    extra[k] = v
+            values['extra_json'] = json.dumps(extra) if extra else None
+
+            cols = ', '.join(f'"{k}"' for k in values.keys())
+            if not self._conn.in_transaction:
+                self._conn.execute('BEGIN')
+            self._conn.execute(f'INSERT OR REPLACE INTO "{tablename}" ({cols}) VALUES ({", ".join("?" * len(values))})', tuple(values.values()))
+            self._mark_dirty()
+            return row
+
+    def flush(self):
+        """commit all changes held back so far"""
+        with self._lock:
+            if self.shared and self._depth > 0:
+                # committed when the outermost transaction ends
+                return
+            self._cancel_timer()
+            self._n_dirty = 0
+            if self._conn.in_transaction:
+                self._conn.execute('COMMIT')
+
+    def compact(self, tablename:str=None):
+        """commit pending changes and checkpoint the WAL into the database file"""
+        with self._lock:
+            self.flush()
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def export_json(self, savedir:str=None):
+        """write all tables as `<table>.json` files with the same layout as a JournalStore
+
+        Args:
+            savedir (str, optional): directory to write the files to. Defaults to None for the savedir of this store.
+        """
+        savedir = savedir if savedir else self.savedir
+        with self._lock:
+            tables = [r[0] for r in self._conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+            for tablename in tables:
+                _write_json_atomic(os.path.join(savedir, tablename + '.json').replace('\\', '/'), self.rows(tablename))
+
+    def close(self):
+        """checkpoint and close the database"""
+        with self._lock:
+            self.compact()
+            self._conn.close()
+        _open_stores.discard(self)
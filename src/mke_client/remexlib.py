@@ -4,12 +4,13 @@
 interface library for remote scheduling of scripts on procserver and accessing data entries in dbserver
 """
 
-import requests
 import json
-import re
-import datetime, dateutil, pytz
-import numpy as np
-import pandas as pd
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from mke_client.helpers import make_zulustr, get_utcnow, parse_zulutime, parse_zulutimes
+from mke_client.transport import Transport, get_default_transport
+from mke_client.schedule import ScheduleIndex
 
 status_dc = {
     'INITIALIZING': 0,
@@ -70,59 +71,11 @@ script_fields = {
         "change_history": 'TEXT'
     }
 
-def __get_starttime(row, i, df):
-    if 'time_started_iso' in row and row['time_started_iso']:
-        return row['time_started_iso']
-    elif parse_zulutime(row['start_condition']):
-        return parse_zulutime(row['start_condition'])
-
-
-def __get_endtime(row, i, df):
-    if 'time_finished_iso' in row and row['time_finished_iso']:
-        return row['time_finished_iso']
-    elif row['tstart'] is not None and row['duration_expected_hr_dec'] is not None:
-        return row['tstart'] + datetime.timedelta(hours=row['duration_expected_hr_dec'])
-    else:
-        return row['tstart'] + datetime.timedelta(minutes=1)
-
-################################################################################
-################################################################################
-################################################################################
-
-
-def make_zulustr(dtobj, remove_ms = True):
-    '''helper function to make a zulu style iso datetime format string like
-    2022-06-29T00:24:12Z for remove_ms=True
-    2022-06-29T00:24:12.123456Z for remove_ms=False'''
-    utc = dtobj.replace(tzinfo=pytz.utc)
-    if remove_ms:
-        utc = utc.replace(microsecond=0)
-    return utc.isoformat().replace('+00:00','') + 'Z'
-
-def get_utcnow():
-    """gets current utc time timezone aware as datetime.datetime object from local clock
-    """
-    return datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
-
-
-def parse_zulutime(s):
-    """tries parsing any iso style format datetime string and returns it as timezone aware datetime.datetime object. 
-    
-    will return None on fail"""
-    try:
-        if re.match(r'[0-9]{4}-[0-9]{2}-[0-9]{2}Z', s) is not None:
-            s = s[:-1] + 'T00:00:00Z'
-        return dateutil.parser.isoparse(s).replace(tzinfo=pytz.utc)
-    except Exception:
-        return None
-
-
-
 ################################################################################
 ################################################################################
 ################################################################################
 
-def add_antenna(uri, id, address, altitude=1086, lat=-30.717972, lon=21.413028, comments='', params_json='', software_version='000', configuration=None):
+def add_antenna(uri, id, address, altitude=1086, lat=-30.717972, lon=21.413028, comments='', params_json='', software_version='000', configuration=None, transport:Transport=None):
     """Convenience Function to add an antenna to the remote database based on arguments
 
     Args:
@@ -136,6 +89,7 @@ def add_antenna(uri, id, address, altitude=1086, lat=-30.717972, lon=21.413028,
         params_json (str, optional): the antenna parameters as json encoded string ip applicable. Defaults to ''.
         software_version (str, optional): The antenna software version currently running. Defaults to '000'.
         configuration (str, optional): any string you want to give for configuration info. Defaults to None.
+        transport (Transport, optional): the pooled transport to send the request through. Defaults to None for the shared default transport.
 
     Returns:
         dict: the dictionary returned by the remote api for the generated antenna if successful otherwise raises an error
@@ -149,7 +103,8 @@ def add_antenna(uri, id, address, altitude=1086, lat=-30.717972, lon=21.413028,
         lon=lon, 
         params_json=params_json, comments=comments)
 
-    r = requests.post(f'{uri}/antennas', json=dc)
+    transport = transport if transport is not None else get_default_transport()
+    r = transport.post(f'{uri}/antennas', json=dc)
     assert r.status_code < 300, r.text
     return r.json()
 
@@ -212,7 +167,7 @@ class ScriptMinimal():
         self.devices_json = devices_json
         self.script_params_json = script_params_json
 
-        for k, v in kwargs:
+        for k, v in kwargs.items():
             assert k in script_fields, f'"{k}" is not in the allowed fields for a script object. Allowed are: "' + ','.join(script_fields.keys()) + '"'
             setattr(self, k, v)
 
@@ -235,23 +190,29 @@ class ScriptMinimal():
 ################################################################################
 
 class RemexApiAccessor():
-    def __init__(self, uri, scriptype):
+    def __init__(self, uri, scriptype, transport:Transport=None):
         self.uri = uri
         self.scriptype = scriptype
+        self._transport = transport
+
+    @property
+    def transport(self) -> Transport:
+        """the pooled HTTP transport used for all requests of this object"""
+        return self._transport if self._transport is not None else get_default_transport()
 
     def post(self, dc):
-        r = requests.post(f'{self.uri}/{self.scriptype}', json=dc)
+        r = self.transport.post(f'{self.uri}/{self.scriptype}', json=dc)
         assert r.status_code < 300, r.text
         return r.json()
 
     def get(self, id, scriptype=None):
         scriptype = scriptype if scriptype else self.scriptype
-        r = requests.get(f'{self.uri}/{scriptype}/{id}')
+        r = self.transport.get(f'{self.uri}/{scriptype}/{id}')
         assert r.status_code  == 200, r.text
         return r.json()
 
     def patch(self, id, dc):
-        r = requests.patch(f'{self.uri}/{self.scriptype}/{id}', json=dc)
+        r = self.transport.patch(f'{self.uri}/{self.scriptype}/{id}', json=dc)
         assert r.status_code < 300, r.text
         return r.json()
 
@@ -287,7 +248,7 @@ class RemexApiAccessor():
         if not start_condition:
             start_condition =  make_zulustr(datetime.datetime.utcnow())
         
-        r = requests.get(f'{self.uri}/get_schemas')
+        r = self.transport.get(f'{self.uri}/get_schemas')
         assert r.status_code  == 200, r.text
         dc = r.json()
 
@@ -307,29 +268,45 @@ class RemexApiAccessor():
         if verbose > 1:
             print(json.dumps(dc, indent=2))
 
-        r = requests.post(lnk, json=dc)
+        r = self.transport.post(lnk, json=dc)
         assert r.status_code < 300, r.text
         dcr = r.json()
         assert dcr['msg'] is None, dcr['msg']
         return dcr['data'], dcr['status']
 
 
-    def check_and_start(self, dc):
+    def check_and_start(self, dc, schedule:ScheduleIndex=None):
+        """submit a script to be checked and started by the server
+
+        Args:
+            dc (dict): the script row
+            schedule (ScheduleIndex, optional): a local index of the schedule to check the script 
+                against for overlaps on its antenna before submitting it. The script is added to it 
+                once submitted. Defaults to None for no local check.
+        """
+        if schedule is not None:
+            conflicts = schedule.conflicts(dc)
+            assert not conflicts, 'the script overlaps with the scripts {} on antenna {}'.format(conflicts, dc.get('antenna_id'))
+
         lnk = f'{self.uri}/check_and_start/{self.scriptype}'
         if verbose > 0:
             print(lnk)
-        r = requests.post(lnk, json=dc)
+        r = self.transport.post(lnk, json=dc)
         assert r.status_code < 300, r.text
         dcr = r.json()
         assert dcr['msg'] is None, dcr['msg']
+
+        if schedule is not None:
+            data = dcr['data']
+            schedule.add(data if isinstance(data, dict) and 'id' in data else dc)
         return dcr['data'], dcr['status']
 
 
     def abort(self, id):
-        return requests.get(f'{self.uri}/abort/{self.scriptype}/{id}')
+        return self.transport.get(f'{self.uri}/abort/{self.scriptype}/{id}')
 
     def cancel(self, id):
-        return requests.get(f'{self.uri}/cancel/{self.scriptype}/{id}')
+        return self.transport.get(f'{self.uri}/cancel/{self.scriptype}/{id}')
 
     def set_chained_start(self, id_after, id_pre, pre_type=None, delay_minutes=0):
 
@@ -389,6 +366,8 @@ def add_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=Non
                     devices_json='[]', 
                     script_params_json = '{}',
                     needs_manual_upload:int=0, 
+                    transport:Transport=None,
+                    schedule:ScheduleIndex=None,
                     **kwargs):
     """convenience function 
 
@@ -401,9 +380,11 @@ def add_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=Non
         devices_json (str, optional): A list of devices used while running this experiment. Defaults to '[]'.
         script_params_json (str, optional): json encoded dictionary holding the additional parameters for this script. Defaults to '{}'.
         needs_manual_upload (int, optional): set to 1 in order to block post processing until data has been uploaded manually. Defaults to 0.
+        transport (Transport, optional): the pooled transport to send the request through. Defaults to None for the shared default transport.
+        schedule (ScheduleIndex, optional): a local index of the schedule to check the script against for overlaps before submitting it. Defaults to None.
     """
 
-    api = RemexApiAccessor(uri, scriptype=script_type)
+    api = RemexApiAccessor(uri, scriptype=script_type, transport=transport)
     script = ScriptMinimal(script_in_path, 
                     antenna_id, 
                     start_condition, 
@@ -415,7 +396,7 @@ def add_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=Non
                     **kwargs)
     
 
-    return api.check_and_start(script.to_dict())
+    return api.check_and_start(script.to_dict(), schedule=schedule)
 
 
 def test_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=None, 
@@ -425,9 +406,10 @@ def test_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=No
                     devices_json='[]', 
                     script_params_json = '{}',
                     needs_manual_upload:int=0, 
+                    transport:Transport=None,
                     **kwargs):
 
-    api = RemexApiAccessor(uri, scriptype=script_type)
+    api = RemexApiAccessor(uri, scriptype=script_type, transport=transport)
     script = ScriptMinimal(script_in_path, 
                     antenna_id, 
                     start_condition, 
@@ -446,20 +428,205 @@ def test_script(uri, script_type:str, script_in_path:str=None, antenna_id:str=No
 ################################################################################
 ################################################################################
 
+_field_types = {'TEXT': (str,), 'INTEGER': (int,), 'REAL': (int, float)}
+
+
+def validate_script(dc) -> list:
+    """check a script row locally against script_fields before submitting it
+
+    Checks for unknown fields, missing required fields, the field types, a parsable 
+    start_condition, a non negative duration, the status enum, needs_manual_upload
+    and that all `*_json` fields hold valid json.
+
+    Args:
+        dc (dict or ScriptMinimal): the script
+
+    Returns:
+        list: the error messages (empty if the script is valid)
+    """
+    if isinstance(dc, ScriptMinimal):
+        dc = dc.to_dict()
+    errors = []
+
+    for k in ['script_in_path', 'antenna_id', 'start_condition']:
+        if not dc.get(k):
+            errors.append(f'"{k}" must be given')
+
+    for k, v in dc.items():
+        if k not in script_fields:
+            errors.append(f'"{k}" is not in the allowed fields for a script object')
+            continue
+        types = _field_types[script_fields[k].split()[0]]
+        if v is not None and (isinstance(v, bool) or not isinstance(v, types)):
+            errors.append(f'"{k}" must be of type {script_fields[k].split()[0]}, got {type(v).__name__}')
+        elif k.endswith('_json') and v:
+            try:
+                json.loads(v)
+            except ValueError as err:
+                errors.append(f'"{k}" is not valid json: {err}')
+
+    if dc.get('start_condition') and isinstance(dc['start_condition'], str) and parse_zulutime(dc['start_condition']) is None:
+        errors.append('"start_condition" could not be parsed as zulu time: {}'.format(dc['start_condition']))
+    duration = dc.get('duration_expected_hr_dec')
+    if isinstance(duration, (int, float)) and duration < 0:
+        errors.append('"duration_expected_hr_dec" can not be negative')
+    if 'status' in dc and dc['status'] not in status_dc:
+        errors.append('"status" must be in ' + ', '.join(status_dc.keys()))
+    if dc.get('needs_manual_upload') not in [None, 0, 1]:
+        errors.append('"needs_manual_upload" needs to be 1|0')
+    return errors
+
+
+def add_scripts(uri, script_type:str, scripts:list, transport:Transport=None, max_workers:int=8, 
+                schedule:ScheduleIndex=None, check_overlaps=True, dry_run=False) -> list:
+    """validate many scripts locally and submit the valid ones concurrently
+
+    All scripts are first checked with validate_script and (with check_overlaps) against
+    each other and the given schedule for overlaps on their antenna, in the given order. 
+    The scripts which pass are then submitted with at most max_workers requests in flight 
+    over the pooled transport. Scripts failing validation are not submitted.
+
+    Example::
+
+        report = add_scripts(uri, 'experiments', [ScriptMinimal(...), ...], max_workers=16)
+        failed = [r for r in report if not r['ok']]
+
+    Args:
+        uri (str): the remote database server api link
+        script_type (str): 'experiments' or 'analyses'
+        scripts (list): the scripts as ScriptMinimal objects or dicts
+        transport (Transport, optional): the pooled transport to send the requests through. Defaults to None for the shared default transport.
+        max_workers (int, optional): max number of concurrent submissions. Defaults to 8.
+        schedule (ScheduleIndex, optional): the current schedule to check for overlaps. Successfully submitted scripts are added to it. Defaults to None.
+        check_overlaps (bool, optional): set False to skip the local overlap check. Defaults to True.
+        dry_run (bool, optional): set True to only pre check the scripts on the server (see test_script) instead of starting them. Defaults to False.
+
+    Returns:
+        list: one report dict per script in the given order with the keys
+            ok (bool), stage ('validation', 'submission' or None if ok), 
+            errors (list of str), data and status (as returned by the server)
+    """
+    api = RemexApiAccessor(uri, scriptype=script_type, transport=transport)
+    schedule = schedule if schedule is not None else ScheduleIndex()
+    rows = [dc.to_dict() if isinstance(dc, ScriptMinimal) else dict(dc) for dc in scripts]
+    report = [{'ok': False, 'stage': 'validation', 'errors': validate_script(dc), 'data': None, 'status': None} for dc in rows]
+
+    batch_ids = {}
+    for i, dc in enumerate(rows):
+        if report[i]['errors'] or not check_overlaps:
+            continue
+        conflicts = schedule.conflicts(dc)
+        if conflicts:
+            names = ['scripts[{}]'.format(c[1]) if isinstance(c, tuple) and c[0] == 'batch' else str(c) for c in conflicts]
+            report[i]['errors'].append('overlaps with {} on antenna {}'.format(', '.join(names), dc.get('antenna_id')))
+        else:
+            batch_ids[i] = schedule.add(dc, id=('batch', i))
+
+    def submit(dc):
+        return api.pre_check(dc) if dry_run else api.check_and_start(dc)
+
+    to_submit = [i for i, r in enumerate(report) if not r['errors']]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {i: pool.submit(submit, rows[i]) for i in to_submit}
+        for i, fut in futures.items():
+            try:
+                data, status = fut.result()
+                report[i].update(ok=True, stage=None, data=data, status=status)
+            except Exception as err:
+                report[i].update(stage='submission', errors=[str(err)])
+
+    for i, id in batch_ids.items():
+        schedule.remove(id)
+        data = report[i]['data']
+        if report[i]['ok'] and not dry_run:
+            schedule.add(data if isinstance(data, dict) and 'id' in data else rows[i])
+    return report
+
+
+################################################################################
+################################################################################
+################################################################################
+
+
+def find_overlaps(df_in) -> 'pd.DataFrame':
+    """find all scripts which are scheduled to start before an earlier script on
+    the same antenna has ended. Needs the tstart and tend columns as made by 
+    get_expected_schedule.
+
+    Each overlapping script (b) is paired with the earlier script on the same antenna 
+    which ends last (a). Scripts without a start time are ignored. As in 
+    schedule.ScheduleIndex the intervals are half open [tstart, tend), so a script 
+    may start exactly when the one before it ends.
+
+    Args:
+        df_in (pd.DataFrame): the schedule with the columns antenna_id, tstart and tend
+
+    Returns:
+        pd.DataFrame: one row per overlapping pair with the columns 
+            antenna_id, index_a, index_b, tend_a, tstart_b
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df_in[['antenna_id', 'tstart', 'tend']].copy()
+    df['tstart'] = parse_zulutimes(df['tstart']) if df['tstart'].dtype == object else df['tstart']
+    df['tend'] = parse_zulutimes(df['tend']) if df['tend'].dtype == object else df['tend']
+    df = df[df['tstart'].notna()]
+    df['index_b'] = df.index
+
+    df = df.sort_values(['antenna_id', 'tstart'], kind='stable').reset_index(drop=True)
+    g = df.groupby('antenna_id', sort=False)
+
+    # the latest end time of all scripts before each one and which script it belongs to
+    tend_max = g['tend'].cummax()
+    pos = pd.Series(np.arange(len(df)), dtype=float).where(df['tend'] == tend_max)
+    pos = pos.groupby(df['antenna_id'], sort=False).ffill()
+    df['tend_a'] = tend_max.groupby(df['antenna_id'], sort=False).shift(1)
+    df['pos_a'] = pos.groupby(df['antenna_id'], sort=False).shift(1)
+
+    overlaps = df[df['tend_a'] > df['tstart']].reset_index(drop=True)
+    return pd.DataFrame({
+        'antenna_id': overlaps['antenna_id'],
+        'index_a': df['index_b'].values[overlaps['pos_a'].values.astype(int)],
+        'index_b': overlaps['index_b'],
+        'tend_a': overlaps['tend_a'],
+        'tstart_b': overlaps['tstart'],
+    })
+
 
 def raise_on_overlap(df_in):
-    for antenna_id in df_in['antenna_id'].unique():
-        df = df_in[df_in['antenna_id'] == antenna_id]
-        df = df.sort_values('tstart')
-        if raise_on_overlap:
-            ol = df['tend'].iloc[:-1].values - df['tstart'].iloc[1:].values
-            overlap = df['tend'].iloc[:-1].values >= df['tstart'].iloc[1:].values
-            assert not np.any(overlap), 'Found overlap at: ' + str(overlap) + str(df[['tstart', 'tend']]) + str(ol)
+    """raises an AssertionError listing all overlapping scripts (see find_overlaps) if there are any"""
+    overlaps = find_overlaps(df_in)
+    assert overlaps.empty, 'Found {} overlaps at:\n{}'.format(len(overlaps), overlaps.to_string())
 
 
 def get_expected_schedule(df):
-    df['tstart'] = pd.Series({i:__get_starttime(row, i, df) for i, row in df.iterrows()})
-    df['tend'] = pd.Series({i:(__get_endtime(row, i, df) if not pd.isnull(row['tstart']) else None) for i, row in df.iterrows()})
+    """adds the columns tstart and tend (datetime64, utc) with the expected start and 
+    end time of each script to a dataframe of experiments or analyses.
+
+    tstart is time_started_iso if given, else start_condition. tend is time_finished_iso 
+    if given, else tstart + duration_expected_hr_dec (or 1 minute if no duration is 
+    given). Both are NaT if no start time can be found.
+    """
+    import pandas as pd
+
+    nat = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+    col = lambda k: parse_zulutimes(df[k]) if k in df else nat
+
+    tstart = col('time_started_iso')
+    tstart = tstart.where(tstart.notna(), col('start_condition'))
+
+    if 'duration_expected_hr_dec' in df:
+        duration = pd.to_timedelta(pd.to_numeric(df['duration_expected_hr_dec'], errors='coerce'), unit='h')
+    else:
+        duration = pd.Series(pd.NaT, index=df.index, dtype='timedelta64[ns]')
+    duration = duration.where(duration.notna(), pd.Timedelta(minutes=1))
+
+    tend = col('time_finished_iso')
+    tend = tend.where(tend.notna(), tstart + duration)
+
+    df['tstart'] = tstart
+    df['tend'] = tend.where(tstart.notna())
     return df
 
 
@@ -5,24 +5,25 @@ MeerKAT Extension (MKE)
 interface library for accessing remote experiment and analysis data in a dbserver
 """
 
-import copy
-import requests
+import collections
 
 import datetime
 
 import os
 import json
+import threading
+import time
 
 import logging
-import sys
 
-_log = logging.getLogger()
-streamHandler = logging.StreamHandler(sys.stdout)
-streamHandler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-_log.addHandler(streamHandler)
+_log = logging.getLogger(__name__)
 
 from mke_client.helpers import get_utcnow, make_zulustr, parse_zulutime
-import mke_client.filesys_storage_api as filesys
+from mke_client.transport import Transport, get_default_transport, default_timeout
+from mke_client.cache import RowCache
+from mke_client.upload import default_chunk_size
+from mke_client.upload_queue import UploadQueue
+from mke_client.backends import StorageBackend, HttpBackend, open_backend
 
 
 
@@ -49,46 +50,182 @@ allowed_status_codes = {
 }
 
 
+TickState = collections.namedtuple('TickState', ['remaining_hours', 'cancel_requested', 'status', 'status_code', 'start_time'])
+TickState.__doc__ = """immutable snapshot of the control loop relevant state of a
+remote experiment or analysis row as returned by BaseRimObj.poll()
+
+    remaining_hours (float): the remaining time in hours for this script to run
+    cancel_requested (bool): true if cancel was requested, false if not
+    status (str): the status string of the row
+    status_code (int): the numeric status code for status
+    start_time (datetime.datetime): the parsed start_condition (utc)
+"""
+
+
+default_watch_timeout = 30.0
+"""max seconds the server holds a long-poll request on `<table>/<id>/watch` open"""
+
+default_poll_interval = (0.1, 5.0)
+"""(min, max) seconds between two polls when watching a row on a server without long-poll support"""
+
+
+class StatusWatch(threading.Thread):
+    """background thread returned by BaseRimObj.on_status_change which calls
+    callback(status, row) once with the current status and then on every change
+    until stop() is called"""
+    def __init__(self, obj, callback, poll_interval=default_poll_interval):
+        super().__init__(name=f'mke_watch_{obj.tablename}_{obj.id}', daemon=True)
+        self.obj = obj
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        status = None
+        while not self._stop_event.is_set():
+            try:
+                for row in self.obj.watch(poll_interval=self.poll_interval, stop=self._stop_event):
+                    if row['status'] != status:
+                        status = row['status']
+                        self.callback(status, row)
+            except Exception as err:
+                _log.error('watching %s/%s failed: %s', self.obj.tablename, self.obj.id, err)
+                self._stop_event.wait(self.poll_interval[1])
+
+    def stop(self):
+        """stop watching. The thread ends once a pending request returns"""
+        self._stop_event.set()
+
+
+def _is_cancel_requested(row:dict) -> bool:
+    assert row['status'] in allowed_status_codes, 'ERROR! The remote status ' + row['status'] + ' is unrecognized'
+    return allowed_status_codes[row['status']] >= 100 or row['status'] == 'CANCELLING'
+
+
+def _get_start_time(row:dict) -> datetime.datetime:
+    tstart = parse_zulutime(row['start_condition'])
+    assert tstart is not None, '"start_condition" could not be parsed. Got: {} {}'.format(type(row['start_condition']), row['start_condition'])
+    return tstart
+
+
+def _get_remaining_hours(row:dict, t_is:datetime.datetime=None, tstart:datetime.datetime=None) -> float:
+    if tstart is None:
+        tstart = _get_start_time(row)
+    if t_is is None:
+        t_is = get_utcnow()
+
+    t_end_req = tstart + datetime.timedelta(hours=float(row['duration_expected_hr_dec']))
+    t_rem = (t_end_req - t_is).total_seconds() / 60.0 / 60.0
+    return max(0, t_rem)
+
+
+def _make_tick_state(row:dict, t_is:datetime.datetime=None) -> TickState:
+    # the one place a TickState is made from a row, used by rimlib and asynclib
+    tstart = _get_start_time(row)
+    return TickState(remaining_hours=_get_remaining_hours(row, t_is, tstart),
+                     cancel_requested=_is_cancel_requested(row),
+                     status=row['status'],
+                     status_code=allowed_status_codes[row['status']],
+                     start_time=tstart)
+
+
+def _get_start_time_str(start_time=None) -> str:
+    if isinstance(start_time, datetime.datetime):
+        start_time = make_zulustr(start_time)
+    if not start_time:
+        start_time = make_zulustr(get_utcnow())
+    return start_time
+
+
+def _get_extensions(devices_to_add, add_main=True) -> dict:
+    if not devices_to_add:
+        extensions = {}
+    elif isinstance(devices_to_add, str):
+        extensions = {devices_to_add: '.csv'}
+    elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and isinstance(devices_to_add[0], str):
+        extensions = {k: '.csv' for k in devices_to_add}
+    elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and len(devices_to_add[0]) == 2:
+        extensions = dict(devices_to_add)
+    else:
+        extensions = {k:v for k, v in devices_to_add.items()}
+
+    if add_main and 'ACU' not in extensions:
+        extensions['ACU'] ='.csv'
+    return extensions
+
+
+def _make_measurement_payload(id, start_time=None, tag=None, extensions:dict=None) -> dict:
+    payload = {
+        'id': id, 
+        'row':{
+            'time_iso': _get_start_time_str(start_time),
+            'tags': tag
+            }
+        }
+    if extensions is not None:
+        payload['extensions'] = extensions
+    return payload
+
+
 class BaseRimObj():
     """base object to have the Analysis and Experiment 
     classes inherit from
     """
-    def __init__(self, uri, tablename, id):
+    def __init__(self, uri, tablename, id, transport:Transport=None, cache:RowCache=None, backend:StorageBackend=None):
         self.uri = uri
         self.__tablename = tablename
         self.id = id
+        self._transport = transport
+        self.cache = cache
+        self._backend = backend
+        self._watch_supported = None
 
     @property
     def tablename(self):
         """this objects associated table name"""
         return self.__tablename
 
+    @property
+    def transport(self) -> Transport:
+        """the pooled HTTP transport used for all requests of this object"""
+        return self._transport if self._transport is not None else get_default_transport()
+
+    @property
+    def backend(self) -> StorageBackend:
+        """the storage backend all rows are read and written through (opened from the uri on first use)"""
+        if self._backend is None:
+            self._backend = open_backend(self.uri, transport=self._transport, cache=self.cache)
+        return self._backend
+
     def get(self, tablename=None, id=None, **kwargs):
         if id is None:
             id = self.id
         if tablename is None:
             tablename = self.tablename
-        r = requests.get(f'{self.uri}/{tablename}/{id}', **kwargs)
-        assert r.status_code  == 200, r.text
-        return r.json()
+        return self.backend.get_row(tablename, id, **kwargs)
 
-    def patch_me(self, **kwargs):
-        r = requests.patch(f'{self.uri}/{self.tablename}/{self.id}', **kwargs)
-        assert r.status_code < 300, r.text
-        return r.json()
+    def patch_me(self, dc:dict=None, **kwargs):
+        """update the given fields of my row and return the updated row. The fields can
+        also be given as json= (as for requests.patch), all other keyword arguments are
+        passed on to the backend"""
+        if dc is None:
+            dc = kwargs.pop('json', None)
+        return self.backend.patch_row(self.tablename, self.id, dc, **kwargs)
 
     def post(self, route, **kwargs):
-        r = requests.post(f'{self.uri}/{route}', **kwargs)
-        assert r.status_code < 300, r.text
-        return r.json()
+        return self.backend.post(route, **kwargs)
 
     def get_me(self) -> dict:
         """returns the database entry row associated with this objects id as dictionary"""
         return self.get()
 
-    def get_my_antenna(self) -> dict:
-        """returns the antenna entry row associated with this objects antenna_id as dictionary"""
-        me = self.get() 
+    def get_my_antenna(self, row:dict=None) -> dict:
+        """returns the antenna entry row associated with this objects antenna_id as dictionary
+
+        Args:
+            row (dict, optional): an already fetched row of this object to take the antenna_id from. Defaults to None to fetch it.
+        """
+        me = row if row is not None else self.get() 
         return self.get('antennas', me['antenna_id'])
 
     def set_status(self, new_status:str, ignore_enum=False) -> dict:
@@ -146,37 +283,196 @@ class BaseRimObj():
         """
         return self.set_status('RUNNING')
 
-    def check_for_cancel(self) -> bool:
+    def check_for_cancel(self, row:dict=None) -> bool:
         """gets the remote table row associated with me and returns whether or not a cancel was requested
         
+        Args:
+            row (dict, optional): an already fetched row of this object. Defaults to None to fetch it.
+
         Returns:
             bool: true if cancel was requested, false if not
         """
-        me = self.get()
-        assert me['status'] in allowed_status_codes, 'ERROR! The remote status ' + me['status'] + ' is unrecognized'
-        return allowed_status_codes[me['status']] >= 100 or me['status'] == 'CANCELLING'
+        me = row if row is not None else self.get()
+        return _is_cancel_requested(me)
 
     
-    def get_remaining_time(self, t_is: datetime.datetime = None) -> float:
+    def get_remaining_time(self, t_is: datetime.datetime = None, row:dict=None) -> float:
         """gets my remote object and checks how much time it 
         is allowed to be running by returning
             (start_condition + duration_expected) < utcnow
 
+        Args:
+            t_is (datetime.datetime, optional): the time to calculate the remaining time for. Defaults to None for utcnow.
+            row (dict, optional): an already fetched row of this object. Defaults to None to fetch it.
+
         Returns:
             float: the remaining time in hours for this script to run
         """
-        me = self.get()
-        tstart = parse_zulutime(me['start_condition'])
-        assert tstart is not None, '"start_condition" could not be parsed. Got: {} {}'.format(type(me['start_condition']), me['start_condition'])
-        if t_is is None:
-            t_is = get_utcnow()
+        me = row if row is not None else self.get()
+        return _get_remaining_hours(me, t_is)
 
-        t_end_req = tstart + datetime.timedelta(hours=float(me['duration_expected_hr_dec']))
-        t_rem = (t_end_req - t_is).total_seconds() / 60.0 / 60.0
-        return max(0, t_rem)
+    def tick_state(self, row:dict=None, t_is: datetime.datetime = None) -> TickState:
+        """make a TickState snapshot with the remaining time, cancel flag, status and 
+        start time from a single row of this object.
 
+        Args:
+            row (dict, optional): an already fetched row of this object. Defaults to None to fetch it.
+            t_is (datetime.datetime, optional): the time to calculate the remaining time for. Defaults to None for utcnow.
+
+        Returns:
+            TickState: the snapshot
+        """
+        return _make_tick_state(row if row is not None else self.get(), t_is)
+
+    def poll(self, t_is: datetime.datetime = None) -> TickState:
+        """fetches my remote object once and returns everything the control loop 
+        needs to decide on the next tick. Use this instead of calling 
+        get_remaining_time() and check_for_cancel() back to back.
+
+        Example::
+
+            state = obj.poll()
+            if state.cancel_requested:
+                ...
+            elif state.remaining_hours <= ticklen_hr:
+                ...
+
+        Args:
+            t_is (datetime.datetime, optional): the time to calculate the remaining time for. Defaults to None for utcnow.
+
+        Returns:
+            TickState: the snapshot
+        """
+        return self.tick_state(self.get(), t_is)
+
+    def watch(self, timeout:float=None, poll_interval=default_poll_interval, stop:threading.Event=None):
+        """generator which yields my row first as it is and then each time it changed.
+
+        Uses long-polling on `<table>/<id>/watch` (the server answers as soon as the
+        row's ETag differs from the If-None-Match header or with 304 after ?timeout
+        seconds). If the server does not support it, falls back to conditional GETs
+        with an adaptive interval which starts at poll_interval[0] after each change
+        and doubles while nothing changes up to poll_interval[1]. For local backends
+        the row is read again on each change made through the backend and at least
+        every poll_interval[1] seconds.
+
+        Args:
+            timeout (float, optional): seconds after which to stop. Defaults to None for never.
+            poll_interval (tuple, optional): (min, max) seconds between polls for servers without long-poll support. Defaults to default_poll_interval.
+            stop (threading.Event, optional): an event to stop watching. Defaults to None.
+
+        Yields:
+            dict: the database entry row associated with this objects id
+        """
+        if not isinstance(self.backend, HttpBackend):
+            yield from self.__watch_backend(timeout, poll_interval, stop)
+            return
+
+        t_end = time.monotonic() + timeout if timeout is not None else None
+        url = f'{self.uri}/{self.tablename}/{self.id}'
+        etag, last, delay = None, None, poll_interval[0]
+
+        while stop is None or not stop.is_set():
+            remaining = t_end - time.monotonic() if t_end is not None else None
+            if remaining is not None and remaining <= 0:
+                return
+            headers = {'If-None-Match': etag} if etag else {}
+
+            if last is not None and self._watch_supported is not False:
+                wait = min(default_watch_timeout, remaining) if remaining is not None else default_watch_timeout
+                r = self.transport.get(url + '/watch', params={'timeout': wait}, headers=headers, 
+                                       timeout=(default_timeout[0], wait + default_timeout[1]))
+                if r.status_code in (404, 405, 501):
+                    _log.info('%s does not support long-polling, falling back to polling', self.uri)
+                    self._watch_supported = False
+                    continue
+                self._watch_supported = True
+            else:
+                if last is not None:
+                    t_wait = min(delay, remaining) if remaining is not None else delay
+                    if stop is not None:
+                        stop.wait(t_wait)
+                    else:
+                        time.sleep(t_wait)
+                    delay = min(2 * delay, poll_interval[1])
+                r = self.transport.get(url, headers=headers)
+
+            if r.status_code == 304:
+                continue
+            assert r.status_code == 200, r.text
+            row = r.json()
+            if row == last:
+                continue
+
+            etag = r.headers.get('ETag')
+            if self.cache is not None:
+                self.cache.store(self.tablename, self.id, row, etag)
+            last, delay = row, poll_interval[0]
+            yield row
+
+    def __watch_backend(self, timeout, poll_interval, stop):
+        # backends without long-polling notify about their own changes, so wait for those
+        # (or at most poll_interval[1] for changes made by other processes) between gets
+        t_end = time.monotonic() + timeout if timeout is not None else None
+        last = None
+        while stop is None or not stop.is_set():
+            n_changes = self.backend.n_changes
+            row = self.get()
+            if row != last:
+                last = row
+                yield row
+
+            remaining = t_end - time.monotonic() if t_end is not None else None
+            if remaining is not None and remaining <= 0:
+                return
+            self.backend.wait_for_change(n_changes, min(poll_interval[1], remaining) if remaining is not None else poll_interval[1])
+
+    def wait_for(self, status_set, timeout:float=None, poll_interval=default_poll_interval) -> dict:
+        """block until the status of my row is one of status_set. See watch()
+
+        Example::
+
+            row = obj.wait_for({'CANCELLING', 'FINISHING'}, timeout=60)
+
+        Args:
+            status_set (str or set): the status (or statuses) to wait for
+            timeout (float, optional): max seconds to wait. Defaults to None for no limit.
+            poll_interval (tuple, optional): (min, max) seconds between polls for servers without long-poll support. Defaults to default_poll_interval.
+
+        Raises:
+            TimeoutError: if none of the statuses was reached within timeout
+
+        Returns:
+            dict: the database entry row associated with this objects id
+        """
+        status_set = {status_set} if isinstance(status_set, str) else set(status_set)
+        for row in self.watch(timeout, poll_interval):
+            if row['status'] in status_set:
+                return row
+        raise TimeoutError('{}/{} did not reach any status of {} within {}s'.format(self.tablename, self.id, sorted(status_set), timeout))
+
+    def on_status_change(self, callback, poll_interval=default_poll_interval) -> StatusWatch:
+        """call callback(status, row) from a background thread once with my current
+        status and then every time it changes. See watch()
+
+        Example::
+
+            cancelled = threading.Event()
+            watch = obj.on_status_change(lambda status, row: status == 'CANCELLING' and cancelled.set())
+            ...
+            watch.stop()
+
+        Args:
+            callback (callable): called as callback(status, row)
+            poll_interval (tuple, optional): (min, max) seconds between polls for servers without long-poll support. Defaults to default_poll_interval.
+
+        Returns:
+            StatusWatch: the started thread. Call its stop() method to stop watching
+        """
+        watch = StatusWatch(self, callback, poll_interval)
+        watch.start()
+        return watch
 
-        
 
 
 
@@ -190,41 +486,94 @@ class Experiment(BaseRimObj):
         RimObj: _description_
     """
     __tablename = 'experiments'
-    def __init__(self, id, uri = None):
+    def __init__(self, id, uri = None, transport:Transport=None, cache:RowCache=None, upload_queue:UploadQueue=None, backend:StorageBackend=None):
         """create a new Experiment object with an id to get access 
         to this expiriment objects row in the database
 
         Args:
             id (int): the id of the analyses in the DB
-            uri (string, optional): the URI to connect to. 
+            uri (string, optional): the URI to connect to (http://, https://, 
+                file://, sqlite:// or mem://, see backends.open_backend). 
                 If not given will be tried to be resolved 
                 from environmental valiables.
                     Defaults to None.
+            transport (Transport, optional): the pooled transport to send all 
+                requests through. Defaults to None for the shared default transport.
+            cache (RowCache, optional): a row cache to serve repeated gets from within 
+                their time to live. Defaults to None for no caching.
+            upload_queue (UploadQueue, optional): the queue to run non blocking uploads on. 
+                Defaults to None to create one on the first non blocking upload.
+            backend (StorageBackend, optional): the backend to use instead of opening 
+                one for the uri. Defaults to None.
         """
+        if uri is None and backend is not None:
+            uri = backend.uri
         if uri is None:
             uri = os.environ.get('DBSERVER_URI')
         assert uri, 'need to give a valid URI for a DB connection!'
 
-        super().__init__(uri, self.__tablename, id)
+        super().__init__(uri, self.__tablename, id, transport=transport, cache=cache, backend=backend)
+        self.upload_queue = upload_queue
+
+    def __submit_upload(self, fun, files, retry, *args, **kwargs):
+        if self.upload_queue is None:
+            self.upload_queue = UploadQueue()
+
+        # rewind file objects before each attempt, so failed uploads can be retried
+        offsets = {k: f.tell() for k, f in files.items() if hasattr(f, 'read')}
+        def _upload():
+            for k, pos in offsets.items():
+                files[k].seek(pos)
+            return fun(*args, **kwargs)
+
+        return self.upload_queue.submit(_upload, retry=retry)
+
+    def flush(self, timeout:float=None):
+        """wait for all non blocking uploads of this experiment to finish and 
+        raise the error of the first failed one (if any)"""
+        if self.upload_queue is not None:
+            self.upload_queue.flush(timeout=timeout)
+
+    def close(self, raise_on_error=False):
+        """wait for all non blocking uploads and stop the upload workers. Failed uploads 
+        which were not reported by flush() yet are logged (or raised with raise_on_error)"""
+        if self.upload_queue is not None:
+            self.upload_queue.close(raise_on_error=raise_on_error)
+
+    def set_status_finishing(self) -> dict:
+        """wait for all pending non blocking uploads, then set FINISHING as new 
+        status to my object in the DB and return the updated remote object as dictionary.
+
+        Returns:
+            dict: the database entry row associated with this objects id as dictionary
+        """
+        if self.upload_queue is not None:
+            errors = self.upload_queue.flush(raise_on_error=False)
+            if errors:
+                _log.error('%d uploads failed before finishing. First error: %s', len(errors), errors[0])
+        return super().set_status_finishing()
 
     def ping_test(self):
         """will ping the DB server and fallback to local if necessary
         """
         try:
-            r = requests.get(f'{self.uri}/ping', timeout=2)
-            return r.status_code <= 200
+            return self.backend.ping()
         except Exception as err:
-            _log.error('Error while pinging: ' + str(err))
+            _log.error('Error while pinging: %s', err)
             return False
 
         
-    def get_expected_devices(self):
-        """returns a list of strings with the devices which are expected with this measurement"""
-        dc = self.get()
+    def get_expected_devices(self, row:dict=None):
+        """returns a list of strings with the devices which are expected with this measurement
+
+        Args:
+            row (dict, optional): an already fetched row of this object. Defaults to None to fetch it.
+        """
+        dc = row if row is not None else self.get()
         return json.loads(dc['devices_json'])
 
 
-    def upload_new_datafile(self, data_file, aux_files = {}, start_time=None, tag=None):
+    def upload_new_datafile(self, data_file, aux_files = {}, start_time=None, tag=None, progress_callback=None, chunk_size=default_chunk_size, resumable=False, journal_dir=None, block=True):
         """upload a set of files for a measurement consisting of a main measurement file and a dictionary
         of auxiliary data files connected with the main file. 
         Example::
@@ -247,32 +596,34 @@ class Experiment(BaseRimObj):
             aux_files (dict, optional): a dictionary with key:path_to_file pairs for auxiliary files to upload. Defaults to {}.
             start_time (str or datetimedatetime, optional): None for now, else give an iso string with UTC! time to register this files with. Defaults to None.
             tag (str, optional): any tag you want to associate with these files (will end up in filename so, choose wisely). Defaults to None.
+            progress_callback (callable, optional): called as progress_callback(key, bytes_sent, bytes_total) while uploading each file. Defaults to None.
+            chunk_size (int, optional): number of bytes to read from the files at once while streaming them to the server. Defaults to default_chunk_size.
+            resumable (bool, optional): set True to upload the files as content addressed chunks, so calling this again 
+                after a failed upload only sends what the server did not acknowledge yet and files the server already 
+                has are skipped (needs server support). Defaults to False.
+            journal_dir (str, optional): where to keep the journals of unfinished resumable uploads. Defaults to None for upload.default_journal_dir.
+            block (bool, optional): set False to return a future immediately and upload in the background 
+                on self.upload_queue. Failed uploads are only retried with resumable=True, as a retried plain 
+                upload could register the measurement twice. The files must not be changed until the future is done. Defaults to True.
 
         Returns:
             path (str): path, where the file was saved on the server
             id (int): id this file has been given
             aux_files (list): auxiliary files as list of tuples with (key, id, path)
-        """
-        if isinstance(start_time, datetime.datetime):
-            start_time = make_zulustr(start_time)
-        if not start_time:
-            start_time = make_zulustr(get_utcnow())
-
 
-        fpd = data_file if not hasattr(data_file, 'read') else open(data_file, 'rb')
-        files = {'ACU': fpd}
-        for k, v in aux_files.items():
-            files[k] = v if hasattr(v, 'read') else open(v, 'rb')
-
-        payload = {
-            'id': self.id, 
-            'row':{
-                'time_iso': start_time,
-                'tags': tag
-                }
-            }
-
-        dc = self.post('upload_measurement_data', json=payload, files=files)
+            or for block=False a concurrent.futures.Future resolving to the above
+        """
+        files = {'ACU': data_file, **aux_files}
+        if not block:
+            # the measurement is registered with the time of this call, not of the upload.
+            # Only resumable uploads are retried: if the response to a plain upload got lost
+            # after the server registered it, a retry would register the measurement twice
+            return self.__submit_upload(self.upload_new_datafile, files, resumable, data_file, aux_files, _get_start_time_str(start_time), tag, 
+                                        progress_callback, chunk_size, resumable, journal_dir, block=True)
+
+        payload = _make_measurement_payload(self.id, start_time, tag)
+        dc = self.backend.upload('measurement_data', payload, files, progress_callback=progress_callback, 
+                                 chunk_size=chunk_size, resumable=resumable, journal_dir=journal_dir)
         return dc['path'], dc['id'], dc['aux_files'] 
 
     def get_path_for_new_datafile(self, devices_to_add = {'ACU': '.csv'}, start_time=None, tag=None):
@@ -313,34 +664,36 @@ class Experiment(BaseRimObj):
             aux_files (list): auxiliary files as list of tuples with (key, id, path)
         """
 
-        if isinstance(start_time, datetime.datetime):
-            start_time = make_zulustr(start_time)
-        if not start_time:
-            start_time = make_zulustr(get_utcnow())
+        payload = _make_measurement_payload(self.id, start_time, tag, _get_extensions(devices_to_add))
 
-        if isinstance(devices_to_add, str):
-            extensions = {devices_to_add: '.csv'}
-        elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and isinstance(devices_to_add[0], str):
-            extensions = {{k: '.csv'} for k in devices_to_add}
-        elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and len(devices_to_add[0]) == 2:
-            extensions = dict(devices_to_add)
-        else:
-            extensions = {k:v for k, v in devices_to_add.items()}
+        dc = self.backend.register_measurement(payload)
+        return dc['path'], dc['id'], dc['aux_files'] 
 
-        if 'ACU' not in extensions:
-            extensions['ACU'] ='.csv'
+    def get_pathes_for_new_datafiles(self, measurements:list, max_workers:int=None) -> list:
+        """register many measurements at once and return the save pathes for each. This is the 
+        same as calling get_path_for_new_datafile for each measurement, but needs only one 
+        request if the server supports batch registration. Otherwise the measurements are 
+        registered with concurrent requests over the pooled transport.
 
-        payload = {
-            'id': self.id, 
-            'extensions': extensions, 
-            'row':{
-                'time_iso': start_time,
-                'tags': tag
-                }
-            }
+        Example::
 
-        dc = self.post('register_measurement_data', json=payload)
-        return dc['path'], dc['id'], dc['aux_files'] 
+            t = get_utcnow()
+            measurements = [(t + datetime.timedelta(seconds=i), {'RFC': '.csv'}, None) for i in range(100)]
+            for main_path, main_id, aux_pathes in obj.get_pathes_for_new_datafiles(measurements):
+                ...
+
+        Args:
+            measurements (list): list of (start_time, devices_to_add, tag) tuples with the same meaning as 
+                the arguments to get_path_for_new_datafile
+            max_workers (int, optional): max number of concurrent requests if the server does not support 
+                batch registration. Defaults to None for the transports pool_maxsize.
+
+        Returns:
+            list: (path, id, aux_files) tuples in the order of the given measurements
+        """
+        payloads = [_make_measurement_payload(self.id, start_time, tag, _get_extensions(devices_to_add)) 
+                        for start_time, devices_to_add, tag in measurements]
+        return [(dc['path'], dc['id'], dc['aux_files']) for dc in self.backend.register_measurements(payloads, max_workers=max_workers)]
 
 
     def get_pathes_for_new_global_auxfiles(self, devices_to_add = {}):
@@ -370,25 +723,16 @@ class Experiment(BaseRimObj):
             aux_files (list): auxiliary files as list of tuples with (key, id, path)
         """
 
-        if isinstance(devices_to_add, str):
-            extensions = {devices_to_add: '.csv'}
-        elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and isinstance(devices_to_add[0], str):
-            extensions = {{k: '.csv'} for k in devices_to_add}
-        elif isinstance(devices_to_add, list) and len(devices_to_add) > 0 and len(devices_to_add[0]) == 2:
-            extensions = dict(devices_to_add)
-        else:
-            extensions = devices_to_add
-
         payload = {
             'id': self.id, 
-            'extensions': extensions
+            'extensions': _get_extensions(devices_to_add, add_main=False)
             }
 
-        dc = self.post('register_exp_aux_files', json=payload)
+        dc = self.backend.register_aux(payload)
         return dc['aux_files'] 
 
 
-    def upload_new_global_auxfiles(self, devices_to_add = {}):
+    def upload_new_global_auxfiles(self, devices_to_add = {}, progress_callback=None, chunk_size=default_chunk_size, block=True):
         """upload a set of experiment level auxiliary files and return the pathes 
         where they were saved on the server.
 
@@ -407,19 +751,25 @@ class Experiment(BaseRimObj):
                 (key_mws, id_mws, savepath_mws) = aux_pathes[1]
 
         Args:
-            devices_to_add (dict, optional): a dictionary with key:extension pairs for auxiliary files you would like to add. Defaults to {}.
+            devices_to_add (dict, optional): a dictionary with key:path_to_file pairs for auxiliary files to upload. Defaults to {}.
+            progress_callback (callable, optional): called as progress_callback(key, bytes_sent, bytes_total) while uploading each file. Defaults to None.
+            chunk_size (int, optional): number of bytes to read from the files at once while streaming them to the server. Defaults to default_chunk_size.
+            block (bool, optional): set False to return a future immediately and upload in the background 
+                on self.upload_queue (without retries, as a retry could register the files twice). Defaults to True.
 
         Returns:
             aux_files (list): auxiliary files as list of tuples with (key, id, path)
+
+            or for block=False a concurrent.futures.Future resolving to the above
         """
+        if not block:
+            return self.__submit_upload(self.upload_new_global_auxfiles, devices_to_add, False, devices_to_add, progress_callback, chunk_size, block=True)
 
-        files = [v if hasattr(v, 'read') else open(v, 'rb') for k, v in devices_to_add.items()]
-        
         payload = {
-            'id': self.exp.id, 
+            'id': self.id, 
             }
 
-        dc = self.post('upload_exp_aux_files', json=payload, files=files)
+        dc = self.backend.upload('exp_aux_files', payload, devices_to_add, progress_callback=progress_callback, chunk_size=chunk_size)
         return dc['aux_files'] 
 
 
@@ -427,19 +777,27 @@ class Analysis(BaseRimObj):
     """An interface object to get access to analyses in the 
     database."""
     __tablename = 'analyses'
-    def __init__(self, id, uri = None):
+    def __init__(self, id, uri = None, transport:Transport=None, cache:RowCache=None, backend:StorageBackend=None):
         """create a new Analysis object with an id to get access 
         to this analyses objects row in the database
 
         Args:
             id (int): the id of the analyses in the DB
-            uri (string, optional): the URI to connect to. 
+            uri (string, optional): the URI to connect to (see Experiment). 
                 If not given will be tried to be resolved 
                 from environmental valiables.
                     Defaults to None.
+            transport (Transport, optional): the pooled transport to send all 
+                requests through. Defaults to None for the shared default transport.
+            cache (RowCache, optional): a row cache to serve repeated gets from within 
+                their time to live. Defaults to None for no caching.
+            backend (StorageBackend, optional): the backend to use instead of opening 
+                one for the uri. Defaults to None.
         """
+        if uri is None and backend is not None:
+            uri = backend.uri
         if uri is None:
             uri = os.environ.get('DBSERVER_URI')
         assert uri, 'need to give a valid URI for a DB connection!'
-        super().__init__(uri, self.__tablename, id)
+        super().__init__(uri, self.__tablename, id, transport=transport, cache=cache, backend=backend)
 
@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+"""
+per antenna interval index over the expected schedule of scripts for fast
+client side conflict checks and free slot searches
+"""
+
+import datetime
+import itertools
+import random
+
+import logging
+
+import pytz
+
+from mke_client.helpers import get_utcnow, parse_zulutime
+
+_log = logging.getLogger(__name__)
+
+
+def _to_ts(t) -> float:
+    # None, NaN and NaT (all != themselves) count as not given
+    if t is None or t != t:
+        return None
+    if isinstance(t, str):
+        t = parse_zulutime(t)
+        if t is None:
+            return None
+    if isinstance(t, datetime.datetime):
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=pytz.utc)
+        return t.timestamp()
+    return float(t)
+
+
+def _to_datetime(ts:float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(ts, tz=pytz.utc)
+
+
+def get_interval(row) -> tuple:
+    """get the expected (start, end) of a script row as POSIX timestamps with the same
+    rules as remexlib.get_expected_schedule. Returns None if it has no valid start time.
+
+    Args:
+        row (dict or ScriptMinimal): the script
+    """
+    if hasattr(row, 'to_dict'):
+        row = row.to_dict()
+
+    tstart = _to_ts(row.get('time_started_iso'))
+    if tstart is None:
+        tstart = _to_ts(row.get('start_condition'))
+    if tstart is None:
+        return None
+
+    tend = _to_ts(row.get('time_finished_iso'))
+    if tend is None:
+        duration = row.get('duration_expected_hr_dec')
+        duration = float(duration) if duration is not None and duration == duration else 1.0 / 60.0
+        tend = tstart + duration * 3600.0
+    return tstart, tend
+
+
+class _Node():
+    __slots__ = ('key', 'start', 'end', 'id', 'prio', 'left', 'right', 'max_end')
+
+    def __init__(self, key, start, end, id, prio):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.id = id
+        self.prio = prio
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _update(n):
+    m = n.end
+    if n.left is not None and n.left.max_end > m:
+        m = n.left.max_end
+    if n.right is not None and n.right.max_end > m:
+        m = n.right.max_end
+    n.max_end = m
+
+
+def _split(n, key):
+    # -> (nodes with keys < key, nodes with keys >= key)
+    if n is None:
+        return None, None
+    if n.key < key:
+        l, r = _split(n.right, key)
+        n.right = l
+        _update(n)
+        return n, r
+    else:
+        l, r = _split(n.left, key)
+        n.left = r
+        _update(n)
+        return l, n
+
+
+def _merge(a, b):
+    # all keys in a must be smaller than all keys in b
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    else:
+        b.left = _merge(a, b.left)
+        _update(b)
+        return b
+
+
+def _delete(n, key):
+    if n.key == key:
+        return _merge(n.left, n.right)
+    if key < n.key:
+        n.left = _delete(n.left, key)
+    else:
+        n.right = _delete(n.right, key)
+    _update(n)
+    return n
+
+
+def _query(n, start, end, out):
+    # all intervals with n.start < end and n.end > start
+    if n is None or n.max_end <= start:
+        return
+    _query(n.left, start, end, out)
+    if n.start < end:
+        if n.end > start:
+            out.append(n.id)
+        _query(n.right, start, end, out)
+
+
+def _max_end_before(n, t):
+    # the latest end of all intervals starting before t
+    m = float('-inf')
+    while n is not None:
+        if n.start < t:
+            m = max(m, n.end, n.left.max_end if n.left is not None else m)
+            n = n.right
+        else:
+            n = n.left
+    return m
+
+
+class ScheduleIndex():
+    """Index over the expected schedule of scripts (experiments or analyses) which
+    keeps one interval tree (a treap ordered by start time, augmented with the max
+    end time of each subtree) per antenna. Adding, removing or updating a script as
+    well as overlap queries take O(log n) (plus the number of results), so it can
+    be kept up to date incrementally and used for many what-if placements.
+
+    Intervals are half open [start, end) as in remexlib.find_overlaps, so a script
+    may start exactly when the one before it ends. Start and end times are derived
+    from the rows as in remexlib.get_expected_schedule. Rows without valid start time are ignored.
+
+    Example::
+
+        schedule = ScheduleIndex(rows)
+        script = ScriptMinimal('my_script.py', 'test_antenna', start_condition='2023-01-01T12:00:00Z', duration_expected_hr_dec=2)
+        if schedule.conflicts(script):
+            start = schedule.next_free_slot('test_antenna', 2, after='2023-01-01T12:00:00Z')
+
+    Args:
+        rows (iterable, optional): script rows as dicts, ScriptMinimal objects or a DataFrame. Defaults to None.
+        seed (int, optional): seed for the random priorities of the tree nodes. Defaults to None.
+    """
+    def __init__(self, rows=None, seed:int=None):
+        self._roots = {}
+        self._items = {}
+        self._seq = itertools.count()
+        self._random = random.Random(seed)
+        if rows is not None:
+            if hasattr(rows, 'to_dict') and hasattr(rows, 'columns'):
+                rows = rows.to_dict('records')
+            for row in rows:
+                self.add(row)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, id):
+        return id in self._items
+
+    @property
+    def antennas(self) -> list:
+        """all antenna ids with at least one script"""
+        return [k for k, v in self._roots.items() if v is not None]
+
+    def add(self, row, id=None):
+        """add a script or replace the one with the same id
+
+        Args:
+            row (dict or ScriptMinimal): the script to add
+            id (optional): the id to store it under. Defaults to None for row['id'] (or a new one if it has none).
+
+        Returns:
+            the id the script was added under or None if it has no valid start time
+        """
+        if hasattr(row, 'to_dict'):
+            row = row.to_dict()
+        if id is None:
+            id = row.get('id')
+        if id is None:
+            id = ('new', next(self._seq))
+        if id in self._items:
+            self.remove(id)
+
+        interval = get_interval(row)
+        if interval is None:
+            _log.debug('ignoring script %s without valid start time', id)
+            return None
+
+        antenna_id = row.get('antenna_id')
+        start, end = interval
+        node = _Node((start, next(self._seq)), start, end, id, self._random.random())
+        l, r = _split(self._roots.get(antenna_id), node.key)
+        self._roots[antenna_id] = _merge(_merge(l, node), r)
+        self._items[id] = (antenna_id, node.key, start, end)
+        return id
+
+    def update(self, row, id=None):
+        """update a script after its row changed (same as add)"""
+        return self.add(row, id)
+
+    def remove(self, id):
+        """remove the script with the given id. Raises KeyError if it is not in the index"""
+        antenna_id, key, start, end = self._items.pop(id)
+        self._roots[antenna_id] = _delete(self._roots[antenna_id], key)
+
+    def get(self, id) -> tuple:
+        """get (antenna_id, start, end) of a script with start and end as utc datetimes"""
+        antenna_id, key, start, end = self._items[id]
+        return antenna_id, _to_datetime(start), _to_datetime(end)
+
+    def overlaps(self, antenna_id, start, end) -> list:
+        """get the ids of all scripts on an antenna overlapping [start, end)
+
+        Args:
+            antenna_id (str): the antenna
+            start (datetime.datetime, str or float): start time (datetime, zulu string or POSIX timestamp)
+            end (datetime.datetime, str or float): end time (datetime, zulu string or POSIX timestamp)
+
+        Returns:
+            list: the ids of the overlapping scripts ordered by their start time
+        """
+        out = []
+        _query(self._roots.get(antenna_id), _to_ts(start), _to_ts(end), out)
+        return out
+
+    def conflicts(self, row) -> list:
+        """get the ids of all scripts overlapping a script which is not (necessarily) in the index
+        (its own id is excluded). Returns an empty list for a script without valid start time."""
+        if hasattr(row, 'to_dict'):
+            row = row.to_dict()
+        interval = get_interval(row)
+        if interval is None:
+            return []
+        own_id = row.get('id')
+        return [id for id in self.overlaps(row.get('antenna_id'), *interval) if own_id is None or id != own_id]
+
+    def next_free_slot(self, antenna_id, duration_hr:float, after=None) -> datetime.datetime:
+        """find the earliest start time at or after `after` at which a script of the given
+        duration fits on an antenna without overlapping any other.
+
+        Each step is O(log n). It needs one more step for each gap shorter than the
+        duration which has to be skipped.
+
+        Args:
+            antenna_id (str): the antenna
+            duration_hr (float): the duration in hours
+            after (datetime.datetime, str or float, optional): earliest possible start. Defaults to None for now.
+
+        Returns:
+            datetime.datetime: the start time (utc)
+        """
+        root = self._roots.get(antenna_id)
+        t = _to_ts(after) if after is not None else get_utcnow().timestamp()
+        d = duration_hr * 3600.0
+        while True:
+            # every script starting before t + d has to end before t
+            m = _max_end_before(root, t + d)
+            if m <= t:
+                return _to_datetime(t)
+            t = m
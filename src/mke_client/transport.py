@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+"""
+pooled keep-alive HTTP transport which can be shared between all
+rimlib and remexlib objects talking to the same dbserver
+"""
+
+import collections
+import functools
+import threading
+import time
+
+import logging
+
+_log = logging.getLogger(__name__)
+
+
+default_timeout = (3.05, 60)
+"""(connect, read) timeout in seconds used for all requests which do not give their own timeout"""
+
+default_blocksize = 256 * 1024
+"""number of bytes read at once from streamed request bodies (e.g. file uploads) before sending them"""
+
+
+@functools.lru_cache(maxsize=None)
+def _get_adapter_class():
+    # requests is only imported once the first Transport is made, so importing
+    # the client libraries (e.g. just to use LocalExperiment) stays cheap
+    from requests.adapters import HTTPAdapter
+
+    class _CountingAdapter(HTTPAdapter):
+        """HTTPAdapter which remembers how many connections were opened by
+        connection pools which have already been evicted from its pool manager"""
+
+        def __init__(self, *args, blocksize=default_blocksize, **kwargs):
+            self.n_connections_evicted = 0
+            self.blocksize = blocksize
+            super().__init__(*args, **kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs.setdefault('blocksize', self.blocksize)
+            super().init_poolmanager(*args, **kwargs)
+            pools = self.poolmanager.pools
+            dispose = pools.dispose_func
+
+            def _dispose(pool):
+                self.n_connections_evicted += pool.num_connections
+                if dispose is not None:
+                    dispose(pool)
+
+            pools.dispose_func = _dispose
+
+        def get_n_connections(self):
+            pools = self.poolmanager.pools
+            n = 0
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    n += pool.num_connections
+            return n + self.n_connections_evicted
+
+    return _CountingAdapter
+
+
+class Transport():
+    """A pooled HTTP transport with keep-alive connections to use for all requests
+    to a dbserver. A single instance is safe to share between threads and between
+    any number of Experiment, Analysis and RemexApiAccessor objects.
+
+    Example::
+
+        transport = Transport(pool_maxsize=20)
+        exp = Experiment(1, 'http://localhost:8080', transport=transport)
+        ana = Analysis(1, 'http://localhost:8080', transport=transport)
+        ...
+        print(transport.stats())
+
+    Args:
+        pool_connections (int, optional): number of hosts to keep connection pools for. Defaults to 10.
+        pool_maxsize (int, optional): max number of connections kept alive per host. Defaults to 10.
+        timeout (float or tuple, optional): default (connect, read) timeout in seconds for requests which do not give their own. Defaults to default_timeout.
+        max_retries (int, optional): number of retries on failed connects. Defaults to 0.
+        pool_block (bool, optional): set True to block instead of opening extra connections once pool_maxsize is reached. Defaults to False.
+        n_latency_samples (int, optional): number of most recent request latencies to keep for the statistics. Defaults to 1000.
+        blocksize (int, optional): number of bytes read at once from streamed request bodies. Defaults to default_blocksize.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, timeout=default_timeout, max_retries=0, pool_block=False, n_latency_samples=1000, blocksize=default_blocksize):
+        import requests
+
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+
+        self.session = requests.Session()
+        self._adapters = []
+        for prefix in ('http://', 'https://'):
+            adapter = _get_adapter_class()(pool_connections=pool_connections,
+                                           pool_maxsize=pool_maxsize,
+                                           max_retries=max_retries,
+                                           pool_block=pool_block,
+                                           blocksize=blocksize)
+            self.session.mount(prefix, adapter)
+            self._adapters.append(adapter)
+
+        self._lock = threading.Lock()
+        self._n_latency_samples = n_latency_samples
+        self.reset_stats()
+
+    def request(self, method, url, **kwargs) -> 'requests.Response':
+        """send a request through the pooled session. Takes the same
+        keyword arguments as requests.request"""
+        kwargs.setdefault('timeout', self.timeout)
+        t0 = time.perf_counter()
+        try:
+            r = self.session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                self._n_failed += 1
+            raise
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self._n_requests += 1
+            self._latency_total += dt
+            self._latency_max = max(self._latency_max, dt)
+            self._latencies.append(dt)
+        return r
+
+    def get(self, url, **kwargs) -> 'requests.Response':
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs) -> 'requests.Response':
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs) -> 'requests.Response':
+        return self.request('PATCH', url, **kwargs)
+
+    def put(self, url, **kwargs) -> 'requests.Response':
+        return self.request('PUT', url, **kwargs)
+
+    def head(self, url, **kwargs) -> 'requests.Response':
+        return self.request('HEAD', url, **kwargs)
+
+    def reset_stats(self):
+        """reset all request and latency counters"""
+        with self._lock:
+            self._n_requests = 0
+            self._n_failed = 0
+            self._latency_total = 0.0
+            self._latency_max = 0.0
+            self._latencies = collections.deque(maxlen=self._n_latency_samples)
+            self._n_connections_offset = sum(a.get_n_connections() for a in self._adapters)
+
+    def stats(self) -> dict:
+        """get the connection and latency statistics for this transport since
+        its creation or the last call to reset_stats()
+
+        Returns:
+            dict: with the keys
+                requests, failed, connections_opened, connections_reused,
+                latency_mean_s, latency_p50_s, latency_p95_s, latency_max_s
+        """
+        with self._lock:
+            n = self._n_requests
+            lat = sorted(self._latencies)
+            total = self._latency_total
+            lat_max = self._latency_max
+            n_failed = self._n_failed
+            offset = self._n_connections_offset
+
+        n_opened = sum(a.get_n_connections() for a in self._adapters) - offset
+        pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] if lat else None
+
+        return {
+            'requests': n,
+            'failed': n_failed,
+            'connections_opened': n_opened,
+            'connections_reused': max(0, n - n_opened),
+            'latency_mean_s': total / n if n else None,
+            'latency_p50_s': pct(0.5),
+            'latency_p95_s': pct(0.95),
+            'latency_max_s': lat_max if n else None,
+        }
+
+    def close(self):
+        """close all pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+__default_transport = None
+__default_transport_lock = threading.Lock()
+
+def get_default_transport() -> Transport:
+    """get the process wide Transport which is used by all objects
+    not given a transport explicitly (created on first use)"""
+    global __default_transport
+    with __default_transport_lock:
+        if __default_transport is None:
+            __default_transport = Transport()
+        return __default_transport
@@ -0,0 +1,346 @@
+#!/usr/bin/python3
+"""
+streaming multipart/form-data encoding for uploading (large) measurement
+and auxiliary files with constant memory usage and resumable, content
+addressed uploads
+"""
+
+import hashlib
+import io
+import json
+import os
+import uuid
+
+import logging
+
+from mke_client.helpers import fsync_dir
+
+_log = logging.getLogger(__name__)
+
+
+default_chunk_size = 1024 * 1024
+"""number of bytes to read from a file at once while uploading"""
+
+
+def _get_size(fp) -> int:
+    pos = fp.tell()
+    fp.seek(0, io.SEEK_END)
+    size = fp.tell() - pos
+    fp.seek(pos)
+    return size
+
+
+class MultipartEncoder():
+    """A file like object which streams a multipart/form-data body for a set of form
+    fields and files. Each file is read in chunks of at most chunk_size bytes only once
+    the body is read, so the memory needed is constant regardless of the file sizes.
+    Pass it as data to requests together with its content_type::
+
+        with MultipartEncoder({'json': payload}, {'ACU': '/path/to/acu.csv'}) as enc:
+            r = requests.post(url, data=enc, headers={'Content-Type': enc.content_type})
+
+    Args:
+        fields (dict): name:value pairs for plain form fields. Values which are not str or bytes are json encoded.
+        files (dict): name:file pairs with the file either being a path or a seekable file like object opened in binary mode.
+        chunk_size (int, optional): max number of bytes to read from a file at once. Defaults to default_chunk_size.
+        progress_callback (callable, optional): called as progress_callback(name, bytes_read, bytes_total) after each chunk read from a file. Defaults to None.
+        boundary (str, optional): the multipart boundary to use. Defaults to None for a random one.
+    """
+    def __init__(self, fields:dict=None, files:dict=None, chunk_size:int=default_chunk_size, progress_callback=None, boundary:str=None):
+        self.boundary = boundary if boundary else uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self._opened = []
+        self._segments = []
+
+        for name, value in (fields if fields else {}).items():
+            if not isinstance(value, (str, bytes)):
+                value = json.dumps(value)
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            header = self._make_header(name)
+            self._segments.append(header + value + b'\r\n')
+
+        for name, f in (files if files else {}).items():
+            if hasattr(f, 'read'):
+                fp = f
+            else:
+                fp = open(f, 'rb')
+                self._opened.append(fp)
+            filename = os.path.basename(getattr(fp, 'name', name))
+            self._segments.append(self._make_header(name, filename))
+            self._segments.append((name, fp, _get_size(fp)))
+            self._segments.append(b'\r\n')
+
+        self._segments.append('--{}--\r\n'.format(self.boundary).encode())
+        self.len = sum(len(s) if isinstance(s, bytes) else s[2] for s in self._segments)
+
+        self._i_segment = 0
+        self._n_read_segment = 0
+
+    def _make_header(self, name, filename=None):
+        header = '--{}\r\nContent-Disposition: form-data; name="{}"'.format(self.boundary, name)
+        if filename is not None:
+            header += '; filename="{}"\r\nContent-Type: application/octet-stream'.format(filename)
+        return (header + '\r\n\r\n').encode('utf-8')
+
+    @property
+    def content_type(self) -> str:
+        """the Content-Type header value to send this body with"""
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def __len__(self):
+        return self.len
+
+    def read(self, size:int=-1) -> bytes:
+        """read up to size bytes of the encoded body (all remaining for size < 0)"""
+        if size is None or size < 0:
+            size = self.len
+        parts = []
+        while size > 0 and self._i_segment < len(self._segments):
+            segment = self._segments[self._i_segment]
+            if isinstance(segment, bytes):
+                chunk = segment[self._n_read_segment:self._n_read_segment + size]
+                n_total = len(segment)
+            else:
+                name, fp, n_total = segment
+                chunk = fp.read(min(size, self.chunk_size, n_total - self._n_read_segment))
+                if not chunk and self._n_read_segment < n_total:
+                    raise IOError('file for "{}" was truncated while uploading'.format(name))
+
+            self._n_read_segment += len(chunk)
+            size -= len(chunk)
+            parts.append(chunk)
+
+            if not isinstance(segment, bytes) and self.progress_callback is not None:
+                self.progress_callback(name, self._n_read_segment, n_total)
+
+            if self._n_read_segment >= n_total:
+                self._i_segment += 1
+                self._n_read_segment = 0
+
+        return b''.join(parts)
+
+    def close(self):
+        """close all files which were opened from a path by this encoder"""
+        for fp in self._opened:
+            fp.close()
+        self._opened = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+default_resumable_chunk_size = 4 * 1024 * 1024
+"""size of the content addressed chunks resumable uploads are split into"""
+
+default_journal_dir = os.path.join(os.path.expanduser('~'), '.mke_client', 'upload_journal')
+"""where the journals of unfinished resumable uploads are kept"""
+
+
+def _iter_chunks(fp, chunk_size):
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def make_manifest(files:dict, chunk_size:int=default_resumable_chunk_size) -> dict:
+    """hash a set of files (key:path or key:file object pairs) file by file and
+    chunk by chunk and return the manifest to upload them by content
+
+    Returns:
+        dict: key: {'filename', 'size', 'sha256', 'chunks': [sha256 of each chunk]}
+    """
+    manifest = {}
+    for key, f in files.items():
+        fp = f if hasattr(f, 'read') else open(f, 'rb')
+        pos = fp.tell()
+        try:
+            h_file = hashlib.sha256()
+            chunks, size = [], 0
+            for chunk in _iter_chunks(fp, chunk_size):
+                h_file.update(chunk)
+                chunks.append(hashlib.sha256(chunk).hexdigest())
+                size += len(chunk)
+        finally:
+            if fp is not f:
+                fp.close()
+            else:
+                fp.seek(pos)
+
+        manifest[key] = {
+            'filename': os.path.basename(getattr(fp, 'name', key)),
+            'size': size,
+            'sha256': h_file.hexdigest(),
+            'chunks': chunks,
+        }
+    return manifest
+
+
+class UploadJournal():
+    """local record of a resumable upload holding its manifest and the hashes of
+    all chunks the server has acknowledged.
+
+    The first line of the file holds the manifest as json, each acknowledged
+    chunk appends one line with its hash, so recording an ack does not rewrite
+    the whole journal. Both are fsynced, so an ack is not lost on a crash."""
+    def __init__(self, path:str):
+        self.path = path
+        self.manifest = None
+        self.acked = set()
+        self._fp = None
+        if os.path.exists(path):
+            with open(path, 'rb') as fp:
+                data = fp.read()
+            header, _, acks = data.partition(b'\n')
+            dc = json.loads(header)
+            self.manifest = dc['manifest']
+            self.acked = set(dc['acked'])
+            # a line without newline was cut off while being written
+            self.acked.update(line.decode() for line in acks[:acks.rfind(b'\n') + 1].split())
+
+    def save(self):
+        """write the manifest and all acks so far as a single json line"""
+        self.close()
+        dirname = os.path.dirname(self.path)
+        os.makedirs(dirname, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'manifest': self.manifest, 'acked': sorted(self.acked)}, fp)
+            fp.write('\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, self.path)
+        fsync_dir(dirname)
+
+    def ack(self, sha256:str):
+        """record an acknowledged chunk"""
+        self.acked.add(sha256)
+        if self._fp is None:
+            self._fp = open(self.path, 'ab')
+        self._fp.write(sha256.encode() + b'\n')
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResumableUploader():
+    """Uploads files split into content addressed (sha256) chunks. The chunks the
+    server acknowledged are recorded in a local journal, so retrying an upload which
+    died halfway only sends the remaining chunks. Files and chunks whose hash the
+    server already knows are not sent at all.
+
+    Talks to the following routes of the server::
+
+        POST {uri}/blobs/missing          json {'hashes': [...]} -> {'missing': [...]}
+        PUT  {uri}/blobs/<sha256>         body = the chunk
+        POST {uri}/<route>_by_hash        json {**payload, 'files': manifest} -> same as <route>
+
+    Args:
+        transport (Transport): the pooled transport to send all requests through
+        uri (str): the dbserver uri
+        journal_dir (str, optional): directory to keep the journals of unfinished uploads in. Defaults to None for default_journal_dir.
+        chunk_size (int, optional): the chunk size to split files into. Defaults to default_resumable_chunk_size.
+        progress_callback (callable, optional): called as progress_callback(key, bytes_done, bytes_total) after each chunk. Defaults to None.
+    """
+    def __init__(self, transport, uri:str, journal_dir:str=None, chunk_size:int=default_resumable_chunk_size, progress_callback=None):
+        self.transport = transport
+        self.uri = uri
+        self.journal_dir = journal_dir if journal_dir else default_journal_dir
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+
+    def _get_journal(self, payload:dict, files:dict) -> UploadJournal:
+        # files on disk are identified by path, size and mtime so a retry does not need
+        # to rehash them. File objects can only be identified by their content.
+        ident = {'id': payload.get('id'), 'tag': payload.get('row', {}).get('tags'), 'chunk_size': self.chunk_size, 'files': {}}
+        manifest = {}
+        for key, f in files.items():
+            if hasattr(f, 'read'):
+                manifest[key] = make_manifest({key: f}, self.chunk_size)[key]
+                ident['files'][key] = manifest[key]['sha256']
+            else:
+                st = os.stat(f)
+                ident['files'][key] = [os.path.abspath(f), st.st_size, st.st_mtime_ns]
+
+        name = hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()
+        journal = UploadJournal(os.path.join(self.journal_dir, name + '.json'))
+        if journal.manifest is None:
+            # the file objects were hashed above already, only the files on disk are left
+            manifest.update(make_manifest({k: f for k, f in files.items() if k not in manifest}, self.chunk_size))
+            journal.manifest = {key: manifest[key] for key in files}
+            journal.save()
+        else:
+            _log.info('resuming upload from journal %s (%d chunks acknowledged)', journal.path, len(journal.acked))
+        return journal
+
+    def _post(self, route, **kwargs):
+        r = self.transport.post(f'{self.uri}/{route}', **kwargs)
+        assert r.status_code < 300, r.text
+        return r.json()
+
+    def upload(self, route:str, payload:dict, files:dict) -> dict:
+        """upload files by content and register them with the payload via the `<route>_by_hash` route
+
+        Returns:
+            dict: the response of the server
+        """
+        journal = self._get_journal(payload, files)
+        manifest = journal.manifest
+
+        to_check = set()
+        for dc in manifest.values():
+            to_check.add(dc['sha256'])
+            to_check.update(h for h in dc['chunks'] if h not in journal.acked)
+        missing = set(self._post('blobs/missing', json={'hashes': sorted(to_check)})['missing']) if to_check else set()
+
+        try:
+            for key, dc in manifest.items():
+                if dc['sha256'] not in missing:
+                    _log.debug('skipping %s, content %s already on server', key, dc['sha256'])
+                    continue
+
+                f = files[key]
+                fp = f if hasattr(f, 'read') else open(f, 'rb')
+                try:
+                    n_done = 0
+                    for sha, chunk in zip(dc['chunks'], _iter_chunks(fp, self.chunk_size)):
+                        if sha in missing and sha not in journal.acked:
+                            assert hashlib.sha256(chunk).hexdigest() == sha, f'file for "{key}" changed while uploading'
+                            r = self.transport.put(f'{self.uri}/blobs/{sha}', data=chunk)
+                            assert r.status_code < 300, r.text
+                            journal.ack(sha)
+                        n_done += len(chunk)
+                        if self.progress_callback is not None:
+                            self.progress_callback(key, n_done, dc['size'])
+                finally:
+                    if fp is not f:
+                        fp.close()
+        finally:
+            journal.close()
+
+        # all chunks are on the server: fold the ack lines into the header, in case registering fails.
+        # The journal only records the chunks, the files are registered with the payload of this call
+        journal.save()
+        ret = self._post(route + '_by_hash', json={**payload, 'files': manifest})
+        journal.discard()
+        return ret
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+"""
+background upload queue with a bounded worker pool, so uploading measurement
+data does not block the experiment control loop
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import logging
+
+_log = logging.getLogger(__name__)
+
+
+class UploadQueue():
+    """Runs uploads on a bounded pool of worker threads. Failed uploads are retried
+    with exponential backoff (unless submitted with retry=False). Once max_pending uploads are queued or running,
+    submit() blocks until one of them is done (backpressure), so a slow link can not
+    make the queue grow without bounds.
+
+    Example::
+
+        queue = UploadQueue(max_workers=2)
+        exp = Experiment(1, 'http://localhost:8080', upload_queue=queue)
+        fut = exp.upload_new_datafile('/path/to/acu.csv', block=False)
+        ...
+        exp.flush()     # wait for all uploads, raises the first error
+
+    Args:
+        max_workers (int, optional): number of uploads to run in parallel. Defaults to 2.
+        max_pending (int, optional): max number of queued plus running uploads before submit() blocks. Defaults to 16.
+        n_retries (int, optional): how often to retry a failed upload. Defaults to 3.
+        retry_delay (float, optional): seconds to wait before the first retry, doubled for each further one. Defaults to 1.0.
+    """
+    def __init__(self, max_workers:int=2, max_pending:int=16, n_retries:int=3, retry_delay:float=1.0):
+        assert max_pending >= max_workers, 'max_pending must be at least max_workers'
+        self.n_retries = n_retries
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mke_upload')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = set()
+        # failed uploads are kept until flush() reported them
+        self._failed = []
+        self._closed = False
+        self._counters = dict.fromkeys(['submitted', 'completed', 'failed', 'retried'], 0)
+
+    def _run(self, fun, args, kwargs, retry):
+        n_retries = self.n_retries if retry else 0
+        for i in range(n_retries + 1):
+            try:
+                return fun(*args, **kwargs)
+            except Exception as err:
+                if i >= n_retries:
+                    raise
+                delay = self.retry_delay * 2**i
+                _log.warning('upload failed (%s), retrying in %.1fs (%d/%d)', err, delay, i+1, n_retries)
+                with self._lock:
+                    self._counters['retried'] += 1
+                time.sleep(delay)
+
+    def _done(self, fut:Future):
+        with self._lock:
+            self._pending.discard(fut)
+            if fut.exception() is not None:
+                self._failed.append(fut)
+            self._counters['failed' if fut.exception() else 'completed'] += 1
+            self._changed.notify_all()
+        self._slots.release()
+
+    def submit(self, fun, *args, retry:bool=True, **kwargs) -> Future:
+        """queue fun(*args, **kwargs) for running in the background. Blocks while
+        max_pending uploads are already queued or running. Give retry=False for uploads
+        which are not safe to repeat (e.g. because a lost response would register them twice).
+
+        Returns:
+            concurrent.futures.Future: resolves to the return value of fun
+        """
+        assert not self._closed, 'can not submit to a closed UploadQueue'
+        self._slots.acquire()
+        try:
+            fut = self._executor.submit(self._run, fun, args, kwargs, retry)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(fut)
+            self._counters['submitted'] += 1
+        fut.add_done_callback(self._done)
+        return fut
+
+    def flush(self, timeout:float=None, raise_on_error=True) -> list:
+        """wait for all uploads submitted so far to finish and report all uploads
+        which failed since the last flush
+
+        Args:
+            timeout (float, optional): max seconds to wait. Defaults to None for no limit.
+            raise_on_error (bool, optional): raise the first error of a failed upload. Defaults to True.
+
+        Returns:
+            list: the exceptions of all uploads which failed since the last flush
+        """
+        with self._changed:
+            pending = set(self._pending)
+            # wait for the done callbacks too, so no failure slips through between them and here
+            if not self._changed.wait_for(lambda: self._pending.isdisjoint(pending), timeout=timeout):
+                raise TimeoutError('{} uploads still pending after {}s'.format(len(pending & self._pending), timeout))
+            errors = [fut.exception() for fut in self._failed]
+            self._failed.clear()
+        if errors and raise_on_error:
+            raise errors[0]
+        return errors
+
+    def close(self, wait=True, raise_on_error=False):
+        """stop accepting new uploads and (optionally) wait for all pending ones.
+        With wait, the uploads which failed since the last flush are logged or raised
+
+        Args:
+            wait (bool, optional): wait for all pending uploads. Defaults to True.
+            raise_on_error (bool, optional): raise the first error of a failed upload instead of logging it. Defaults to False.
+        """
+        self._closed = True
+        errors = self.flush(raise_on_error=False) if wait else []
+        self._executor.shutdown(wait=wait)
+        if errors and raise_on_error:
+            raise errors[0]
+        elif errors:
+            _log.error('%d uploads failed. First error: %s', len(errors), errors[0])
+
+    @property
+    def n_pending(self) -> int:
+        """number of uploads queued or running"""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        """get the submitted, completed, failed, retried and pending counters"""
+        with self._lock:
+            return {**self._counters, 'pending': len(self._pending)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
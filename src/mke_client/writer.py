@@ -0,0 +1,440 @@
+#!/usr/bin/python3
+"""
+writing measurement DataFrames to the pathes registered for them in compressed
+columnar formats (Parquet, Arrow IPC, HDF5) instead of CSV
+
+The 'stream' format appends all measurements of a device to one growing file
+instead of writing one file per measurement (see append_to_stream).
+
+Parquet, Arrow and stream need pyarrow (pip install mke_client[parquet]), HDF5
+needs pytables (pip install mke_client[hdf5]). Both are only imported when a
+file is written or read in that format.
+"""
+
+import collections
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+import mke_client.filesys_storage_api as filesys
+from mke_client.localstore import FileLock
+
+_log = logging.getLogger(__name__)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as err:
+        raise ImportError('writing parquet or arrow files needs pyarrow to be installed. Install it with: "pip install mke_client[parquet]"') from err
+    return pyarrow
+
+
+def _write_csv(df, pth, compression):
+    df.to_csv(pth, compression=compression)
+
+def _read_csv(pth, columns):
+    import pandas as pd
+    df = pd.read_csv(pth, index_col=0)
+    return df[columns] if columns is not None else df
+
+def _write_parquet(df, pth, compression):
+    pa = _import_pyarrow()
+    pa.parquet.write_table(pa.Table.from_pandas(df), pth, compression=compression)
+
+def _read_parquet(pth, columns):
+    pa = _import_pyarrow()
+    # read_pandas also reads the index columns if only some columns are asked for
+    return pa.parquet.read_pandas(pth, columns=columns).to_pandas()
+
+def _write_arrow(df, pth, compression):
+    pa = _import_pyarrow()
+    pa.feather.write_feather(pa.Table.from_pandas(df), pth, compression=compression)
+
+def _read_arrow(pth, columns):
+    pa = _import_pyarrow()
+    if columns is not None:
+        with pa.memory_map(pth) as source:
+            meta = pa.ipc.open_file(source).schema.pandas_metadata or {}
+        index_columns = [c for c in meta.get('index_columns', []) if isinstance(c, str) and c not in columns]
+        columns = list(columns) + index_columns
+    return pa.feather.read_table(pth, columns=columns).to_pandas()
+
+def _write_hdf5(df, pth, compression):
+    df.to_hdf(pth, key='data', mode='w', complib=compression, complevel=5 if compression else 0)
+
+def _read_hdf5(pth, columns):
+    import pandas as pd
+    df = pd.read_hdf(pth, key='data')
+    return df[columns] if columns is not None else df
+
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+# statistics sidecars: `<file>.stats.json` next to each written file (or the 'stats' of the index
+# entry for stream measurements) with the time range and per column min, max, count and null
+# count, so queries can skip files which can not match without opening them (see catalog)
+
+stats_suffix = '.stats.json'
+
+
+def _to_float(v):
+    v = float(v)
+    return None if v != v else v
+
+
+def _get_times(df):
+    import pandas as pd
+    if isinstance(df.index, pd.DatetimeIndex):
+        return df.index
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            return pd.DatetimeIndex(df[col])
+    return None
+
+
+def compute_stats(df) -> dict:
+    """the statistics of a DataFrame as stored in the sidecars
+
+    Returns:
+        dict: {'n_rows', 't_min', 't_max' (unix timestamps of the datetime index or first datetime column, or None),
+            'columns': {column: {'min', 'max', 'count', 'null_count'}}} with min and max only for numeric and bool columns
+    """
+    n_rows = len(df)
+    counts = df.count()
+    numeric = df.select_dtypes(include=['number', 'bool'])
+    mins, maxs = numeric.min(), numeric.max()
+    columns = {}
+    for col in df.columns:
+        is_numeric = col in numeric.columns
+        columns[str(col)] = {
+            'min': _to_float(mins[col]) if is_numeric else None,
+            'max': _to_float(maxs[col]) if is_numeric else None,
+            'count': int(counts[col]),
+            'null_count': n_rows - int(counts[col]),
+        }
+
+    times = _get_times(df)
+    t_min = t_max = None
+    if times is not None and times.notna().any():
+        t_min, t_max = times.min().timestamp(), times.max().timestamp()
+    return {'n_rows': n_rows, 't_min': t_min, 't_max': t_max, 'columns': columns}
+
+
+def write_stats(pth:str, stats:dict):
+    """write the statistics sidecar of a file"""
+    with open(pth + stats_suffix, 'w') as fp:
+        json.dump(stats, fp)
+
+
+def read_stats(pth:str) -> dict:
+    """the statistics of a written file or stream measurement, or None if it has none"""
+    if os.path.splitext(pth)[-1] == stream_extension:
+        return get_stream_index(get_stream_path(pth)).get(filesys.get_id_data_from_path(os.path.basename(pth))).get('stats')
+    if not os.path.exists(pth + stats_suffix):
+        return None
+    with open(pth + stats_suffix) as fp:
+        return json.load(fp)
+
+
+################################################################################################
+################################################################################################
+################################################################################################
+
+# append mode: all measurements of one device of an experiment go into a single growing file
+# `IDP_<experiment_id>_<device>.arrows` next to the registered pathes, each as a self contained
+# Arrow IPC stream. The index `<stream>.idx` has one json line {id, offset, length, n_rows, path}
+# per measurement, so one measurement is read with a single seek and read. Appends are
+# serialized by a lock on `<stream>.lock`. The registered pathes stay the key to read a
+# measurement with read_measurement
+
+stream_extension = '.arrows'
+
+
+def get_stream_path(pth:str) -> str:
+    """the path of the append mode stream file a registered measurement path is stored in
+
+    e.G.:
+        '.../data_raw/20230101_000000_IDP_1_IDD_5_ACU.arrows'
+            -> '.../data_raw/IDP_1_ACU.arrows'
+    """
+    fname = os.path.basename(pth)
+    r = re.findall(r"IDP_[0-9]+", fname)
+    device = filesys.get_device_from_pth(fname, raise_on_none=True)
+    assert r, 'could not determine the experiment id from: "{}"'.format(fname)
+    return os.path.join(os.path.dirname(pth), f'{r[-1]}_{device}{stream_extension}')
+
+
+class StreamIndex():
+    """the IDD -> byte range index of one stream file. Reads new index lines
+    incrementally, so it can follow a stream which is still being written"""
+    def __init__(self, stream_path:str):
+        self.stream_path = stream_path
+        self.index_path = stream_path + '.idx'
+        self.entries = {}
+        self._pos = 0
+        self._lock = threading.Lock()
+
+    def update(self) -> dict:
+        """read the index lines added since the last update and return all entries"""
+        with self._lock:
+            if not os.path.exists(self.index_path):
+                return self.entries
+            with open(self.index_path, 'rb') as fp:
+                fp.seek(self._pos)
+                data = fp.read()
+            # a line without newline is still being written (or was cut off by a crash)
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry['id']] = entry
+            self._pos += end
+            return self.entries
+
+    def get(self, meas_id:int) -> dict:
+        """the index entry of a measurement"""
+        if meas_id not in self.entries:
+            self.update()
+        if meas_id not in self.entries:
+            raise KeyError('measurement {} not found in {}'.format(meas_id, self.index_path))
+        return self.entries[meas_id]
+
+
+_stream_indexes = {}
+_stream_locks = collections.defaultdict(threading.Lock)
+
+
+def get_stream_index(stream_path:str) -> StreamIndex:
+    """the (cached) StreamIndex of a stream file"""
+    stream_path = os.path.abspath(stream_path)
+    if stream_path not in _stream_indexes:
+        _stream_indexes.setdefault(stream_path, StreamIndex(stream_path))
+    return _stream_indexes[stream_path]
+
+
+def append_to_stream(df, pth:str, compression:str='zstd', stats:dict=None) -> dict:
+    """append a DataFrame as the measurement of a registered path to its stream file
+    and add it to the index. Safe to use from several threads and processes.
+
+    Args:
+        df (pandas.DataFrame): the data
+        pth (str): the registered path of the measurement
+        compression (str, optional): the compression to use. Defaults to 'zstd'.
+        stats (dict, optional): statistics (see compute_stats) to keep in the index entry. Defaults to None.
+
+    Returns:
+        dict: the index entry {id, offset, length, n_rows, path[, stats]}
+    """
+    pa = _import_pyarrow()
+    meas_id = filesys.get_id_data_from_path(os.path.basename(pth))
+    assert meas_id is not None, 'could not determine the measurement id from: "{}"'.format(pth)
+
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    data = sink.getvalue()
+
+    stream_path = get_stream_path(pth)
+    lock = FileLock(stream_path + '.lock')
+    with _stream_locks[os.path.abspath(stream_path)]:
+        lock.acquire()
+        try:
+            with open(stream_path, 'ab') as fp:
+                offset = fp.seek(0, os.SEEK_END)
+                fp.write(data)
+            entry = {'id': meas_id, 'offset': offset, 'length': data.size, 'n_rows': table.num_rows, 'path': os.path.basename(pth)}
+            if stats is not None:
+                entry['stats'] = stats
+            # the index line is written after the data, so readers never see a range which is not there yet
+            with open(stream_path + '.idx', 'ab') as fp:
+                fp.write(json.dumps(entry).encode() + b'\n')
+        finally:
+            lock.release()
+            lock.close()
+    return entry
+
+
+def read_from_stream(pth:str, columns:list=None):
+    """read the measurement of a registered path from its stream file
+
+    Args:
+        pth (str): the registered path of the measurement
+        columns (list, optional): only return these columns (and the index). Defaults to None for all.
+
+    Returns:
+        pandas.DataFrame: the data
+    """
+    pa = _import_pyarrow()
+    stream_path = get_stream_path(pth)
+    entry = get_stream_index(stream_path).get(filesys.get_id_data_from_path(os.path.basename(pth)))
+    with open(stream_path, 'rb') as fp:
+        fp.seek(entry['offset'])
+        data = fp.read(entry['length'])
+    table = pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+    if columns is not None:
+        meta = table.schema.pandas_metadata or {}
+        index_columns = [c for c in meta.get('index_columns', []) if isinstance(c, str) and c not in columns]
+        table = table.select(list(columns) + index_columns)
+    return table.to_pandas()
+
+
+formats = {
+    'csv': ('.csv', None, _write_csv, _read_csv),
+    'parquet': ('.parquet', 'zstd', _write_parquet, _read_parquet),
+    'arrow': ('.arrow', 'zstd', _write_arrow, _read_arrow),
+    'hdf5': ('.h5', 'blosc', _write_hdf5, _read_hdf5),
+    'stream': (stream_extension, 'zstd', append_to_stream, read_from_stream),
+}
+"""(extension, default compression, write(df, path, compression), read(path, columns)) for each format"""
+
+_formats_by_extension = {ext: fmt for fmt, (ext, *_) in formats.items()}
+
+
+def get_format(pth:str) -> str:
+    """the format of a measurement file from its extension"""
+    ext = os.path.splitext(pth)[-1]
+    assert ext in _formats_by_extension, 'unknown measurement file extension "{}" (known: {})'.format(ext, ', '.join(_formats_by_extension))
+    return _formats_by_extension[ext]
+
+
+def write_dataframe(df, pth:str, fmt:str=None, compression:str=None):
+    """write a DataFrame to pth in the given format (default from the extension of pth)
+
+    Args:
+        df (pandas.DataFrame): the data to write. Column types and the index are kept (except for csv)
+        pth (str): the file to write
+        fmt (str, optional): one of formats. Defaults to None for the format matching the extension of pth.
+        compression (str, optional): the compression to use. Defaults to None for the default of the format.
+    """
+    fmt = fmt if fmt else get_format(pth)
+    ext, default_compression, write, read = formats[fmt]
+    write(df, pth, compression if compression is not None else default_compression)
+
+
+def read_measurement(pth:str, columns:list=None):
+    """read a measurement file written in any of the formats back into a DataFrame
+
+    Example::
+
+        df = read_measurement(main_path, columns=['azimuth', 'elevation'])
+
+    Args:
+        pth (str): the file to read
+        columns (list, optional): only read these columns (parquet and arrow skip reading the others). Defaults to None for all.
+
+    Returns:
+        pandas.DataFrame: the data
+    """
+    return formats[get_format(pth)][3](pth, columns)
+
+
+class MeasurementWriter():
+    """registers measurements with an Experiment (or LocalExperiment) and writes the
+    DataFrames of the ACU file and all aux files in parallel to the registered pathes
+    in one compressed columnar format.
+
+    Example::
+
+        with MeasurementWriter(exp, fmt='parquet') as writer:
+            for tick in ...:
+                main_path, main_id, aux_pathes = writer.write(df_acu, {'RFC': df_rfc}, start_time=t)
+
+    With fmt='stream' every measurement is still registered (and keeps its path), but
+    its data is appended to one file per device, see append_to_stream.
+
+    With stats=True every file gets a statistics sidecar (see compute_stats), which
+    catalog.Catalog picks up to skip files in queries.
+
+    Args:
+        exp (Experiment): the experiment to register the measurements with
+        fmt (str, optional): one of formats ('csv', 'parquet', 'arrow', 'hdf5' or 'stream'). Defaults to 'parquet'.
+        compression (str, optional): the compression to use. Defaults to None for the default of the format
+            (zstd for parquet, arrow and stream, blosc for hdf5, none for csv).
+        max_workers (int, optional): max number of files to write at the same time. Defaults to None for 8.
+        stats (bool, optional): write statistics sidecars. Defaults to True.
+    """
+    def __init__(self, exp, fmt:str='parquet', compression:str=None, max_workers:int=None, stats:bool=True):
+        assert fmt in formats, 'fmt must be one of {}, but was "{}"'.format(', '.join(formats), fmt)
+        self.exp = exp
+        self.fmt = fmt
+        self.extension = formats[fmt][0]
+        self.compression = compression
+        self.max_workers = max_workers
+        self.stats = stats
+        self._executor = None
+        self._lock = threading.Lock()
+        self._dirs = set()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers if self.max_workers else 8, thread_name_prefix='mke_writer')
+            return self._executor
+
+    def _write(self, df, pth):
+        d = os.path.dirname(pth)
+        if d and d not in self._dirs:
+            os.makedirs(d, exist_ok=True)
+            self._dirs.add(d)
+        stats = compute_stats(df) if self.stats else None
+        if self.fmt == 'stream':
+            append_to_stream(df, pth, self.compression if self.compression is not None else formats['stream'][1], stats=stats)
+            return pth
+
+        write_dataframe(df, pth, self.fmt, self.compression)
+        if stats is not None:
+            write_stats(pth, stats)
+        return pth
+
+    def write(self, data, aux_data:dict=None, start_time=None, tag=None):
+        """register a new measurement and write its data
+
+        Args:
+            data (pandas.DataFrame): the data for the main (ACU) file
+            aux_data (dict, optional): device:DataFrame pairs for the aux files. Defaults to None.
+            start_time (str or datetime.datetime, optional): see Experiment.get_path_for_new_datafile. Defaults to None for now.
+            tag (str, optional): see Experiment.get_path_for_new_datafile. Defaults to None.
+
+        Returns:
+            path (str): path of the main file
+            id (int): id of the measurement
+            aux_files (list): auxiliary files as list of tuples with (key, id, path)
+        """
+        aux_data = aux_data if aux_data else {}
+        devices = {'ACU': self.extension, **{k: self.extension for k in aux_data}}
+        main_path, main_id, aux_pathes = self.exp.get_path_for_new_datafile(devices, start_time, tag)
+
+        jobs = [(data, main_path)] + [(aux_data[key], pth) for key, id, pth in aux_pathes]
+        if len(jobs) == 1:
+            self._write(data, main_path)
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(self._write, df, pth) for df, pth in jobs]
+            for future in futures:
+                future.result()
+        _log.debug('wrote measurement %s (%d files)', main_id, len(jobs))
+        return main_path, main_id, aux_pathes
+
+    def close(self):
+        """stop the writer threads"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
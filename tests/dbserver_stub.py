@@ -0,0 +1,161 @@
+"""
+minimal in-process stand-in for the dbserver REST api used for testing and benchmarking
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _make_handler(stub):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with stub.lock:
+                stub.n_connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, code, dc=None, headers=None):
+            body = json.dumps(dc).encode() if dc is not None else b''
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if body and self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _read_body(self):
+            n = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(n) if n else b''
+
+        def _dispatch(self):
+            with stub.lock:
+                stub.n_requests += 1
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            path = self.path.split('?')[0].strip('/')
+            body = self._read_body()
+            for (method, pattern), fun in reversed(list(stub.routes.items())):
+                m = re.fullmatch(pattern, path)
+                if method == self.command and m:
+                    return self._reply(*fun(self, body, *m.groups()))
+            return self._reply(404, {'error': 'not found: ' + path})
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_HEAD = _dispatch
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class DbServerStub():
+    """in-memory dbserver serving GET/PATCH on `/<table>/<id>`, POST on `/<table>`,
+    long-polling on `/<table>/<id>/watch` and `/ping` over HTTP/1.1 with keep-alive. Additional routes can be added
+    to `routes` as {(method, path_regex): fun(handler, body, *groups) -> (code, dc[, headers])}
+    where routes added later take precedence.
+
+    Example::
+
+        with DbServerStub({'experiments': {1: {'id': 1, 'status': 'RUNNING'}}}) as srv:
+            exp = Experiment(1, srv.uri)
+    """
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = {t: {str(k): v for k, v in rows.items()} for t, rows in (tables or {}).items()}
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.n_requests = 0
+        self.n_connections = 0
+
+        self.routes = {
+            ('GET', r'ping'): lambda h, body: (200, 'pong'),
+            ('GET', r'(\w+)/(\w+)'): self._get_row,
+            ('GET', r'(\w+)/(\w+)/watch'): self._watch_row,
+            ('PATCH', r'(\w+)/(\w+)'): self._patch_row,
+            ('POST', r'(experiments|analyses|antennas|measurement_data|aux_files)'): self._post_row,
+        }
+
+        self.httpd = _Server(('127.0.0.1', 0), _make_handler(self))
+        self.uri = 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+        self._thread = None
+
+    @staticmethod
+    def get_etag(row):
+        return '"{}"'.format(hashlib.md5(json.dumps(row, sort_keys=True).encode()).hexdigest())
+
+    def _get_row(self, handler, body, table, id):
+        with self.lock:
+            row = self.tables.get(table, {}).get(id)
+            row = dict(row) if row is not None else None
+        if row is None:
+            return 404, {'error': f'{table}/{id} not found'}
+        etag = self.get_etag(row)
+        if handler.headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, row, {'ETag': etag}
+
+    def _watch_row(self, handler, body, table, id):
+        # long-poll: answer once the row differs from If-None-Match or with 304 after ?timeout
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(handler.path).query)
+        t_end = time.monotonic() + float(query.get('timeout', ['30'])[0])
+        etag = handler.headers.get('If-None-Match')
+        with self.changed:
+            while True:
+                row = self.tables.get(table, {}).get(id)
+                if row is None:
+                    return 404, {'error': f'{table}/{id} not found'}
+                if self.get_etag(row) != etag:
+                    return 200, dict(row), {'ETag': self.get_etag(row)}
+                remaining = t_end - time.monotonic()
+                if remaining <= 0:
+                    return 304, None, {'ETag': etag}
+                self.changed.wait(remaining)
+
+    def _patch_row(self, handler, body, table, id):
+        with self.lock:
+            if id not in self.tables.get(table, {}):
+                return 404, {'error': f'{table}/{id} not found'}
+            row = self.tables[table][id]
+            row.update(json.loads(body))
+            self.changed.notify_all()
+            return 200, dict(row), {'ETag': self.get_etag(row)}
+
+    def _post_row(self, handler, body, table):
+        with self.lock:
+            rows = self.tables.setdefault(table, {})
+            row = json.loads(body)
+            if 'id' not in row:
+                row['id'] = max([int(k) for k in rows.keys() if k.isdigit()], default=0) + 1
+            rows[str(row['id'])] = row
+            return 200, dict(row)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
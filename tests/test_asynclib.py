@@ -0,0 +1,116 @@
+import asyncio
+import time
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from dbserver_stub import DbServerStub
+from mke_client.helpers import get_utcnow, make_zulustr
+
+
+def make_tables(n):
+    rows = {i: {
+        'id': i,
+        'status': 'RUNNING' if i % 2 else 'CANCELLING',
+        'antenna_id': 'test_antenna',
+        'start_condition': make_zulustr(get_utcnow()),
+        'duration_expected_hr_dec': 1.0,
+        'devices_json': '["ACU"]',
+        } for i in range(1, n+1)}
+    return {'experiments': rows}
+
+
+@unittest.skipIf(aiohttp is None, 'needs aiohttp')
+class TestAsyncExperiment(unittest.TestCase):
+
+    def test_poll_all_concurrent(self):
+        from mke_client.asynclib import AsyncExperiment, AsyncTransport, poll_all
+        n, latency = 100, 0.1
+
+        async def main(uri):
+            async with AsyncTransport(max_concurrency=n) as transport:
+                exps = [AsyncExperiment(i, uri, transport=transport) for i in range(1, n+1)]
+                t0 = time.perf_counter()
+                states = await poll_all(exps)
+                dt = time.perf_counter() - t0
+
+                row = await exps[0].set_status_finishing()
+                return states, dt, row, transport.stats()
+
+        with DbServerStub(make_tables(n), latency=latency) as srv:
+            states, dt, row, stats = asyncio.run(main(srv.uri))
+
+        self.assertEqual(len(states), n)
+        self.assertEqual([s.cancel_requested for s in states], [not (i % 2) for i in range(1, n+1)])
+        self.assertGreater(states[0].remaining_hours, 0.9)
+        self.assertEqual(row['status'], 'FINISHING')
+        self.assertEqual(stats['requests'], n+1)
+        # sequential polling would take n * latency
+        self.assertLess(dt, n * latency / 5)
+
+    def test_register_datafile(self):
+        from mke_client.asynclib import AsyncExperiment, AsyncTransport
+
+        def register(handler, body):
+            return 200, {'id': 1, 'path': '/data_raw/a_ACU.csv', 'aux_files': [['RFC', 1, '/data_raw/a_RFC.csv']]}
+
+        async def main(uri):
+            async with AsyncTransport() as transport:
+                exp = AsyncExperiment(1, uri, transport=transport)
+                return await exp.get_path_for_new_datafile(['RFC'])
+
+        with DbServerStub(make_tables(1)) as srv:
+            srv.routes[('POST', 'register_measurement_data')] = register
+            path, id, aux = asyncio.run(main(srv.uri))
+        self.assertEqual(path, '/data_raw/a_ACU.csv')
+        self.assertEqual(aux[0][0], 'RFC')
+
+    def test_same_tick_state_as_rimlib(self):
+        from mke_client.asynclib import AsyncExperiment, AsyncTransport
+        from mke_client.rimlib import Experiment
+        t_is = get_utcnow()
+
+        async def main(uri):
+            async with AsyncTransport() as transport:
+                return await AsyncExperiment(2, uri, transport=transport).poll(t_is)
+
+        with DbServerStub(make_tables(2)) as srv:
+            self.assertEqual(asyncio.run(main(srv.uri)), Experiment(2, srv.uri).poll(t_is))
+
+    def test_session_of_finished_loop_is_closed(self):
+        from mke_client.asynclib import AsyncExperiment, AsyncTransport
+        transport = AsyncTransport()
+
+        async def main(uri):
+            await AsyncExperiment(1, uri, transport=transport).poll()
+            return transport._session
+
+        with DbServerStub(make_tables(1)) as srv:
+            # closed when asyncio.run() shuts down the loop
+            session1 = asyncio.run(main(srv.uri))
+            self.assertTrue(session1.closed)
+
+            # a loop closed without shutting it down first: closed on first use from the next loop
+            loop = asyncio.new_event_loop()
+            session2 = loop.run_until_complete(main(srv.uri))
+            loop.close()
+            self.assertFalse(session2.closed)
+            session3 = asyncio.run(main(srv.uri))
+        self.assertTrue(session2.closed)
+        self.assertIsNot(session2, session3)
+        asyncio.run(transport.close())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from dbserver_stub import DbServerStub
+from mke_client.backends import open_backend, StorageBackend, HttpBackend, JsonFileBackend, SqliteBackend, MemoryBackend
+from mke_client.helpers import get_utcnow, make_zulustr
+from mke_client.locallib import LocalExperiment
+from mke_client.rimlib import Experiment
+from mke_client.transport import Transport
+
+
+def make_exp_row(savedir):
+    return {
+        'id': 1,
+        'status': 'RUNNING',
+        'antenna_id': 'test_antenna',
+        'script_name': 'test_script',
+        'start_condition': make_zulustr(get_utcnow()),
+        'time_started_iso': None,
+        'duration_expected_hr_dec': 1.0,
+        'devices_json': '["ACU"]',
+        'results_json': '{}',
+        'aux_files_json': '{}',
+        'script_out_path': os.path.join(savedir, 'test_script.ipynb'),
+    }
+
+
+class TestOpenBackend(unittest.TestCase):
+
+    def test_schemes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.assertIsInstance(open_backend('http://localhost:8080'), HttpBackend)
+            with open_backend('file://' + tmpdir + '/json') as backend:
+                self.assertIsInstance(backend, JsonFileBackend)
+                self.assertTrue(backend.store.shared)
+            with open_backend('sqlite://' + tmpdir + '/db/my.sqlite') as backend:
+                self.assertIsInstance(backend, SqliteBackend)
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, 'db', 'my.sqlite')))
+
+        self.assertIsInstance(open_backend('mem://'), MemoryBackend)
+        self.assertIsNot(open_backend('mem://'), open_backend('mem://'))
+        self.assertIs(open_backend('mem://test_schemes'), open_backend('mem://test_schemes'))
+        self.assertRaises(AssertionError, open_backend, 'ftp://localhost')
+        self.assertRaises(AssertionError, open_backend, '/no/scheme')
+
+
+class TestLocalBackends(unittest.TestCase):
+
+    def check_all(self, fun):
+        for scheme in ['file', 'sqlite', 'mem']:
+            with self.subTest(scheme=scheme), tempfile.TemporaryDirectory() as tmpdir:
+                backend = open_backend(f'{scheme}://{tmpdir}' if scheme != 'mem' else 'mem://')
+                backend.commit('experiments', make_exp_row(tmpdir))
+                with backend:
+                    fun(Experiment(1, backend=backend), tmpdir)
+
+    def test_get_and_patch(self):
+        def fun(exp, tmpdir):
+            self.assertEqual(exp.uri, exp.backend.uri)
+            self.assertTrue(exp.ping_test())
+            self.assertEqual(exp.set_status_finishing()['status'], 'FINISHING')
+            self.assertEqual(exp.get_me()['status'], 'FINISHING')
+            self.assertRaises(KeyError, exp.get, 'experiments', 2)
+        self.check_all(fun)
+
+    def test_register(self):
+        def fun(exp, tmpdir):
+            t = get_utcnow()
+            ret = exp.get_pathes_for_new_datafiles([(t, {'RFC': '.csv', 'MWS': '.zip'}, 'tag1'), (t, 'RFC', None)])
+            self.assertEqual([r[1] for r in ret], [1, 2])
+            self.assertTrue(ret[0][0].endswith('.csv'))
+            self.assertEqual([a[0] for a in ret[0][2]], ['RFC', 'MWS'])
+            self.assertTrue(ret[0][2][1][2].endswith('.zip'))
+
+            aux = exp.get_pathes_for_new_global_auxfiles(['OCS', 'WEATHER'])
+            self.assertEqual([a[0] for a in aux], ['OCS', 'WEATHER'])
+
+            # every aux file gets its own id
+            aux_ids = [a[1] for r in ret for a in r[2]] + [a[1] for a in aux]
+            self.assertEqual(sorted(aux_ids), list(range(1, 6)))
+            self.assertEqual(len(exp.backend.store.rows('aux_files')), 5)
+
+            row = exp.get()
+            self.assertEqual(json.loads(row['results_json']), {'1': ret[0][0], '2': ret[1][0]})
+            self.assertEqual(exp.get_expected_devices(row), ['ACU', 'RFC', 'MWS', 'OCS', 'WEATHER'])
+            self.assertEqual(set(json.loads(row['aux_files_json'])), {str(a[1]) for a in aux})
+        self.check_all(fun)
+
+    def test_upload(self):
+        def fun(exp, tmpdir):
+            pth = os.path.join(tmpdir, 'rfc.csv')
+            with open(pth, 'w') as fp:
+                fp.write('a,b\n1,2\n')
+
+            main_path, id, aux = exp.upload_new_datafile(io.BytesIO(b'acu data'), {'RFC': pth})
+            with open(main_path, 'rb') as fp:
+                self.assertEqual(fp.read(), b'acu data')
+            self.assertEqual(aux[0][0], 'RFC')
+            with open(aux[0][2]) as fp:
+                self.assertEqual(fp.read(), 'a,b\n1,2\n')
+
+            aux = exp.upload_new_global_auxfiles({'OCS': pth})
+            with open(aux[0][2]) as fp:
+                self.assertEqual(fp.read(), 'a,b\n1,2\n')
+            self.assertTrue(aux[0][2].endswith('.csv'))
+        self.check_all(fun)
+
+    def test_watch(self):
+        def fun(exp, tmpdir):
+            def patch_later():
+                time.sleep(0.2)
+                exp.backend.patch_row('experiments', 1, {'status': 'CANCELLING'})
+            threading.Thread(target=patch_later, daemon=True).start()
+            t0 = time.perf_counter()
+            row = exp.wait_for('CANCELLING', timeout=10)
+            self.assertEqual(row['status'], 'CANCELLING')
+            self.assertLess(time.perf_counter() - t0, 1.0)
+        self.check_all(fun)
+
+    def test_failed_commit_is_no_change(self):
+        def fun(exp, tmpdir):
+            n_changes = exp.backend.n_changes
+            with self.assertRaises(Exception):
+                exp.backend.commit('experiments', {'status': 'CANCELLING'}, 1, raise_on_exists=True)
+            self.assertEqual(exp.backend.n_changes, n_changes)
+            self.assertFalse(exp.backend.wait_for_change(n_changes, timeout=0.01))
+            exp.backend.patch_row('experiments', 1, {'status': 'CANCELLING'})
+            self.assertEqual(exp.backend.n_changes, n_changes + 1)
+        self.check_all(fun)
+
+
+class TestLocalExperiment(unittest.TestCase):
+
+    def test_backends(self):
+        for backend in ['json', 'sqlite', 'memory']:
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as tmpdir:
+                with LocalExperiment(1, fallback_local_basepath=tmpdir, backend=backend) as exp:
+                    main_path, id, aux = exp.get_path_for_new_datafile({'RFC': '.csv'})
+                    exp.get_pathes_for_new_global_auxfiles(['OCS'])
+                    exp.set_status_finishing()
+                with open(os.path.join(exp.savedir, 'aux_files.json')) as fp:
+                    self.assertEqual(len(json.load(fp)), 2)
+                with open(os.path.join(exp.savedir, 'experiments.json')) as fp:
+                    self.assertEqual(json.load(fp)['1']['status'], 'FINISHING')
+
+    def test_same_shared_default_as_uris(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with LocalExperiment(1, fallback_local_basepath=tmpdir) as exp, open_backend('file://' + exp.savedir) as backend:
+                self.assertTrue(exp.store.shared)
+                self.assertEqual(exp.store.shared, backend.store.shared)
+
+    def test_patch_me(self):
+        with tempfile.TemporaryDirectory() as tmpdir, LocalExperiment(1, fallback_local_basepath=tmpdir, backend='memory') as exp:
+            self.assertEqual(exp.patch_me({'comments': 'a'})['comments'], 'a')
+            self.assertEqual(exp.patch_me(json={'comments': 'b'})['comments'], 'b')
+            self.assertEqual(exp.get()['comments'], 'b')
+
+
+class TestStorageBackend(unittest.TestCase):
+
+    def test_incomplete_backend(self):
+        class NoUpload(StorageBackend):
+            def get_row(self, tablename, id): return {}
+            def patch_row(self, tablename, id, dc): return dc
+            def register_measurement(self, payload): return {}
+            def register_aux(self, payload): return {}
+
+        with self.assertRaises(TypeError):
+            NoUpload()
+
+
+class TestHttpBackend(unittest.TestCase):
+
+    def test_same_results_as_local(self):
+        # the client side of registration is the same for both backends
+        payloads = []
+        def register(handler, body):
+            payloads.append(json.loads(body))
+            return 200, {'id': 1, 'path': '/data/acu.csv', 'aux_files': [['RFC', 1, '/data/rfc.csv']]}
+
+        with DbServerStub() as srv, Transport() as transport:
+            srv.routes[('POST', r'register_measurement_data')] = register
+            exp = Experiment(1, srv.uri, transport=transport)
+            self.assertIsInstance(exp.backend, HttpBackend)
+            self.assertIs(exp.backend.transport, transport)
+            self.assertTrue(exp.ping_test())
+            main_path, id, aux = exp.get_path_for_new_datafile({'RFC': '.csv'}, tag='x')
+            self.assertEqual((main_path, id), ('/data/acu.csv', 1))
+            self.assertEqual(payloads[0]['extensions'], {'RFC': '.csv', 'ACU': '.csv'})
+            self.assertEqual(payloads[0]['row']['tags'], 'x')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+import numpy as np
+import pandas as pd
+
+from mke_client.catalog import Catalog, parse_filename
+from mke_client.locallib import LocalExperiment
+from mke_client.writer import MeasurementWriter, append_to_stream, read_stats
+
+
+t0 = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def fill_tree(basedir, id, fmt, n=10):
+    df = pd.DataFrame({'azimuth': range(5)})
+    with LocalExperiment(id, fallback_local_basepath=basedir, backend='memory') as exp, MeasurementWriter(exp, fmt) as writer:
+        for i in range(n):
+            writer.write(df, {'MWS': df}, start_time=t0 + datetime.timedelta(days=i))
+        for key, aux_id, pth in exp.get_pathes_for_new_global_auxfiles({'OCS': '.csv'}):
+            os.makedirs(os.path.dirname(pth), exist_ok=True)
+            with open(pth, 'w') as fp:
+                fp.write('ocs')
+        return exp.savedir
+
+
+class TestCatalog(unittest.TestCase):
+
+    def test_parse_filename(self):
+        self.assertEqual(parse_filename('20230101_1200_IDP_42_IDD_7_mytag_MWS.zip'), (42, 7, 'MWS', 'mytag', 1672574400))
+        self.assertEqual(parse_filename('20230101_1200_IDP_42_IDD_7_ACU.csv')[:4], (42, 7, 'ACU', None))
+        self.assertEqual(parse_filename('20230101_1200_IDP_42_OCS.csv')[:4], (42, None, 'OCS', None))
+        self.assertIsNone(parse_filename('experiments.json'))
+
+    def test_scan_and_find(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, 'output')
+            savedir1 = fill_tree(root, 1, 'csv')
+            savedir2 = fill_tree(root, 2, 'stream')
+
+            with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+                stats = catalog.scan()
+                self.assertEqual(stats['streams'], 2)
+
+                self.assertEqual(catalog.count(), 2 * (2 * 10 + 1))
+                self.assertEqual(catalog.count(kind='stream'), 20)
+                self.assertEqual(catalog.count(kind='aux'), 2)
+
+                rows = catalog.find(device='MWS', experiment_id=1, t_start='2023-01-03T00:00:00Z', t_end=t0 + datetime.timedelta(days=5))
+                self.assertEqual([r['meas_id'] for r in rows], [3, 4, 5, 6])
+                self.assertEqual(rows[0]['time'], t0 + datetime.timedelta(days=2))
+                self.assertTrue(os.path.exists(rows[0]['path']))
+                self.assertEqual(rows[0]['size'], os.path.getsize(rows[0]['path']))
+                self.assertEqual(len(catalog.find_paths(device=['ACU', 'MWS'], experiment_id=2, limit=3)), 3)
+
+                # nothing changed: only one stat per directory
+                stats = catalog.scan()
+                self.assertEqual((stats['dirs_scanned'], stats['files'], stats['streams']), (0, 0, 0))
+
+                # a new file in one directory, a grown stream and a removed experiment
+                fill_tree(root, 3, 'csv', n=1)
+                append_to_stream(pd.DataFrame({'azimuth': [1]}), os.path.join(savedir2, 'data_raw', '20230201_0000_IDP_2_IDD_11_ACU.arrows'))
+                shutil.rmtree(savedir1)
+
+                stats = catalog.scan()
+                self.assertGreater(stats['dirs_unchanged'], 0)
+                self.assertEqual(stats['dirs_removed'], 3)
+                self.assertEqual(catalog.count(experiment_id=1), 0)
+                self.assertEqual(catalog.count(experiment_id=2, device='ACU'), 11)
+                self.assertEqual(catalog.count(experiment_id=3), 3)
+
+                stats = catalog.scan(full=True)
+                self.assertEqual(stats['dirs_unchanged'], 0)
+                self.assertEqual(catalog.count(), 21 + 1 + 3)
+
+
+def make_ticks(n_files, n_rows=100):
+    # elevation only goes above 80 deg in every 5th file
+    frames = []
+    for i in range(n_files):
+        t = pd.date_range(t0 + datetime.timedelta(hours=i), periods=n_rows, freq='1s', tz='UTC')
+        elevation = np.linspace(20, 85 if i % 5 == 0 else 70, n_rows)
+        frames.append(pd.DataFrame({'elevation': elevation, 'mode': ['TRACK'] * n_rows}, index=pd.Index(t, name='time')))
+    return frames
+
+
+class TestStats(unittest.TestCase):
+
+    def test_skip_files(self):
+        for fmt in ['parquet', 'stream']:
+            with self.subTest(fmt=fmt), tempfile.TemporaryDirectory() as tmpdir:
+                root = os.path.join(tmpdir, 'output')
+                frames = make_ticks(20)
+                with LocalExperiment(1, fallback_local_basepath=root, backend='memory') as exp, MeasurementWriter(exp, fmt) as writer:
+                    pathes = [writer.write(df, start_time=t0)[0] for df in frames]
+                self.assertEqual(read_stats(pathes[0])['columns']['elevation']['max'], 85)
+
+                with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+                    self.assertEqual(catalog.scan()['stats'], 20 if fmt == 'parquet' else 0)
+                    stats = catalog.get_stats(pathes[1])
+                    self.assertEqual(stats['n_rows'], 100)
+                    self.assertEqual(stats['t_min'], (t0 + datetime.timedelta(hours=1)).timestamp())
+                    self.assertEqual(stats['columns']['mode'], {'min': None, 'max': None, 'count': 100, 'null_count': 0})
+
+                    self.assertEqual(catalog.find_paths(ranges={'elevation': (80, None)}), pathes[::5])
+                    self.assertEqual(catalog.count(ranges={'elevation': (None, 19)}), 0)
+                    self.assertEqual(catalog.count(ranges={'elevation': (80, None), 'time': (t0 + datetime.timedelta(hours=4), None)}), 3)
+
+                    df = catalog.query({'elevation': (80, None)}, columns=['elevation'])
+                    df_all = catalog.query({'elevation': (80, None)}, columns=['elevation'], use_stats=False)
+                    expected = pd.concat([df[df.elevation >= 80] for df in frames])
+                    self.assertEqual(len(df), len(expected))
+                    np.testing.assert_array_equal(df.elevation.values, expected.elevation.values)
+                    pd.testing.assert_frame_equal(df, df_all)
+                    self.assertEqual(set(df.path), set(pathes[::5]))
+
+                    df = catalog.query({'time': (t0 + datetime.timedelta(hours=3, seconds=10), t0 + datetime.timedelta(hours=3, seconds=19))})
+                    self.assertEqual(len(df), 10)
+
+    def test_empty_column_is_only_skipped_for_a_range(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, 'output')
+            frames = make_ticks(2, n_rows=10)
+            frames[1]['elevation'] = np.nan
+            with LocalExperiment(1, fallback_local_basepath=root, backend='memory') as exp, MeasurementWriter(exp, 'parquet') as writer:
+                pathes = [writer.write(df, start_time=t0)[0] for df in frames]
+
+            with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+                catalog.scan()
+                self.assertEqual(catalog.get_stats(pathes[1])['columns']['elevation']['count'], 0)
+                self.assertEqual(catalog.find_paths(ranges={'elevation': (None, None)}), pathes)
+                self.assertEqual(catalog.find_paths(ranges={'elevation': (0, None)}), pathes[:1])
+                self.assertEqual(len(catalog.query({'elevation': (None, None)})), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+import pandas as pd
+
+import mke_client.filesys_storage_api as filesys
+from mke_client.filesys_storage_api import PathPlanner
+from mke_client.catalog import Catalog
+from mke_client.writer import append_to_stream, get_stream_path, read_measurement
+
+
+t0 = datetime.datetime(2023, 1, 1, 12, 30, 15, tzinfo=datetime.timezone.utc)
+
+
+class TestMkdir(unittest.TestCase):
+
+    def test_mkdir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'a', 'b')
+            self.assertEqual(filesys.mkdir(pth), pth.replace('\\', '/'))
+            self.assertTrue(os.path.isdir(pth))
+            self.assertIsNone(filesys.mkdir(pth))
+            self.assertIsNone(filesys.mkdir(pth, raise_ex=True))
+
+            with open(os.path.join(tmpdir, 'file'), 'w') as fp:
+                fp.write('x')
+            with self.assertRaises(OSError):
+                filesys.mkdir(os.path.join(tmpdir, 'file', 'sub'), raise_ex=True)
+            self.assertIsNone(filesys.mkdir(os.path.join(tmpdir, 'file', 'sub')))
+
+
+class TestPathPlanner(unittest.TestCase):
+
+    def test_same_as_get_exp_save_pth_datafile(self):
+        for shard_size in [None, 100]:
+            planner = PathPlanner('/data/ant1/exp', 42, shard_size=shard_size)
+            for meas_id, device, tag, ext in [(1, 'ACU', None, '.csv'), (250, 'MWS', ' my tag', '.zip'), ('7', 'RFC', 'x', '.parquet')]:
+                with self.subTest(shard_size=shard_size, meas_id=meas_id):
+                    expected = filesys.get_exp_save_pth_datafile('/data/ant1/exp', t0, 42, meas_id, device, tag=tag, extension=ext, shard_size=shard_size)
+                    self.assertEqual(planner.get_path(t0, meas_id, device, tag=tag, extension=ext), expected)
+
+        self.assertEqual(PathPlanner('/data', 42, shard_size=100).get_path(t0, 250, 'ACU'), '/data/data_raw/00000200/20230101_1230_IDP_42_IDD_250_ACU.csv')
+
+    def test_get_pathes(self):
+        planner = PathPlanner('/data', 3)
+        times = [t0 + datetime.timedelta(minutes=i) for i in range(4)]
+        pathes = planner.get_pathes(times, [10, 11, 12, 13], {'ACU': '.parquet', 'MWS': '.csv'}, tag='a')
+        self.assertEqual(len(pathes), 4)
+        self.assertEqual(pathes[2], {'ACU': '/data/data_raw/20230101_1232_IDP_3_IDD_12_a_ACU.parquet',
+                                     'MWS': '/data/data_raw/20230101_1232_IDP_3_IDD_12_a_MWS.csv'})
+        self.assertEqual(planner.get_pathes(t0, [1, 2], {'ACU': '.csv'})[1]['ACU'], '/data/data_raw/20230101_1230_IDP_3_IDD_2_ACU.csv')
+        with self.assertRaises(AssertionError):
+            planner.get_pathes(times, [1], {'ACU': '.csv'})
+
+    def test_make_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            planner = PathPlanner(tmpdir, 1, shard_size=10, make_dir=True)
+            pathes = planner.get_pathes(t0, list(range(25)), {'ACU': '.csv'})
+            self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, 'data_raw'))), ['00000000', '00000010', '00000020'])
+            self.assertEqual(len(planner._dirs), 3)
+            self.assertTrue(all(os.path.isdir(os.path.dirname(p['ACU'])) for p in pathes))
+
+            planner = PathPlanner(os.path.join(tmpdir, 'other'), 1)
+            planner.get_path(t0, 1, 'ACU')
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'other')))
+
+    def test_sharded_stream_and_catalog(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = os.path.join(tmpdir, 'output')
+            savedir = filesys.get_exp_save_dir(root, t0, 5, 'ant1', 'sharded')
+            planner = PathPlanner(savedir, 5, shard_size=4, make_dir=True)
+            pathes = planner.get_pathes(t0, list(range(1, 11)), {'ACU': '.arrows'})
+            for i, p in enumerate(pathes):
+                append_to_stream(pd.DataFrame({'azimuth': [i]}), p['ACU'])
+
+            # one stream per shard
+            self.assertEqual(get_stream_path(pathes[5]['ACU']), os.path.join(savedir, 'data_raw', '00000004', 'IDP_5_ACU.arrows'))
+            self.assertEqual(read_measurement(pathes[5]['ACU']).azimuth.tolist(), [5])
+
+            with Catalog(root, db_path=os.path.join(tmpdir, 'catalog.sqlite')) as catalog:
+                self.assertEqual(catalog.scan()['streams'], 3)
+                self.assertEqual([r['meas_id'] for r in catalog.find(experiment_id=5)], list(range(1, 11)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import datetime
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from mke_client import helpers
+from mke_client.helpers import make_zulustr, parse_zulutime, parse_zulutimes
+
+
+utc = datetime.timezone.utc
+
+
+class TestZulutime(unittest.TestCase):
+
+    def test_parse_zulutime(self):
+        self.assertEqual(parse_zulutime('2022-06-09T10:05:21Z'), datetime.datetime(2022, 6, 9, 10, 5, 21, tzinfo=utc))
+        self.assertEqual(parse_zulutime('2022-06-09T10:05:21.123456Z'), datetime.datetime(2022, 6, 9, 10, 5, 21, 123456, tzinfo=utc))
+        self.assertEqual(parse_zulutime('2022-06-09T10:05:21.123Z'), datetime.datetime(2022, 6, 9, 10, 5, 21, 123000, tzinfo=utc))
+        self.assertEqual(parse_zulutime('2022-06-09Z'), datetime.datetime(2022, 6, 9, tzinfo=utc))
+        # not a fixed zulu format -> dateutil, offsets are replaced (not converted) as before
+        self.assertEqual(parse_zulutime('2022-06-09T10:05:21+02:00'), datetime.datetime(2022, 6, 9, 10, 5, 21, tzinfo=utc))
+        self.assertEqual(parse_zulutime('2022-06-09T10:05Z'), datetime.datetime(2022, 6, 9, 10, 5, tzinfo=utc))
+        for s in ['invalid', '', '2022-13-09Z', '2022-06-09T10:05:21:123Z', None, 5]:
+            self.assertIsNone(parse_zulutime(s), s)
+
+    def test_cache(self):
+        helpers._parse_zulutime.cache_clear()
+        for i in range(3):
+            parse_zulutime('2022-06-09T10:05:21Z')
+        self.assertEqual(helpers._parse_zulutime.cache_info().hits, 2)
+
+    def test_make_zulustr(self):
+        t = datetime.datetime(2022, 6, 9, 10, 5, 21, 123456)
+        self.assertEqual(make_zulustr(t), '2022-06-09T10:05:21Z')
+        self.assertEqual(make_zulustr(t, remove_ms=False), '2022-06-09T10:05:21.123456Z')
+        self.assertEqual(make_zulustr(t.replace(microsecond=0), remove_ms=False), '2022-06-09T10:05:21Z')
+        self.assertEqual(parse_zulutime(make_zulustr(t, remove_ms=False)), t.replace(tzinfo=utc))
+
+    def test_parse_zulutimes(self):
+        values = ['2022-06-09T10:05:21Z', '2022-06-09T10:05:21.123456Z', '2022-06-09Z', 'invalid', None,
+                  '2022-06-09T12:05:21+02:00', '2022-06-09T12:05:21.5-0130', '2022-06-09T12:05:21']
+        parsed = parse_zulutimes(values)
+        for s, t in zip(values, parsed):
+            expected = parse_zulutime(s)
+            if expected is None:
+                self.assertTrue(t != t)
+            else:
+                self.assertEqual(t, expected)
+        self.assertEqual(parsed[5], datetime.datetime(2022, 6, 9, 12, 5, 21, tzinfo=utc))
+
+    def test_parse_zulutimes_without_iso8601_format(self):
+        # the path for pandas < 2.0 gives the same result
+        import pandas as pd
+        values = ['2022-06-09T10:05:21Z', '2022-06-09T10:05:21.123456Z', '2022-06-09Z', 'invalid', None, '2022-06-09T10:05:21Z', '2022-06-09T12:05:21+02:00']
+        pd.testing.assert_series_equal(helpers._parse_zulutimes_each(pd.Series(values, dtype=object)), parse_zulutimes(values))
+        self.assertEqual(str(helpers._parse_zulutimes_each(pd.Series([], dtype=object)).dtype), str(parse_zulutimes([]).dtype))
+
+
+if __name__ == '__main__':
+    unittest.main()
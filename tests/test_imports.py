@@ -0,0 +1,55 @@
+import json
+import subprocess
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+heavy_modules = ['numpy', 'pandas', 'requests', 'dateutil', 'astropy', 'matplotlib']
+
+max_import_time = 0.5
+"""generous upper limit in seconds for a cold import of a client library (it takes ~20 ms)"""
+
+
+def cold_import(module, code=''):
+    """import a module in a fresh interpreter and return the import time and the heavy modules loaded after running code"""
+    script = '\n'.join([
+        'import json, sys, time',
+        'sys.path.insert(0, {!r})'.format(parent_dir + '/src'),
+        't0 = time.perf_counter()',
+        'import {}'.format(module),
+        'dt = time.perf_counter() - t0',
+        code,
+        'print(json.dumps([dt, [m for m in {!r} if m in sys.modules]]))'.format(heavy_modules),
+    ])
+    out = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+class TestImports(unittest.TestCase):
+
+    def test_light_imports(self):
+        for module in ['mke_client.rimlib', 'mke_client.remexlib', 'mke_client.locallib', 'mke_client.schedule']:
+            dt, loaded = cold_import(module)
+            self.assertEqual(loaded, [], module)
+            self.assertLess(dt, max_import_time, module)
+
+    def test_loaded_on_use(self):
+        dt, loaded = cold_import('mke_client.transport', 'mke_client.transport.Transport().close()')
+        self.assertEqual(loaded, ['requests'])
+
+        dt, loaded = cold_import('mke_client.remexlib', 'mke_client.remexlib.parse_zulutimes(["2022-01-01Z"])')
+        self.assertIn('pandas', loaded)
+
+        dt, loaded = cold_import('mke_client.helpers', 'mke_client.helpers.parse_zulutime("2022-01-01T00:00:00+01:00")')
+        self.assertEqual(loaded, ['dateutil'])
+
+
+if __name__ == '__main__':
+    unittest.main()
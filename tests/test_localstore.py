@@ -0,0 +1,217 @@
+import datetime
+import json
+import subprocess
+import threading
+import tempfile
+import time
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from mke_client.localstore import JournalStore, SqliteStore, _write_json_atomic
+from mke_client.helpers import get_utcnow, make_zulustr
+from mke_client.locallib import LocalExperiment
+
+
+class TestJournalStore(unittest.TestCase):
+
+    def test_replay_and_compact(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = JournalStore(tmpdir, compact_every=1000)
+            for i in range(1, 11):
+                store.upsert('measurement_data', i, {'id': i, 'data_path': f'file_{i}.csv'})
+            store.upsert('measurement_data', 3, {'tags': 'patched'})
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'measurement_data.json')))
+
+            # a crash while writing the last line must not break replaying the others
+            with open(os.path.join(tmpdir, 'measurement_data.journal'), 'a') as fp:
+                fp.write('{"id": 11, "ro')
+
+            store2 = JournalStore(tmpdir)
+            self.assertEqual(store2.max_id('measurement_data'), 10)
+            self.assertEqual(store2.get('measurement_data', 3), {'id': 3, 'data_path': 'file_3.csv', 'tags': 'patched'})
+            self.assertEqual(store2.rows('measurement_data'), store.rows('measurement_data'))
+
+            store.close()
+            with open(os.path.join(tmpdir, 'measurement_data.json')) as fp:
+                db = json.load(fp)
+            self.assertEqual(os.path.getsize(os.path.join(tmpdir, 'measurement_data.journal')), 0)
+            self.assertEqual(db, store.rows('measurement_data'))
+            self.assertEqual(db['3']['tags'], 'patched')
+
+    def test_compact_every(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = JournalStore(tmpdir, compact_every=5)
+            for i in range(1, 8):
+                store.upsert('aux_files', i, {'id': i})
+            with open(os.path.join(tmpdir, 'aux_files.json')) as fp:
+                self.assertEqual(len(json.load(fp)), 5)
+            self.assertEqual(len(JournalStore(tmpdir).rows('aux_files')), 7)
+
+    def test_write_behind(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'measurement_data.journal')
+            store = JournalStore(tmpdir, flush_every=3)
+            store.upsert('measurement_data', 1, {'id': 1, 'status': 'INITIALIZED'})
+            store.upsert('measurement_data', 1, {'filename': 'meas_1.csv'})
+            store.upsert('measurement_data', 2, {'id': 2})
+            self.assertFalse(os.path.exists(pth))
+            self.assertEqual(store.get('measurement_data', 1)['filename'], 'meas_1.csv')
+
+            store.upsert('measurement_data', 3, {'id': 3})
+            with open(pth) as fp:
+                lines = [json.loads(line) for line in fp]
+            self.assertEqual(lines[0], {'id': 1, 'row': {'id': 1, 'status': 'INITIALIZED', 'filename': 'meas_1.csv'}})
+            self.assertEqual(len(lines), 3)
+
+            store.flush_interval = 0.05
+            store.upsert('measurement_data', 4, {'id': 4})
+            time.sleep(0.5)
+            self.assertEqual(JournalStore(tmpdir).max_id('measurement_data'), 4)
+            store.close()
+
+    def test_flush_at_exit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            code = '\n'.join(['import sys',
+                              'sys.path.insert(0, {!r})'.format(parent_dir + '/src'),
+                              'from mke_client.localstore import JournalStore',
+                              'store = JournalStore({!r}, flush_every=1000, flush_interval=60)'.format(tmpdir),
+                              'store.upsert("aux_files", 1, {"id": 1})'])
+            subprocess.run([sys.executable, '-c', code], check=True, timeout=60)
+            self.assertEqual(JournalStore(tmpdir).get('aux_files', 1), {'id': 1})
+
+    def test_shared_between_processes(self):
+        for backend in ['json', 'sqlite']:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                exp = LocalExperiment(1, fallback_local_basepath=tmpdir, backend=backend, compact_every=50, shared=True)
+                code = '\n'.join(['import sys',
+                                  'sys.path.insert(0, {!r})'.format(parent_dir + '/src'),
+                                  'from mke_client.locallib import LocalExperiment',
+                                  'exp = LocalExperiment(1, savedir={!r}, backend={!r}, compact_every=50, shared=True)'.format(exp.savedir, backend),
+                                  'print([exp.get_path_for_new_datafile({"ACU": ".csv", "RFC": ".csv"})[1] for i in range(20)])'])
+                procs = [subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True) for i in range(4)]
+                ids = [id for p in procs for id in json.loads(p.communicate(timeout=120)[0])]
+                self.assertEqual(len(set(ids)), 80)
+                self.assertEqual(len(exp.store.rows('measurement_data')), 80)
+                self.assertEqual(sorted(int(k) for k in json.loads(exp.get()['results_json'])), sorted(ids))
+                exp.close()
+
+    def test_write_json_atomic(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'experiments.json')
+            # concurrent writers each use their own temp file
+            threads = [threading.Thread(target=_write_json_atomic, args=(pth, {str(i): {'id': i}})) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            with open(pth) as fp:
+                self.assertEqual(len(json.load(fp)), 1)
+            self.assertEqual(os.listdir(tmpdir), ['experiments.json'])
+
+            with self.assertRaises(TypeError):
+                _write_json_atomic(pth, {'1': object()})
+            self.assertEqual(os.listdir(tmpdir), ['experiments.json'])
+
+    def test_old_json_layout_is_loaded(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, 'experiments.json'), 'w') as fp:
+                json.dump({'1': {'id': 1, 'status': 'RUNNING'}}, fp, indent=3)
+            store = JournalStore(tmpdir)
+            self.assertTrue(store.contains('experiments', 1))
+            store.upsert('experiments', 1, {'status': 'FINISHING'})
+            self.assertEqual(JournalStore(tmpdir).get('experiments', 1)['status'], 'FINISHING')
+
+
+
+def fill(store):
+    store.upsert('experiments', 1, {'id': 1, 'status': 'RUNNING', 'duration_expected_hr_dec': 1, 'needs_manual_upload': False, 'errors': None})
+    for i in range(1, 21):
+        store.upsert('measurement_data', i, {'id': i, 'experiment_id': 1, 'filename': f'meas_{i}.csv', 'tags': None})
+        for j, device in enumerate(['RFC', 'MWS']):
+            store.upsert('aux_files', 2*i + j, {'id': 2*i + j, 'parent_id': i, 'device': device, 'path': f'{device}_{i}.csv', 'some_field': [i, j]})
+    store.upsert('experiments', 1, {'status': 'FINISHING'})
+
+
+class TestSqliteStore(unittest.TestCase):
+
+    def test_same_rows_as_journal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'json'))
+            os.makedirs(os.path.join(tmpdir, 'sqlite'))
+            js = JournalStore(os.path.join(tmpdir, 'json'))
+            sq = SqliteStore(os.path.join(tmpdir, 'sqlite'))
+            fill(js)
+            fill(sq)
+
+            for table in ['experiments', 'measurement_data', 'aux_files']:
+                self.assertEqual(sq.rows(table), js.rows(table))
+                self.assertEqual(sq.max_id(table), js.max_id(table))
+            self.assertEqual(sq.get('experiments', 1)['duration_expected_hr_dec'], 1)
+            self.assertIs(sq.get('experiments', 1)['needs_manual_upload'], False)
+            self.assertEqual(sq.find('aux_files', parent_id=7), js.find('aux_files', parent_id=7))
+            self.assertEqual(len(sq.find('aux_files', device='MWS')), 20)
+            self.assertRaises(KeyError, sq.get, 'aux_files', 1000)
+            for bad_id in ['abc', None]:
+                with self.subTest(bad_id=bad_id):
+                    self.assertRaises(KeyError, js.get, 'aux_files', bad_id)
+                    self.assertRaises(KeyError, sq.get, 'aux_files', bad_id)
+                    self.assertFalse(sq.contains('aux_files', bad_id))
+
+            # a second connection (e.g. from another process) can read while the first one is open
+            reader = SqliteStore(os.path.join(tmpdir, 'sqlite'))
+            self.assertEqual(reader.get('experiments', 1)['status'], 'FINISHING')
+            reader.close()
+
+            js.export_json()
+            sq.export_json()
+            sq.close()
+            for table in ['experiments', 'measurement_data', 'aux_files']:
+                with open(os.path.join(tmpdir, 'json', table + '.json')) as fp1, open(os.path.join(tmpdir, 'sqlite', table + '.json')) as fp2:
+                    self.assertEqual(json.load(fp1), json.load(fp2))
+
+    def test_local_experiment(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exp = LocalExperiment(0, fallback_local_basepath=tmpdir, backend='sqlite')
+            pth, id, aux = exp.get_path_for_new_datafile({'ACU': '.csv', 'RFC': '.csv'})
+            self.assertEqual(exp.store.find('aux_files', parent_id=id)[0]['path'], aux[0][2])
+            self.assertIn(str(id), json.loads(exp.get()['results_json']))
+            exp.set_status_finishing()
+            with open(os.path.join(exp.savedir, 'experiments.json')) as fp:
+                self.assertEqual(json.load(fp)[str(exp.id)]['status'], 'FINISHING')
+            exp.close()
+
+    def test_write_behind(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sq = SqliteStore(tmpdir, flush_every=100)
+            sq.upsert('aux_files', 1, {'id': 1})
+            reader = SqliteStore(tmpdir)
+            self.assertFalse(reader.has_rows('aux_files'))
+            sq.flush()
+            self.assertTrue(reader.contains('aux_files', 1))
+            reader.close()
+            sq.close()
+
+
+class TestLocalWatch(unittest.TestCase):
+
+    def test_wait_for_start_condition_cancel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exp = LocalExperiment(0, fallback_local_basepath=tmpdir)
+            exp.patch_me(json={'start_condition': make_zulustr(get_utcnow() + datetime.timedelta(seconds=30))})
+            threading.Timer(0.2, exp.set_status_cancelling).start()
+            t0 = time.perf_counter()
+            exp.wait_for_start_condition(verb=False)
+            self.assertLess(time.perf_counter() - t0, 2)
+            exp.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import io
+import logging
+import subprocess
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+import mke_client
+import mke_client.filesys_storage_api as filesys
+
+
+class TestLogging(unittest.TestCase):
+
+    def tearDown(self):
+        logger = logging.getLogger('mke_client')
+        for handler in list(logger.handlers):
+            if getattr(handler, '_mke_client_configured', False):
+                logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+
+    def test_no_root_handlers(self):
+        script = '; '.join([
+            'import logging, sys',
+            'sys.path.insert(0, {!r})'.format(parent_dir + '/src'),
+            'import mke_client.rimlib, mke_client.locallib, mke_client.filesys_storage_api',
+            'print(len(logging.getLogger().handlers))',
+            'logging.getLogger("mke_client.rimlib").warning("not printed")',
+        ])
+        r = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True)
+        self.assertEqual(r.stdout.strip(), '0')
+        self.assertEqual(r.stderr, '')
+
+    def test_configure_logging(self):
+        stream = io.StringIO()
+        mke_client.configure_logging(logging.INFO, stream=io.StringIO())
+        mke_client.configure_logging(logging.INFO, stream=stream)
+        filesys.get_device_from_pth('/data/nodevice')
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1, lines)
+        self.assertIn('mke_client.filesys_storage_api - WARNING - Could not determine device from: nodevice', lines[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from mke_client.remexlib import get_expected_schedule, find_overlaps, raise_on_overlap, parse_zulutime
+from mke_client.schedule import ScheduleIndex
+
+
+def make_schedule():
+    return pd.DataFrame([
+        dict(antenna_id='a', start_condition='2022-01-01T00:00:00Z', duration_expected_hr_dec=5, time_started_iso=None, time_finished_iso=None),
+        dict(antenna_id='a', start_condition='2022-01-01T01:00:00Z', duration_expected_hr_dec=0.5, time_started_iso=None, time_finished_iso=None),
+        dict(antenna_id='a', start_condition='2022-01-01T03:00:00Z', duration_expected_hr_dec=None, time_started_iso=None, time_finished_iso=None),
+        dict(antenna_id='b', start_condition='2022-01-01T03:00:00Z', duration_expected_hr_dec=1, time_started_iso='2022-01-01T02:00:00Z', time_finished_iso='2022-01-01T02:30:00Z'),
+        dict(antenna_id='b', start_condition='2022-01-02Z', duration_expected_hr_dec=1, time_started_iso=None, time_finished_iso=None),
+        dict(antenna_id='b', start_condition='invalid', duration_expected_hr_dec=1, time_started_iso=None, time_finished_iso=None),
+    ], index=[10, 11, 12, 13, 14, 15])
+
+
+class TestSchedule(unittest.TestCase):
+
+    def test_expected_schedule(self):
+        df = get_expected_schedule(make_schedule())
+        self.assertEqual(df.loc[10, 'tend'], parse_zulutime('2022-01-01T05:00:00Z'))
+        self.assertEqual(df.loc[12, 'tend'], parse_zulutime('2022-01-01T03:01:00Z'))
+        self.assertEqual(df.loc[13, 'tstart'], parse_zulutime('2022-01-01T02:00:00Z'))
+        self.assertEqual(df.loc[13, 'tend'], parse_zulutime('2022-01-01T02:30:00Z'))
+        self.assertEqual(df.loc[14, 'tstart'], parse_zulutime('2022-01-02T00:00:00Z'))
+        self.assertTrue(pd.isnull(df.loc[15, 'tstart']) and pd.isnull(df.loc[15, 'tend']))
+
+    def test_overlaps(self):
+        df = get_expected_schedule(make_schedule())
+        overlaps = find_overlaps(df)
+        # 11 and 12 both start while 10 is still running, 12 does not overlap 11
+        self.assertEqual(list(zip(overlaps['index_a'], overlaps['index_b'])), [(10, 11), (10, 12)])
+        self.assertRaises(AssertionError, raise_on_overlap, df)
+
+        raise_on_overlap(df.loc[[11, 12, 13, 14, 15]])
+        self.assertTrue(find_overlaps(df.iloc[:0]).empty)
+
+    def test_back_to_back(self):
+        # half open intervals as in ScheduleIndex: starting right when the script before ends is no overlap
+        rows = [
+            dict(id=1, antenna_id='a', start_condition='2022-01-01T00:00:00Z', duration_expected_hr_dec=1),
+            dict(id=2, antenna_id='a', start_condition='2022-01-01T01:00:00Z', duration_expected_hr_dec=1),
+            dict(id=3, antenna_id='a', start_condition='2022-01-01T01:59:00Z', duration_expected_hr_dec=1),
+        ]
+        df = get_expected_schedule(pd.DataFrame(rows))
+        self.assertEqual(list(find_overlaps(df)['index_b']), [2])
+        raise_on_overlap(df.iloc[:2])
+
+        self.assertEqual(ScheduleIndex(rows[:1]).conflicts(rows[1]), [])
+        self.assertEqual(ScheduleIndex(rows[:2]).conflicts(rows[2]), [2])
+
+    def test_overlaps_random(self):
+        # compare against a brute force check of consecutive scripts
+        rng = np.random.default_rng(0)
+        n = 500
+        t0 = pd.Timestamp('2022-01-01', tz='UTC')
+        df = pd.DataFrame({
+            'antenna_id': rng.choice(['a', 'b', 'c'], n),
+            'start_condition': [(t0 + pd.Timedelta(minutes=int(m))).strftime('%Y-%m-%dT%H:%M:%SZ') for m in rng.integers(0, 60 * 24 * 30, n)],
+            'duration_expected_hr_dec': rng.uniform(0, 2, n),
+        })
+        df = get_expected_schedule(df)
+        expected = set()
+        for antenna_id, dfa in df.groupby('antenna_id'):
+            dfa = dfa.sort_values('tstart', kind='stable')
+            for i in range(1, len(dfa)):
+                if dfa['tend'].iloc[:i].max() > dfa['tstart'].iloc[i]:
+                    expected.add(dfa.index[i])
+        self.assertEqual(set(find_overlaps(df)['index_b']), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import datetime
+import json
+import threading
+import time
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from dbserver_stub import DbServerStub
+from mke_client.helpers import get_utcnow, make_zulustr
+from mke_client.transport import Transport
+from mke_client.cache import RowCache
+from mke_client.rimlib import Experiment
+
+
+def make_tables(status='RUNNING', duration=1.0):
+    return {
+        'experiments': {1: {
+            'id': 1,
+            'status': status,
+            'antenna_id': 'test_antenna',
+            'start_condition': make_zulustr(get_utcnow()),
+            'duration_expected_hr_dec': duration,
+            'devices_json': '["ACU"]',
+        }},
+        'antennas': {'test_antenna': {'id': 'test_antenna', 'altitude': 1086}},
+    }
+
+
+class TestTickState(unittest.TestCase):
+
+    def test_poll_single_fetch(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            state = exp.poll()
+            self.assertEqual(srv.n_requests, 1)
+
+            self.assertFalse(state.cancel_requested)
+            self.assertEqual(state.status, 'RUNNING')
+            self.assertEqual(state.status_code, 11)
+            self.assertGreater(state.remaining_hours, 0.9)
+            self.assertLessEqual(state.remaining_hours, 1.0)
+            self.assertIsInstance(state.start_time, datetime.datetime)
+            with self.assertRaises(AttributeError):
+                state.status = 'FINISHED'
+
+            exp.set_status_cancelling()
+            self.assertTrue(exp.poll().cancel_requested)
+
+    def test_methods_accept_row(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            row = exp.get_me()
+            t_is = get_utcnow() + datetime.timedelta(hours=2)
+
+            self.assertFalse(exp.check_for_cancel(row=row))
+            self.assertEqual(exp.get_remaining_time(t_is, row=row), 0)
+            self.assertEqual(exp.get_expected_devices(row=row), ['ACU'])
+            self.assertEqual(exp.get_my_antenna(row=row)['altitude'], 1086)
+            self.assertEqual(exp.tick_state(row, t_is).remaining_hours, 0)
+            self.assertEqual(srv.n_requests, 2)
+
+
+class TestRowCache(unittest.TestCase):
+
+    def test_ttl_per_table(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            cache = RowCache(ttls={'experiments': 60})
+            exp = Experiment(1, srv.uri, transport=transport, cache=cache)
+            for _ in range(5):
+                self.assertEqual(exp.get_my_antenna()['altitude'], 1086)
+                self.assertFalse(exp.check_for_cancel())
+            self.assertEqual(srv.n_requests, 2)
+
+            stats = cache.stats()
+            self.assertEqual(stats['antennas']['misses'], 1)
+            self.assertEqual(stats['antennas']['hits'], 4)
+            self.assertEqual(stats['experiments']['hits'], 9)
+
+            # patching returns the fresh row which replaces the cached one
+            exp.set_status_cancelling()
+            self.assertTrue(exp.check_for_cancel())
+            self.assertEqual(srv.n_requests, 3)
+
+    def test_revalidate_with_etag(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            cache = RowCache(ttls={'experiments': 0})
+            exp = Experiment(1, srv.uri, transport=transport, cache=cache)
+            me = exp.get_me()
+            self.assertEqual(exp.get_me(), me)
+            self.assertEqual(cache.stats()['experiments']['revalidated'], 1)
+
+            srv.tables['experiments']['1']['status'] = 'FINISHED'
+            self.assertEqual(exp.get_me()['status'], 'FINISHED')
+            self.assertEqual(cache.stats()['experiments']['revalidated'], 1)
+            self.assertEqual(srv.n_requests, 3)
+
+            cache.invalidate('experiments')
+            self.assertEqual(cache.stats()['total']['entries'], 0)
+
+
+def add_register_routes(srv, batch=True):
+    ids = []
+
+    def register_one(payload):
+        ids.append(len(ids) + 1)
+        i = ids[-1]
+        aux = [[k, i, f'/data_raw/{i}_{k}{v}'] for k, v in payload['extensions'].items() if k != 'ACU']
+        return {'id': i, 'path': f'/data_raw/{i}_ACU.csv', 'aux_files': aux, 'time_iso': payload['row']['time_iso']}
+
+    srv.routes[('POST', 'register_measurement_data')] = lambda h, body: (200, register_one(json.loads(body)))
+    if batch:
+        srv.routes[('POST', 'register_measurement_data_batch')] = lambda h, body: (200, {'results': [register_one(p) for p in json.loads(body)['items']]})
+
+
+class TestBatchRegister(unittest.TestCase):
+
+    def check(self, batch, n_requests):
+        t = get_utcnow()
+        measurements = [(t + datetime.timedelta(seconds=i), {'RFC': '.csv'} if i % 2 else [], 'tag') for i in range(20)]
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            add_register_routes(srv, batch)
+            exp = Experiment(1, srv.uri, transport=transport)
+            ret = exp.get_pathes_for_new_datafiles(measurements)
+            self.assertEqual(srv.n_requests, n_requests)
+
+        self.assertEqual(len(ret), 20)
+        self.assertEqual(sorted(id for _, id, _ in ret), list(range(1, 21)))
+        for i, (path, id, aux) in enumerate(ret):
+            self.assertEqual(path, f'/data_raw/{id}_ACU.csv')
+            self.assertEqual(len(aux), i % 2)
+
+    def test_batch(self):
+        self.check(batch=True, n_requests=1)
+
+    def test_fallback(self):
+        self.check(batch=False, n_requests=21)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+
+def patch_later(uri, delay, **row):
+    def fun():
+        time.sleep(delay)
+        with Transport() as transport:
+            transport.patch(f'{uri}/experiments/1', json=row)
+    threading.Thread(target=fun, daemon=True).start()
+
+
+class TestWatch(unittest.TestCase):
+
+    def test_long_poll(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            patch_later(srv.uri, 0.3, status='CANCELLING')
+            t0 = time.perf_counter()
+            row = exp.wait_for({'CANCELLING', 'FINISHING'}, timeout=10)
+            self.assertEqual(row['status'], 'CANCELLING')
+            self.assertLess(time.perf_counter() - t0, 1.0)
+            self.assertTrue(exp._watch_supported)
+            self.assertLessEqual(transport.stats()['requests'], 3)
+
+            self.assertRaises(TimeoutError, exp.wait_for, 'FINISHED', timeout=0.2)
+
+    def test_fallback_polling(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            del srv.routes[('GET', r'(\w+)/(\w+)/watch')]
+            exp = Experiment(1, srv.uri, transport=transport)
+            patch_later(srv.uri, 0.5, status='CANCELLING')
+            row = exp.wait_for('CANCELLING', timeout=10, poll_interval=(0.02, 0.2))
+            self.assertEqual(row['status'], 'CANCELLING')
+            self.assertFalse(exp._watch_supported)
+            # backoff: far fewer requests than polling every 20 ms
+            self.assertLess(transport.stats()['requests'], 15)
+
+    def test_on_status_change(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            seen = []
+            cancelled = threading.Event()
+            def callback(status, row):
+                seen.append(status)
+                if status == 'CANCELLING':
+                    cancelled.set()
+
+            watch = exp.on_status_change(callback)
+            patch_later(srv.uri, 0.1, comments='not a status change')
+            patch_later(srv.uri, 0.3, status='CANCELLING')
+            self.assertTrue(cancelled.wait(5))
+            watch.stop()
+            self.assertEqual(seen, ['RUNNING', 'CANCELLING'])
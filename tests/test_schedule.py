@@ -0,0 +1,145 @@
+import datetime
+import json
+import random
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from dbserver_stub import DbServerStub
+from mke_client.helpers import make_zulustr, parse_zulutime
+from mke_client.transport import Transport
+from mke_client.remexlib import RemexApiAccessor, ScriptMinimal, add_scripts, validate_script
+from mke_client.schedule import ScheduleIndex, get_interval
+
+
+t0 = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_row(id, antenna_id, start_hr, duration_hr):
+    return {'id': id, 'antenna_id': antenna_id, 'start_condition': make_zulustr(t0 + datetime.timedelta(hours=start_hr)), 'duration_expected_hr_dec': duration_hr}
+
+
+class TestScheduleIndex(unittest.TestCase):
+
+    def test_against_brute_force(self):
+        rng = random.Random(0)
+        rows = {i: make_row(i, rng.choice('ab'), rng.randint(0, 2000), rng.choice([0.5, 1, 2, 10])) for i in range(400)}
+        index = ScheduleIndex(rows.values(), seed=1)
+
+        # incremental changes
+        for i in range(0, 400, 7):
+            index.remove(i)
+            del rows[i]
+        for i in [i for i in range(1, 400, 11) if i in rows]:
+            rows[i] = make_row(i, rows[i]['antenna_id'], rng.randint(0, 2000), 3)
+            index.update(rows[i])
+        self.assertEqual(len(index), len(rows))
+
+        intervals = {i: get_interval(row) for i, row in rows.items()}
+        for k in range(200):
+            antenna_id = rng.choice('ab')
+            start = t0.timestamp() + rng.randint(0, 2000 * 3600)
+            end = start + rng.uniform(0, 20) * 3600
+            expected = {i for i, (s, e) in intervals.items() if rows[i]['antenna_id'] == antenna_id and s < end and e > start}
+            self.assertEqual(set(index.overlaps(antenna_id, start, end)), expected)
+
+            d = rng.choice([0.5, 1, 5])
+            slot = index.next_free_slot(antenna_id, d, after=start).timestamp()
+            self.assertGreaterEqual(slot, start)
+            self.assertFalse(index.overlaps(antenna_id, slot, slot + d * 3600))
+            # no earlier free slot: every start between after and slot collides
+            candidates = [start] + [e for i, (_, e) in intervals.items() if rows[i]['antenna_id'] == antenna_id and start < e]
+            for s in [s for s in candidates if s < slot]:
+                self.assertTrue(index.overlaps(antenna_id, s, s + d * 3600))
+
+    def test_conflicts(self):
+        index = ScheduleIndex([make_row(1, 'a', 0, 2), make_row(2, 'a', 3, 1), make_row(3, 'b', 1, 1)])
+        script = ScriptMinimal('script.py', 'a', start_condition=make_zulustr(t0 + datetime.timedelta(hours=1)), duration_expected_hr_dec=1)
+        self.assertEqual(index.conflicts(script), [1])
+        # half open intervals: starting right at the end is fine
+        self.assertEqual(index.conflicts(make_row(None, 'a', 2, 1)), [])
+        self.assertEqual(index.conflicts(make_row(2, 'a', 3, 1)), [])
+        self.assertEqual(index.next_free_slot('a', 1.5, after=t0), t0 + datetime.timedelta(hours=4))
+        self.assertEqual(index.next_free_slot('c', 1.5, after=t0), t0)
+        # same utc as the rows of get_expected_schedule and parse_zulutime
+        self.assertIs(index.next_free_slot('c', 1.5, after=t0).tzinfo, parse_zulutime(make_zulustr(t0)).tzinfo)
+        self.assertEqual(index.get(1)[1:], (parse_zulutime(make_zulustr(t0)), parse_zulutime(make_zulustr(t0 + datetime.timedelta(hours=2)))))
+        self.assertEqual(str(index.get(1)[1]), str(parse_zulutime(make_zulustr(t0))))
+
+    def test_check_and_start(self):
+        def check_and_start(handler, body):
+            row = json.loads(body)
+            row['id'] = 10
+            return 200, {'msg': None, 'data': row, 'status': 'WAITING_TO_RUN'}
+
+        with DbServerStub() as srv, Transport() as transport:
+            srv.routes[('POST', r'check_and_start/experiments')] = check_and_start
+            api = RemexApiAccessor(srv.uri, 'experiments', transport=transport)
+            index = ScheduleIndex([make_row(1, 'a', 0, 2)])
+            self.assertRaises(AssertionError, api.check_and_start, make_row(None, 'a', 1, 1), schedule=index)
+            self.assertEqual(srv.n_requests, 0)
+            api.check_and_start(make_row(None, 'a', 2, 1), schedule=index)
+            self.assertIn(10, index)
+
+
+class TestAddScripts(unittest.TestCase):
+
+    def test_validate_script(self):
+        self.assertEqual(validate_script(ScriptMinimal('a.py', 'a', make_zulustr(t0))), [])
+        # the server sets the status of a new script, so it is not posted (as before)
+        self.assertNotIn('status', ScriptMinimal('a.py', 'a', make_zulustr(t0), status='RUNNING').to_dict())
+        self.assertEqual(ScriptMinimal('a.py', 'a', make_zulustr(t0), comments='x').to_dict()['comments'], 'x')
+        dc = dict(script_in_path='a.py', antenna_id='a', start_condition='tomorrow', status='DONE',
+                  duration_expected_hr_dec=-1, devices_json='[', needs_manual_upload=2, foo=1)
+        errors = validate_script(dc)
+        self.assertEqual(len(errors), 6, errors)
+        self.assertEqual(validate_script(dict(antenna_id=1)), ['"script_in_path" must be given', '"start_condition" must be given', '"antenna_id" must be of type TEXT, got int'])
+
+    def test_add_scripts(self):
+        ids = iter(range(100, 200))
+        def check_and_start(handler, body):
+            row = json.loads(body)
+            if row['script_in_path'] == 'fail.py':
+                return 200, {'msg': 'script not found', 'data': None, 'status': None}
+            row['id'] = next(ids)
+            return 200, {'msg': None, 'data': row, 'status': 'WAITING_TO_RUN'}
+
+        def new_row(antenna_id, start_hr, duration_hr, **kwargs):
+            row = make_row(None, antenna_id, start_hr, duration_hr)
+            del row['id']
+            return {**row, 'script_in_path': 'a.py', **kwargs}
+
+        scripts = [
+            new_row('a', 2, 1),                         # ok
+            new_row('a', 2.5, 1),                       # overlaps with scripts[0]
+            new_row('a', 0, 1),                         # overlaps with the existing script 1
+            new_row('b', 0, 1, status='nope'),
+            new_row('b', 1, 1, script_in_path='fail.py'),
+            ScriptMinimal('a.py', 'b', make_zulustr(t0), 0.5),
+        ]
+
+        with DbServerStub() as srv, Transport() as transport:
+            srv.routes[('POST', r'check_and_start/experiments')] = check_and_start
+            index = ScheduleIndex([make_row(1, 'a', 0, 2)])
+            report = add_scripts(srv.uri, 'experiments', scripts, transport=transport, max_workers=4, schedule=index)
+            self.assertEqual(srv.n_requests, 3)
+
+        self.assertEqual([r['ok'] for r in report], [True, False, False, False, False, True])
+        self.assertEqual([r['stage'] for r in report], [None, 'validation', 'validation', 'validation', 'submission', None])
+        self.assertIn('scripts[0]', report[1]['errors'][0])
+        self.assertIn('overlaps with 1 ', report[2]['errors'][0])
+        self.assertIn('script not found', report[4]['errors'][0])
+        self.assertEqual(report[0]['status'], 'WAITING_TO_RUN')
+        # only the submitted scripts end up in the schedule
+        self.assertEqual(sorted(index._items.keys()), sorted([1, report[0]['data']['id'], report[5]['data']['id']]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from dbserver_stub import DbServerStub
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment, Analysis
+from mke_client.remexlib import RemexApiAccessor
+
+
+def make_tables():
+    return {
+        'experiments': {1: {'id': 1, 'status': 'RUNNING', 'antenna_id': 'test_antenna'}},
+        'analyses': {1: {'id': 1, 'status': 'RUNNING', 'antenna_id': 'test_antenna'}},
+    }
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_connections_reused(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            ana = Analysis(1, srv.uri, transport=transport)
+            api = RemexApiAccessor(srv.uri, 'experiments', transport=transport)
+
+            for _ in range(10):
+                self.assertEqual(exp.get_me()['status'], 'RUNNING')
+                self.assertEqual(ana.get_me()['status'], 'RUNNING')
+                self.assertEqual(api.get(1)['id'], 1)
+
+            me = exp.set_status_finishing()
+            self.assertEqual(me['status'], 'FINISHING')
+
+            stats = transport.stats()
+            self.assertEqual(stats['requests'], 31)
+            self.assertEqual(stats['connections_opened'], 1)
+            self.assertEqual(stats['connections_reused'], 30)
+            self.assertEqual(srv.n_connections, 1)
+            self.assertGreater(stats['latency_mean_s'], 0)
+
+    def test_stats_reset_and_failures(self):
+        with DbServerStub(make_tables()) as srv, Transport() as transport:
+            exp = Experiment(1, srv.uri, transport=transport)
+            exp.get_me()
+            transport.reset_stats()
+            self.assertEqual(transport.stats()['requests'], 0)
+
+            self.assertTrue(exp.ping_test())
+            with self.assertRaises(AssertionError):
+                exp.get('experiments', 2)
+
+            stats = transport.stats()
+            self.assertEqual(stats['requests'], 2)
+            self.assertEqual(stats['connections_opened'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+import email.parser
+import email.policy
+import hashlib
+import io
+import json
+import tempfile
+import time
+import unittest
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+
+from dbserver_stub import DbServerStub
+from mke_client.transport import Transport
+from mke_client.rimlib import Experiment
+from mke_client.upload import MultipartEncoder, ResumableUploader, UploadJournal
+import mke_client.upload as upload
+from mke_client.upload_queue import UploadQueue
+
+
+def parse_multipart(content_type, body):
+    msg = email.parser.BytesParser(policy=email.policy.default).parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+    return {part.get_param('name', header='content-disposition'): (part.get_filename(), part.get_payload(decode=True)) for part in msg.iter_parts()}
+
+
+class TestMultipartEncoder(unittest.TestCase):
+
+    def test_encode_in_chunks(self):
+        data_acu = os.urandom(100000)
+        data_mws = b'mws' * 1000
+        progress = []
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'acu.csv')
+            with open(pth, 'wb') as fp:
+                fp.write(data_acu)
+
+            files = {'ACU': pth, 'MWS': io.BytesIO(data_mws)}
+            with MultipartEncoder({'json': {'id': 1}}, files, chunk_size=4096, progress_callback=lambda *args: progress.append(args)) as enc:
+                chunks = []
+                while True:
+                    chunk = enc.read(10000)
+                    if not chunk:
+                        break
+                    self.assertLessEqual(len(chunk), 10000)
+                    chunks.append(chunk)
+                body = b''.join(chunks)
+                self.assertEqual(len(body), len(enc))
+
+        parts = parse_multipart(enc.content_type, body)
+        self.assertEqual(json.loads(parts['json'][1]), {'id': 1})
+        self.assertEqual(parts['ACU'], ('acu.csv', data_acu))
+        self.assertEqual(parts['MWS'][1], data_mws)
+
+        self.assertEqual(progress[-1], ('MWS', len(data_mws), len(data_mws)))
+        self.assertEqual([p for p in progress if p[0] == 'ACU'][-1], ('ACU', len(data_acu), len(data_acu)))
+        self.assertTrue(all(b - a <= 4096 for (_, a, _), (_, b, _) in zip(progress, progress[1:]) if b > a))
+
+    def test_upload_new_datafile(self):
+        received = {}
+
+        def upload(handler, body):
+            received.update(parse_multipart(handler.headers['Content-Type'], body))
+            return 200, {'id': 3, 'path': '/data_raw/x_ACU.csv', 'aux_files': [['RFC', 1, '/data_raw/x_RFC.csv']]}
+
+        with DbServerStub() as srv, Transport() as transport, tempfile.TemporaryDirectory() as tmpdir:
+            srv.routes[('POST', 'upload_measurement_data')] = upload
+            pth = os.path.join(tmpdir, 'main.csv')
+            with open(pth, 'w') as fp:
+                fp.write('a,b\n1,2\n')
+
+            exp = Experiment(1, srv.uri, transport=transport)
+            path, id, aux = exp.upload_new_datafile(pth, {'RFC': io.BytesIO(b'rfc')}, start_time='2022-06-09T10:05:21Z', tag='test')
+
+        self.assertEqual((path, id), ('/data_raw/x_ACU.csv', 3))
+        self.assertEqual(received['ACU'], ('main.csv', b'a,b\n1,2\n'))
+        self.assertEqual(received['RFC'][1], b'rfc')
+        self.assertEqual(json.loads(received['json'][1]), {'id': 1, 'row': {'time_iso': '2022-06-09T10:05:21Z', 'tags': 'test'}})
+
+
+class BlobServer(DbServerStub):
+    """stand-in for a server supporting content addressed uploads"""
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.blobs = {}
+        self.files = {}
+        self.n_put = 0
+        self.fail_after = fail_after
+        self.routes[('POST', r'blobs/missing')] = self._missing
+        self.routes[('PUT', r'blobs/(\w+)')] = self._put
+        self.routes[('POST', r'upload_measurement_data_by_hash')] = self._register
+
+    def _missing(self, handler, body):
+        hashes = json.loads(body)['hashes']
+        return 200, {'missing': [h for h in hashes if h not in self.blobs and h not in self.files]}
+
+    def _put(self, handler, body, sha):
+        if self.fail_after is not None and self.n_put >= self.fail_after:
+            return 500, {'error': 'link dropped'}
+        self.n_put += 1
+        assert hashlib.sha256(body).hexdigest() == sha
+        self.blobs[sha] = body
+        return 200, {'sha256': sha}
+
+    def _register(self, handler, body):
+        dc = json.loads(body)
+        for key, f in dc['files'].items():
+            if f['sha256'] not in self.files:
+                content = b''.join(self.blobs[h] for h in f['chunks'])
+                assert hashlib.sha256(content).hexdigest() == f['sha256']
+                self.files[f['sha256']] = content
+        return 200, {'id': 1, 'path': 'p', 'aux_files': [], 'row': dc['row']}
+
+
+class TestResumableUpload(unittest.TestCase):
+
+    def test_resume_after_failure(self):
+        data = os.urandom(10000)
+        with BlobServer(fail_after=4) as srv, Transport() as transport, tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'acu.csv')
+            with open(pth, 'wb') as fp:
+                fp.write(data)
+
+            uploader = ResumableUploader(transport, srv.uri, journal_dir=os.path.join(tmpdir, 'journal'), chunk_size=1000)
+            payload = {'id': 1, 'row': {'time_iso': '2022-06-09T10:05:21Z', 'tags': None}}
+            with self.assertRaises(AssertionError):
+                uploader.upload('upload_measurement_data', payload, {'ACU': pth})
+            self.assertEqual(len(os.listdir(uploader.journal_dir)), 1)
+
+            # one line per acknowledged chunk after the manifest, a cut off line is ignored
+            journal_pth = os.path.join(uploader.journal_dir, os.listdir(uploader.journal_dir)[0])
+            with open(journal_pth, 'rb') as fp:
+                lines = fp.read().splitlines()
+            self.assertEqual(len(lines), 1 + 4)
+            with open(journal_pth, 'ab') as fp:
+                fp.write(b'abc')
+            self.assertEqual(len(UploadJournal(journal_pth).acked), 4)
+
+            srv.fail_after = None
+            payload_retry = {'id': 1, 'row': {'time_iso': '2022-06-09T11:00:00Z', 'tags': None}}
+            ret = uploader.upload('upload_measurement_data', payload_retry, {'ACU': pth})
+
+            self.assertEqual(srv.n_put, 10)
+            self.assertEqual(srv.files[hashlib.sha256(data).hexdigest()], data)
+            # registered with the payload of the retry, not of the interrupted upload
+            self.assertEqual(ret['row']['time_iso'], '2022-06-09T11:00:00Z')
+            self.assertEqual(os.listdir(uploader.journal_dir), [])
+
+    def test_file_objects_hashed_once(self):
+        calls = []
+        make_manifest = upload.make_manifest
+        def counting(files, *args):
+            calls.append(list(files))
+            return make_manifest(files, *args)
+
+        with BlobServer() as srv, Transport() as transport, tempfile.TemporaryDirectory() as tmpdir:
+            upload.make_manifest = counting
+            try:
+                uploader = ResumableUploader(transport, srv.uri, journal_dir=tmpdir, chunk_size=100)
+                uploader.upload('upload_measurement_data', {'id': 1, 'row': {}}, {'ACU': io.BytesIO(b'acu' * 100)})
+            finally:
+                upload.make_manifest = make_manifest
+            self.assertEqual(sum(len(c) for c in calls), 1)
+            self.assertEqual(srv.n_put, 3)
+
+    def test_skip_known_content(self):
+        with BlobServer() as srv, Transport() as transport, tempfile.TemporaryDirectory() as tmpdir:
+            exp = Experiment(1, srv.uri, transport=transport)
+            journal_dir = os.path.join(tmpdir, 'journal')
+            exp.upload_new_datafile(io.BytesIO(b'acu' * 100), {'MWS': io.BytesIO(b'mws')}, resumable=True, journal_dir=journal_dir)
+            self.assertEqual(srv.n_put, 2)
+
+            exp.upload_new_datafile(io.BytesIO(b'acu' * 100), {'MWS': io.BytesIO(b'new')}, resumable=True, journal_dir=journal_dir)
+            self.assertEqual(srv.n_put, 3)
+
+
+class TestUploadQueue(unittest.TestCase):
+
+    def test_non_blocking_upload_is_not_retried(self):
+        # the server may have registered the measurement before the response got lost
+        n_calls = []
+
+        def upload(handler, body):
+            n_calls.append(1)
+            time.sleep(0.2)
+            return 500, {'error': 'link dropped'}
+
+        with DbServerStub() as srv, Transport() as transport:
+            srv.routes[('POST', 'upload_measurement_data')] = upload
+            queue = UploadQueue(max_workers=1, n_retries=2, retry_delay=0.01)
+            exp = Experiment(1, srv.uri, transport=transport, upload_queue=queue)
+
+            t0 = time.perf_counter()
+            fut = exp.upload_new_datafile(io.BytesIO(b'acu'), block=False)
+            self.assertLess(time.perf_counter() - t0, 0.1)
+            self.assertFalse(fut.done())
+
+            with self.assertRaises(AssertionError):
+                exp.flush()
+            self.assertEqual(len(n_calls), 1)
+            self.assertEqual(queue.stats(), {'submitted': 1, 'completed': 0, 'failed': 1, 'retried': 0, 'pending': 0})
+            exp.close()
+
+    def test_non_blocking_resumable_upload_with_retries(self):
+        with BlobServer() as srv, Transport() as transport, tempfile.TemporaryDirectory() as tmpdir:
+            put = srv.routes[('PUT', r'blobs/(\w+)')]
+            n_failed = []
+            def flaky_put(handler, body, sha):
+                if srv.n_put == 1 and not n_failed:
+                    n_failed.append(1)
+                    return 500, {'error': 'link dropped'}
+                return put(handler, body, sha)
+            srv.routes[('PUT', r'blobs/(\w+)')] = flaky_put
+
+            queue = UploadQueue(max_workers=1, n_retries=2, retry_delay=0.01)
+            exp = Experiment(1, srv.uri, transport=transport, upload_queue=queue)
+            fut = exp.upload_new_datafile(io.BytesIO(b'acu'), {'MWS': io.BytesIO(b'mws')}, resumable=True, journal_dir=tmpdir, block=False)
+            exp.flush()
+            self.assertEqual(fut.result(), ('p', 1, []))
+            # the chunk acknowledged before the failure is not sent again
+            self.assertEqual(srv.n_put, 2)
+            self.assertEqual(queue.stats(), {'submitted': 1, 'completed': 1, 'failed': 0, 'retried': 1, 'pending': 0})
+            exp.close()
+
+    def test_backpressure_and_errors(self):
+        with UploadQueue(max_workers=1, max_pending=1, n_retries=0) as queue:
+            t0 = time.perf_counter()
+            queue.submit(time.sleep, 0.2)
+            fut = queue.submit(lambda: 1 / 0)
+            self.assertGreater(time.perf_counter() - t0, 0.15)
+            with self.assertRaises(ZeroDivisionError):
+                queue.flush()
+            # reported once
+            self.assertEqual(queue.flush(raise_on_error=False), [])
+            self.assertIsInstance(fut.exception(), ZeroDivisionError)
+
+            # an upload which already failed before flush is called is still reported
+            fut = queue.submit(lambda: 1 / 0)
+            self.assertIsInstance(fut.exception(timeout=5), ZeroDivisionError)
+            errors = queue.flush(raise_on_error=False)
+            self.assertEqual(len(errors), 1)
+            self.assertIsInstance(errors[0], ZeroDivisionError)
+            self.assertEqual(queue.stats()['failed'], 2)
+
+    def test_close_reports_failed_uploads(self):
+        for raise_on_error in [False, True]:
+            with self.subTest(raise_on_error=raise_on_error):
+                queue = UploadQueue(max_workers=1, n_retries=0)
+                queue.submit(lambda: 1 / 0).exception(timeout=5)
+                if raise_on_error:
+                    with self.assertRaises(ZeroDivisionError):
+                        queue.close(raise_on_error=True)
+                else:
+                    with self.assertLogs('mke_client.upload_queue', 'ERROR') as logs:
+                        queue.close()
+                    self.assertIn('1 uploads failed', logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+
+import os, inspect, sys
+# path was needed for local testing
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir + '/src')
+sys.path.insert(0, current_dir)
+
+import numpy as np
+import pandas as pd
+
+from mke_client.locallib import LocalExperiment
+from mke_client.writer import MeasurementWriter, read_measurement, write_dataframe, get_format, get_stream_path, get_stream_index, append_to_stream
+
+
+def make_frame(n=200):
+    t = pd.date_range('2023-01-01', periods=n, freq='50ms', tz='UTC')
+    return pd.DataFrame({
+        'azimuth': np.linspace(0, 360, n),
+        'elevation': np.linspace(15, 88, n).astype(np.float32),
+        'mode': pd.Categorical(['TRACK', 'SLEW'] * (n // 2)),
+        'n_errors': np.arange(n, dtype=np.int16),
+    }, index=pd.Index(t, name='time'))
+
+
+class TestMeasurementWriter(unittest.TestCase):
+
+    def test_formats(self):
+        formats = ['parquet', 'arrow', 'csv']
+        if importlib.util.find_spec('tables') is not None:
+            formats.append('hdf5')
+
+        df, df_rfc = make_frame(), make_frame(50)
+        for fmt in formats:
+            with self.subTest(fmt=fmt), tempfile.TemporaryDirectory() as tmpdir:
+                with LocalExperiment(1, fallback_local_basepath=tmpdir, backend='memory') as exp, MeasurementWriter(exp, fmt) as writer:
+                    main_path, main_id, aux = writer.write(df, {'RFC': df_rfc, 'MWS': df_rfc})
+                    self.assertEqual(get_format(main_path), fmt)
+                    self.assertEqual([a[0] for a in aux], ['RFC', 'MWS'])
+                    self.assertTrue(os.path.exists(aux[1][2]))
+
+                    df_read = read_measurement(main_path)
+                    if fmt == 'csv':
+                        np.testing.assert_allclose(df_read['azimuth'].values, df['azimuth'].values)
+                    else:
+                        # typed columns and the index survive the round trip
+                        pd.testing.assert_frame_equal(df_read, df, check_freq=False)
+                        pd.testing.assert_frame_equal(read_measurement(aux[0][2], columns=['azimuth']), df_rfc[['azimuth']], check_freq=False)
+
+                    main_path, main_id, aux = writer.write(df)
+                    self.assertEqual(main_id, 2)
+                    self.assertEqual(aux, [])
+
+    def test_write_dataframe(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, 'data.parquet')
+            write_dataframe(make_frame(), pth, compression='snappy')
+            self.assertEqual(len(read_measurement(pth)), 200)
+            self.assertRaises(AssertionError, write_dataframe, make_frame(), os.path.join(tmpdir, 'data.txt'))
+            self.assertRaises(AssertionError, MeasurementWriter, None, 'xlsx')
+
+
+class TestMeasurementStream(unittest.TestCase):
+
+    def test_append_and_read(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with LocalExperiment(1, fallback_local_basepath=tmpdir, backend='memory') as exp, MeasurementWriter(exp, 'stream') as writer:
+                frames = [make_frame(20 + 2 * i) for i in range(30)]
+                written = [writer.write(df, {'RFC': df.iloc[:5]}) for df in frames]
+
+                # one growing file plus index per device instead of one file per measurement
+                data_dir = os.path.dirname(written[0][0])
+                self.assertEqual(sorted(os.listdir(data_dir)), ['IDP_1_ACU.arrows', 'IDP_1_ACU.arrows.idx', 'IDP_1_ACU.arrows.lock', 'IDP_1_RFC.arrows', 'IDP_1_RFC.arrows.idx', 'IDP_1_RFC.arrows.lock'])
+                self.assertEqual(get_stream_path(written[3][0]), os.path.join(data_dir, 'IDP_1_ACU.arrows'))
+
+                # the registered pathes stay the key to each measurement
+                for df, (main_path, main_id, aux) in reversed(list(zip(frames, written))):
+                    self.assertEqual(exp.get('measurement_data', main_id)['filename'], main_path)
+                    pd.testing.assert_frame_equal(read_measurement(main_path), df, check_freq=False)
+                    pd.testing.assert_frame_equal(read_measurement(aux[0][2], columns=['n_errors']), df.iloc[:5][['n_errors']], check_freq=False)
+
+                entries = get_stream_index(get_stream_path(written[0][0])).update()
+                self.assertEqual(sorted(entries), list(range(1, 31)))
+                self.assertEqual(entries[2]['offset'], entries[1]['offset'] + entries[1]['length'])
+
+    def test_concurrent_and_partial_index(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pathes = [os.path.join(tmpdir, f'20230101_000000_IDP_7_IDD_{i}_ACU.arrows') for i in range(1, 41)]
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(lambda pth: append_to_stream(make_frame(10), pth), pathes))
+
+            stream_path = get_stream_path(pathes[0])
+            with open(stream_path + '.idx', 'ab') as fp:
+                fp.write(b'{"id": 41, "off')
+            index = get_stream_index(stream_path)
+            self.assertEqual(sorted(index.update()), list(range(1, 41)))
+            self.assertEqual(sum(e['length'] for e in index.entries.values()), os.path.getsize(stream_path))
+            self.assertRaises(KeyError, read_measurement, pathes[0].replace('IDD_1_', 'IDD_99_'))
+            self.assertEqual(len(read_measurement(pathes[17])), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()